@@ -1,6 +1,8 @@
 const vscode = require('vscode');
 const { spawn } = require('child_process');
 const path = require('path');
+const net = require('net');
+const os = require('os');
 
 /**
  * @param {vscode.ExtensionContext} context
@@ -45,7 +47,423 @@ function activate(context) {
         await generateFromCommentCode();
     });
 
-    context.subscriptions.push(generateCode, generateDebug, setup, config, debug, diagnose, installDependencies, checkEnvironment, generateFromComment);
+    let showAlternatives = vscode.commands.registerCommand('abap-code-assistant.showAlternatives', async () => {
+        await showAlternativeCode();
+    });
+
+    context.subscriptions.push(generateCode, generateDebug, setup, config, debug, diagnose, installDependencies, checkEnvironment, generateFromComment, showAlternatives);
+
+    // Keep the long-running backend's document mirrors in sync with incremental edits
+    context.subscriptions.push(
+        vscode.workspace.onDidOpenTextDocument((document) => backendServer.didOpen(document)),
+        vscode.workspace.onDidChangeTextDocument((event) => backendServer.didChange(event)),
+        vscode.workspace.onDidCloseTextDocument((document) => backendServer.didClose(document)),
+        vscode.window.onDidChangeTextEditorSelection((event) => backendServer.cursorMoved(event)),
+        vscode.workspace.onDidChangeConfiguration((event) => {
+            if (event.affectsConfiguration('abapCodeAssistant.groqApiKey')) {
+                backendServer.configure();
+            }
+        }),
+        backendServer
+    );
+
+    if (vscode.workspace.getConfiguration('abapCodeAssistant').get('diagnoseOnStartup', true)) {
+        checkEnvironmentOnStartup();
+    }
+}
+
+/**
+ * Long-running Python backend (`main.py serve`) speaking newline-delimited JSON.
+ * It mirrors open ABAP documents, so generate requests only carry a document
+ * version and cursor position instead of the whole text.
+ *
+ * With `sharedBackend` (not on Windows) all windows connect to one backend on a
+ * Unix socket (`main.py serve --socket`), started by the first window and
+ * stopping by itself once no window is connected. Otherwise, or if the shared
+ * backend can't be reached, each window runs its own backend over stdio.
+ */
+class BackendServerClient {
+    constructor() {
+        this.child = null;
+        this.socket = null;
+        this.connected = false;
+        // Lines written before the socket connected
+        this.queue = [];
+        this.sharedFailed = false;
+        this.nextId = 1;
+        this.pending = new Map();
+        this.buffer = '';
+        this.idleTimer = null;
+        // Key of the other candidates of the latest multi-candidate answer
+        this.alternativesKey = '';
+    }
+
+    get running() {
+        return this.child !== null || this.socket !== null;
+    }
+
+    start() {
+        if (this.running) {
+            return;
+        }
+        this.buffer = '';
+        this.queue = [];
+        const useShared = vscode.workspace.getConfiguration('abapCodeAssistant').get('sharedBackend', true);
+        if (useShared && process.platform !== 'win32' && !this.sharedFailed) {
+            this.connectShared(0);
+        } else {
+            this.startProcess();
+        }
+    }
+
+    backendEnv() {
+        const env = { ...process.env };
+        const apiKey = vscode.workspace.getConfiguration('abapCodeAssistant').get('groqApiKey');
+        if (apiKey) {
+            env['GROQ_API_KEY'] = apiKey;
+        }
+        return env;
+    }
+
+    stopped(reason) {
+        console.log(`Python backend server stopped: ${reason}`);
+        this.child = null;
+        this.socket = null;
+        this.connected = false;
+        this.queue = [];
+        for (const { reject, timer } of this.pending.values()) {
+            clearTimeout(timer);
+            reject(new Error(`Backend server stopped: ${reason}`));
+        }
+        this.pending.clear();
+    }
+
+    startProcess() {
+        const pythonPath = getPythonPath();
+        const scriptPath = path.join(__dirname, 'python', 'main.py');
+
+        console.log(`Starting Python backend server: ${pythonPath} ${scriptPath} serve`);
+        const child = spawn(pythonPath, [scriptPath, 'serve'], {
+            env: this.backendEnv(),
+            cwd: path.join(__dirname, 'python')
+        });
+        this.child = child;
+
+        child.stdout.on('data', (data) => this.onData(data));
+        child.stderr.on('data', (data) => {
+            console.log(`Python server stderr: ${data.toString()}`);
+        });
+        const stopped = (reason) => {
+            if (this.child === child) {
+                this.stopped(reason);
+            }
+        };
+        child.on('exit', (code) => stopped(`exit code ${code}`));
+        child.on('error', (error) => stopped(error.message));
+
+        // Mirror the ABAP documents that are already open
+        vscode.workspace.textDocuments.forEach((document) => this.didOpen(document));
+    }
+
+    socketPath() {
+        const configured = vscode.workspace.getConfiguration('abapCodeAssistant').get('backendSocket', '');
+        if (configured) {
+            return configured;
+        }
+        // Same default as the backend: backend.sock in its cache directory
+        const cacheDir = process.env.LACC_CACHE_DIR || path.join(os.homedir(), '.cache', 'abap-code-assistant');
+        return path.join(cacheDir, 'backend.sock');
+    }
+
+    connectShared(attempt) {
+        const socketPath = this.socketPath();
+        const socket = net.createConnection(socketPath);
+        this.socket = socket;
+        this.connected = false;
+
+        socket.on('connect', () => {
+            if (this.socket !== socket) {
+                return;
+            }
+            this.connected = true;
+            console.log(`Connected to shared backend server at ${socketPath}`);
+            // The server may have been started by another window with another key
+            this.configure();
+            // Mirror the open documents before the requests queued meanwhile
+            vscode.workspace.textDocuments.forEach((document) => this.didOpen(document));
+            const queued = this.queue;
+            this.queue = [];
+            queued.forEach((line) => socket.write(line));
+        });
+        socket.on('data', (data) => this.onData(data));
+        socket.on('error', (error) => {
+            if (this.socket !== socket || this.connected) {
+                return;
+            }
+            // No server listening yet: start one that outlives this window, then retry
+            if (attempt === 0) {
+                this.spawnSharedServer(socketPath);
+            }
+            if (attempt < 40) {
+                // this.socket stays set, so requests keep queueing instead of starting another backend
+                setTimeout(() => {
+                    if (this.socket === socket) {
+                        this.connectShared(attempt + 1);
+                    }
+                }, 250);
+                return;
+            }
+            this.sharedFailed = true;
+            this.stopped(`shared backend unavailable at ${socketPath}: ${error.message}`);
+        });
+        socket.on('close', () => {
+            if (this.socket === socket && this.connected) {
+                this.stopped('connection to the shared backend closed');
+            }
+        });
+    }
+
+    spawnSharedServer(socketPath) {
+        const pythonPath = getPythonPath();
+        const scriptPath = path.join(__dirname, 'python', 'main.py');
+        console.log(`Starting shared Python backend server: ${pythonPath} ${scriptPath} serve --socket ${socketPath}`);
+        const child = spawn(pythonPath, [scriptPath, 'serve', '--socket', socketPath], {
+            env: this.backendEnv(),
+            cwd: path.join(__dirname, 'python'),
+            detached: true,
+            stdio: 'ignore'
+        });
+        child.on('error', (error) => console.warn(`Could not start the shared backend server: ${error.message}`));
+        child.unref();
+    }
+
+    onData(data) {
+        this.buffer += data.toString();
+        let newline;
+        while ((newline = this.buffer.indexOf('\n')) !== -1) {
+            const line = this.buffer.substring(0, newline).trim();
+            this.buffer = this.buffer.substring(newline + 1);
+            if (!line) {
+                continue;
+            }
+            let message;
+            try {
+                message = JSON.parse(line);
+            } catch (error) {
+                console.warn(`Unexpected backend server output: ${line}`);
+                continue;
+            }
+            const request = this.pending.get(message.id);
+            if (!request) {
+                continue;
+            }
+            this.pending.delete(message.id);
+            clearTimeout(request.timer);
+            if (message.ok) {
+                request.resolve(message.result);
+            } else {
+                const error = new Error(message.error);
+                error.cancelled = Boolean(message.cancelled);
+                request.reject(error);
+            }
+        }
+    }
+
+    write(message) {
+        const line = JSON.stringify(message) + '\n';
+        if (this.child) {
+            this.child.stdin.write(line);
+        } else if (this.socket && this.connected) {
+            this.socket.write(line);
+        } else if (this.socket) {
+            this.queue.push(line);
+        } else {
+            throw new Error('Backend server is not running');
+        }
+    }
+
+    request(command, args = {}, timeout = 120000, cancellation = undefined) {
+        this.start();
+        return new Promise((resolve, reject) => {
+            const id = this.nextId++;
+            if (cancellation) {
+                // Stops the upstream call of this request in the backend
+                cancellation.onCancellationRequested(() => this.notify('cancel', { requestId: id }));
+            }
+            const timer = setTimeout(() => {
+                this.pending.delete(id);
+                reject(new Error(`Backend server request '${command}' timed out`));
+            }, timeout);
+            this.pending.set(id, { resolve, reject, timer });
+            try {
+                this.write({ id: id, command: command, args: args });
+            } catch (error) {
+                clearTimeout(timer);
+                this.pending.delete(id);
+                reject(error);
+            }
+        });
+    }
+
+    notify(command, args) {
+        if (!this.running) {
+            return;
+        }
+        try {
+            this.write({ command: command, args: args });
+        } catch (error) {
+            console.warn(`Could not send ${command} to backend server: ${error.message}`);
+        }
+    }
+
+    didOpen(document) {
+        if (document.languageId !== 'abap') {
+            return;
+        }
+        this.notify('did_open', {
+            uri: document.uri.toString(),
+            version: document.version,
+            text: document.getText()
+        });
+    }
+
+    didChange(event) {
+        if (event.document.languageId !== 'abap' || event.contentChanges.length === 0) {
+            return;
+        }
+        this.notify('did_change', {
+            uri: event.document.uri.toString(),
+            version: event.document.version,
+            changes: event.contentChanges.map((change) => ({
+                range: {
+                    start: { line: change.range.start.line, character: change.range.start.character },
+                    end: { line: change.range.end.line, character: change.range.end.character }
+                },
+                text: change.text
+            }))
+        });
+    }
+
+    cursorMoved(event) {
+        const document = event.textEditor.document;
+        clearTimeout(this.idleTimer);
+        if (!this.running || document.languageId !== 'abap' || event.selections.length !== 1 || !event.selections[0].isEmpty) {
+            return;
+        }
+        const settings = vscode.workspace.getConfiguration('abapCodeAssistant');
+        if (!settings.get('prefetch', true)) {
+            return;
+        }
+        const position = event.selections[0].active;
+        const version = document.version;
+        // Once the cursor rests, the backend may prefetch a completion for this position
+        this.idleTimer = setTimeout(() => this.notify('idle', {
+            uri: document.uri.toString(),
+            version: version,
+            file: document.fileName,
+            line: position.line,
+            character: position.character
+        }), settings.get('prefetchDelayMs', 400));
+    }
+
+    didClose(document) {
+        if (document.languageId !== 'abap') {
+            return;
+        }
+        this.notify('did_close', { uri: document.uri.toString() });
+    }
+
+    configure() {
+        if (!this.running) {
+            return;
+        }
+        const apiKey = vscode.workspace.getConfiguration('abapCodeAssistant').get('groqApiKey');
+        this.request('configure', { apiKey: apiKey || '' }).catch((error) => {
+            console.warn(`Could not update backend server settings: ${error.message}`);
+        });
+    }
+
+    async generate(document, args, cancellation) {
+        const request = {
+            uri: document.uri.toString(),
+            version: document.version,
+            file: document.fileName,
+            ...args
+        };
+        try {
+            return await this.complete(request, cancellation);
+        } catch (error) {
+            if (error.cancelled || !/not open|version|Could not apply/.test(error.message)) {
+                throw error;
+            }
+            // The mirror is missing or out of date: resend the full text once
+            this.didOpen(document);
+            return await this.complete(request, cancellation);
+        }
+    }
+
+    async complete(request, cancellation) {
+        const result = await this.request('generate', request, 120000, cancellation);
+        this.alternativesKey = result.alternativesKey || '';
+        if (result.truncated) {
+            // The backend hit its request deadline and returned what it had so far
+            vscode.window.setStatusBarMessage('ABAP Code Assistant: completion cut short at the time limit', 5000);
+        }
+        return result.completion;
+    }
+
+    dispose() {
+        if (this.socket) {
+            // The shared backend keeps serving other windows and stops once idle
+            const socket = this.socket;
+            this.socket = null;
+            socket.end();
+            return;
+        }
+        if (!this.child) {
+            return;
+        }
+        this.notify('shutdown', {});
+        this.child.stdin.end();
+        this.child = null;
+    }
+}
+
+const backendServer = new BackendServerClient();
+
+// Where the latest code from a comment went, so one of its alternatives can replace it
+let lastGenerated = null;
+
+/**
+ * Generate through the long-running backend when enabled, falling back to a
+ * one-shot backend process that receives the full prefix and suffix.
+ * Resolves to null when the request was cancelled or superseded.
+ */
+async function requestCompletion(document, serverArgs, buildFallbackArgs, cancellation) {
+    backendServer.alternativesKey = '';
+    const useServer = vscode.workspace.getConfiguration('abapCodeAssistant').get('useBackendServer', true);
+    if (useServer) {
+        try {
+            return await backendServer.generate(document, serverArgs, cancellation);
+        } catch (error) {
+            if (error.cancelled) {
+                console.log(`Generate request cancelled: ${error.message}`);
+                return null;
+            }
+            console.warn(`Backend server request failed, using a one-shot backend process: ${error.message}`);
+        }
+    }
+    return callPythonBackend('generate', buildFallbackArgs());
+}
+
+function buildCursorContext(document, position) {
+    const lines = document.getText().split('\n');
+    const lineNumber = position.line;
+    const currentLine = lines[lineNumber] || '';
+    return {
+        prefix: lines.slice(0, lineNumber).join('\n') + '\n' + currentLine.substring(0, position.character),
+        suffix: currentLine.substring(position.character) + '\n' + lines.slice(lineNumber + 1).join('\n')
+    };
 }
 
 async function generateABAPCode() {
@@ -62,14 +480,6 @@ async function generateABAPCode() {
     }
 
     const position = editor.selection.active;
-    const text = document.getText();
-    const lines = text.split('\n');
-
-    // Get context around cursor
-    const lineNumber = position.line;
-    const currentLine = lines[lineNumber] || '';
-    const prefix = lines.slice(0, lineNumber).join('\n') + '\n' + currentLine.substring(0, position.character);
-    const suffix = currentLine.substring(position.character) + '\n' + lines.slice(lineNumber + 1).join('\n');
 
     // Show progress
     await vscode.window.withProgress({
@@ -92,15 +502,21 @@ async function generateABAPCode() {
                 return;
             }
             
-            const completion = await callPythonBackend('generate', {
-                prefix: prefix,
-                suffix: suffix,
+            const completion = await requestCompletion(document, {
+                line: position.line,
+                character: position.character,
+                mode: 'code'
+            }, () => ({
+                ...buildCursorContext(document, position),
                 file: document.fileName,
                 language: 'abap',
                 mode: 'code',
                 apiKey: apiKey
-            });
+            }), token);
 
+            if (completion === null || token.isCancellationRequested) {
+                return;
+            }
             if (completion && completion.trim()) {
                 // Insert completion at cursor position
                 const edit = new vscode.WorkspaceEdit();
@@ -131,14 +547,8 @@ async function generateABAPDebugCode() {
     }
 
     const position = editor.selection.active;
-    const text = document.getText();
-    const lines = text.split('\n');
-
-    // Get context around cursor
-    const lineNumber = position.line;
-    const currentLine = lines[lineNumber] || '';
-    const prefix = lines.slice(0, lineNumber).join('\n') + '\n' + currentLine.substring(0, position.character);
-    const suffix = currentLine.substring(position.character) + '\n' + lines.slice(lineNumber + 1).join('\n');
+    // Selected text describes what to debug; without it the backend answers from its templates
+    const request = editor.selection.isEmpty ? '' : document.getText(editor.selection);
 
     // Show progress
     await vscode.window.withProgress({
@@ -161,15 +571,23 @@ async function generateABAPDebugCode() {
                 return;
             }
             
-            const debugCode = await callPythonBackend('generate', {
-                prefix: prefix,
-                suffix: suffix,
+            const debugCode = await requestCompletion(document, {
+                line: position.line,
+                character: position.character,
+                comment: request,
+                mode: 'debug'
+            }, () => ({
+                ...buildCursorContext(document, position),
+                comment: request,
                 file: document.fileName,
                 language: 'abap',
                 mode: 'debug',
                 apiKey: apiKey
-            });
+            }), token);
 
+            if (debugCode === null || token.isCancellationRequested) {
+                return;
+            }
             if (debugCode && debugCode.trim()) {
                 // Insert debug code at cursor position
                 const edit = new vscode.WorkspaceEdit();
@@ -206,18 +624,6 @@ async function generateFromCommentCode() {
     }
 
     const selectedText = document.getText(selection);
-    const text = document.getText();
-    const lines = text.split('\n');
-
-    // Get context around the selection
-    const startLine = selection.start.line;
-    const endLine = selection.end.line;
-    
-    // Get prefix (code before the comment)
-    const prefix = lines.slice(0, startLine).join('\n');
-    
-    // Get suffix (code after the comment)
-    const suffix = lines.slice(endLine + 1).join('\n');
 
     // Show progress
     await vscode.window.withProgress({
@@ -240,21 +646,42 @@ async function generateFromCommentCode() {
                 return;
             }
             
-            const completion = await callPythonBackend('generate', {
-                prefix: prefix,
-                suffix: suffix,
-                comment: selectedText,
-                file: document.fileName,
-                language: 'abap',
-                mode: 'comment',
-                apiKey: apiKey
-            });
+            const completion = await requestCompletion(document, {
+                selection: {
+                    start: { line: selection.start.line, character: selection.start.character },
+                    end: { line: selection.end.line, character: selection.end.character }
+                },
+                mode: 'comment'
+            }, () => {
+                // Lines before and after the selected comment
+                const lines = document.getText().split('\n');
+                return {
+                    prefix: lines.slice(0, selection.start.line).join('\n'),
+                    suffix: lines.slice(selection.end.line + 1).join('\n'),
+                    comment: selectedText,
+                    file: document.fileName,
+                    language: 'abap',
+                    mode: 'comment',
+                    apiKey: apiKey
+                };
+            }, token);
 
+            const alternativesKey = backendServer.alternativesKey;
+            if (completion === null || token.isCancellationRequested) {
+                return;
+            }
             if (completion && completion.trim()) {
                 // Replace the selected comment with the generated code
                 const edit = new vscode.WorkspaceEdit();
                 edit.replace(document.uri, selection, completion);
-                await vscode.workspace.applyEdit(edit);
+                if (await vscode.workspace.applyEdit(edit) && alternativesKey) {
+                    lastGenerated = {
+                        key: alternativesKey,
+                        uri: document.uri,
+                        range: insertedRange(document, selection.start, completion),
+                        code: completion
+                    };
+                }
                 
                 vscode.window.showInformationMessage('ABAP code generated from comment successfully!');
             } else {
@@ -266,6 +693,58 @@ async function generateFromCommentCode() {
     });
 }
 
+function insertedRange(document, start, text) {
+    return new vscode.Range(start, document.positionAt(document.offsetAt(start) + text.length));
+}
+
+/**
+ * Replace the latest code generated from a comment with one of the other
+ * candidates the backend raced for it (LACC_CANDIDATES above 1).
+ */
+async function showAlternativeCode() {
+    const generated = lastGenerated;
+    if (!generated || !backendServer.running) {
+        vscode.window.showInformationMessage('No alternatives available. Generate code from a comment with several candidates first.');
+        return;
+    }
+    let alternatives;
+    try {
+        const result = await backendServer.request('alternatives', { key: generated.key }, 10000);
+        alternatives = result.alternatives || [];
+    } catch (error) {
+        vscode.window.showErrorMessage(`Could not get alternatives: ${error.message}`);
+        return;
+    }
+    if (alternatives.length < 2) {
+        // Losing candidates may still be finishing (LACC_CANDIDATE_GRACE)
+        vscode.window.showInformationMessage('No alternatives for the last generated code yet.');
+        return;
+    }
+    const picked = await vscode.window.showQuickPick(alternatives.map((code) => {
+        const lines = code.split('\n').filter((line) => line.trim());
+        return {
+            label: lines.length ? lines[0].trim() : '(empty)',
+            description: code === generated.code ? 'current' : '',
+            detail: `${lines.length} lines`,
+            code: code
+        };
+    }), { placeHolder: 'Replace the generated code with' });
+    if (!picked || picked.code === generated.code) {
+        return;
+    }
+    const document = await vscode.workspace.openTextDocument(generated.uri);
+    if (document.getText(generated.range) !== generated.code) {
+        vscode.window.showWarningMessage('The generated code was edited meanwhile; not replacing it.');
+        return;
+    }
+    const edit = new vscode.WorkspaceEdit();
+    edit.replace(document.uri, generated.range, picked.code);
+    if (await vscode.workspace.applyEdit(edit)) {
+        generated.range = insertedRange(document, generated.range.start, picked.code);
+        generated.code = picked.code;
+    }
+}
+
 async function setupGroqAPI() {
     try {
         // Show progress
@@ -508,7 +987,8 @@ async function callPythonBackend(command, args = {}) {
             console.log(`Python stderr: ${stderr}`);
             
             if (code === 0) {
-                resolve(stdout.trim());
+                // Keep leading whitespace: continuations may start with a line break
+                resolve(stdout.replace(/\s+$/, ''));
             } else {
                 const errorMsg = stderr || `Process failed with code ${code}`;
                 console.error(`Python backend error: ${errorMsg}`);
@@ -670,6 +1150,62 @@ function findCondaPython() {
     return null;
 }
 
+/**
+ * Run `env_check.py --json` directly (no dependency check, no backend imports).
+ * Without refresh it returns the result cached for the interpreter.
+ */
+function runEnvironmentCheck(refresh = false) {
+    return new Promise((resolve, reject) => {
+        const pythonPath = getPythonPath();
+        const args = [path.join(__dirname, 'python', 'env_check.py'), '--json'];
+        if (refresh) {
+            args.push('--refresh');
+        }
+        const child = spawn(pythonPath, args, { cwd: path.join(__dirname, 'python') });
+        let stdout = '';
+        child.stdout.on('data', (data) => {
+            stdout += data.toString();
+        });
+        // env_check enforces its own deadline; this only guards against a hung interpreter
+        const timer = setTimeout(() => {
+            child.kill();
+            reject(new Error('Environment check timed out'));
+        }, 30000);
+        child.on('close', (code) => {
+            clearTimeout(timer);
+            try {
+                resolve(JSON.parse(stdout));
+            } catch (error) {
+                reject(new Error(`Environment check failed (code ${code})`));
+            }
+        });
+        child.on('error', (error) => {
+            clearTimeout(timer);
+            reject(error);
+        });
+    });
+}
+
+async function checkEnvironmentOnStartup() {
+    try {
+        const report = await runEnvironmentCheck();
+        console.log(`Environment check: ${report.passed}/${report.total} passed${report.cached ? ' (cached)' : ''}`);
+        // The network may simply be down at startup; only environment problems are worth a popup
+        const failed = Object.entries(report.checks)
+            .filter(([name, check]) => !check.ok && name !== 'network')
+            .map(([name]) => name);
+        if (failed.length > 0) {
+            const choice = await vscode.window.showWarningMessage(
+                `ABAP Code Assistant: environment problems found (${failed.join(', ')})`, 'Diagnose');
+            if (choice === 'Diagnose') {
+                await diagnoseExtension();
+            }
+        }
+    } catch (error) {
+        console.warn(`Startup environment check failed: ${error.message}`);
+    }
+}
+
 async function diagnoseExtension() {
     try {
         await vscode.window.withProgress({
@@ -709,6 +1245,20 @@ async function diagnoseExtension() {
                 diagnosis.push(`🔧 Python Backend: ❌ Error - ${error.message}`);
             }
             
+            // Environment probes run concurrently under one deadline
+            progress.report({ message: "Checking environment..." });
+            try {
+                const report = await runEnvironmentCheck(true);
+                diagnosis.push(`🧪 Environment: ${report.passed}/${report.total} checks passed in ${report.duration_ms} ms`);
+                for (const [name, check] of Object.entries(report.checks)) {
+                    if (!check.ok) {
+                        diagnosis.push(`   ❌ ${name}: ${check.details.join('; ')}${check.hint ? ` (💡 ${check.hint})` : ''}`);
+                    }
+                }
+            } catch (error) {
+                diagnosis.push(`🧪 Environment: ⚠️ Check failed - ${error.message}`);
+            }
+            
             // Check dependencies
             progress.report({ message: "Checking dependencies..." });
             try {
@@ -823,6 +1373,7 @@ async function checkEnvironmentStatus() {
 }
 
 function deactivate() {
+    backendServer.dispose();
     console.log('ABAP AI Code Completion extension is now deactivated');
 }
 
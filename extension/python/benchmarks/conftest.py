@@ -0,0 +1,121 @@
+"""
+Micro-benchmark harness for the backend's pure hot paths
+
+Each benchmark is timed as the best of several rounds and divided by the
+time of a fixed pure-Python calibration loop, so baselines recorded on one
+machine stay comparable on another. A benchmark fails when its relative
+time exceeds baseline * LACC_BENCH_TOLERANCE (default 2.0).
+
+    python -m pytest benchmarks -q                      # check against baselines.json
+    python -m pytest benchmarks -q --update-baselines   # record new baselines
+"""
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+# The backend modules live next to this directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# Keep section counters of the benchmark runs out of the user's stats
+os.environ.setdefault("LACC_CACHE_DIR", str(Path(tempfile.gettempdir()) / "lacc-benchmarks"))
+
+BASELINES_FILE = Path(__file__).with_name("baselines.json")
+TOLERANCE = float(os.getenv("LACC_BENCH_TOLERANCE", "2.0"))
+# Minimum measured time per benchmark, in seconds
+MIN_TIME = float(os.getenv("LACC_BENCH_MIN_TIME", "0.05"))
+# Slow benchmarks stop after this many seconds even with fewer rounds
+MAX_TIME = float(os.getenv("LACC_BENCH_MAX_TIME", "1.0"))
+
+
+def pytest_addoption(parser):
+    parser.addoption("--update-baselines", action="store_true", default=False,
+                     help="Record the measured times as the new benchmark baselines")
+
+
+def _best_of(func, args, min_time: float = MIN_TIME, min_rounds: int = 3) -> float:
+    """Best per-call time in seconds"""
+    best = float("inf")
+    rounds = 0
+    # Like timeit, keep collector pauses out of the measurement
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        while rounds < min_rounds or time.perf_counter() - started < min_time:
+            t0 = time.perf_counter()
+            func(*args)
+            best = min(best, time.perf_counter() - t0)
+            rounds += 1
+            if time.perf_counter() - started > MAX_TIME:
+                break
+    finally:
+        if enabled:
+            gc.enable()
+    return best
+
+
+def _calibration_loop():
+    # String and list work similar to the hot paths, independent of the code under test
+    parts = []
+    for i in range(20000):
+        parts.append(f"DATA lv_{i} TYPE i.".strip().upper())
+    return "\n".join(parts).split("\n")
+
+
+class Benchmark:
+    """Times a function and compares it with its recorded baseline"""
+
+    def __init__(self, update: bool):
+        self.update = update
+        data = json.loads(BASELINES_FILE.read_text(encoding="utf-8")) if BASELINES_FILE.exists() else {}
+        self.baselines = data.get("benchmarks", {})
+        self.results = {}
+
+    @staticmethod
+    def measure(func, args) -> tuple:
+        """Per-call time in seconds and relative to the calibration loop"""
+        # Calibrated next to each benchmark so changes in machine load cancel out
+        calibration = _best_of(_calibration_loop, ())
+        seconds = _best_of(func, args)
+        return seconds, seconds / calibration
+
+    def __call__(self, name: str, func, *args, lines: int = 0):
+        """Run func(*args) repeatedly; fails if slower than baseline * tolerance"""
+        seconds, relative = self.measure(func, args)
+        baseline = self.baselines.get(name, {}).get("relative")
+        limit = baseline * TOLERANCE if baseline is not None else None
+        if not self.update and limit is not None and relative > limit:
+            # A single noisy run is not a regression, so measure once more
+            seconds, relative = min((seconds, relative), self.measure(func, args), key=lambda r: r[1])
+        self.results[name] = {"relative": round(relative, 6), "lines": lines}
+        if self.update or limit is None:
+            return relative
+        throughput = f", {lines / seconds:,.0f} lines/s" if lines and seconds else ""
+        assert relative <= limit, (
+            f"{name} regressed: {relative:.4f} x calibration (baseline {baseline:.4f}, "
+            f"limit {limit:.4f}{throughput})"
+        )
+        return relative
+
+    def save(self):
+        baselines = dict(self.baselines)
+        baselines.update(self.results)
+        data = {
+            "tolerance_default": 2.0,
+            "note": "Times relative to the calibration loop in conftest.py",
+            "benchmarks": dict(sorted(baselines.items())),
+        }
+        BASELINES_FILE.write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+
+
+@pytest.fixture(scope="session")
+def benchmark(request):
+    bench = Benchmark(request.config.getoption("--update-baselines"))
+    yield bench
+    if bench.update:
+        bench.save()
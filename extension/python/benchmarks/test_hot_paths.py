@@ -0,0 +1,92 @@
+"""
+Micro-benchmarks of the pure hot paths on 100 to 100k line inputs
+
+New hot paths (lexing, context extraction, ...) slot in by adding an entry
+to HOT_PATHS and recording its baseline with --update-baselines.
+"""
+import importlib
+import tempfile
+from pathlib import Path
+
+import pytest
+
+import main
+from local_ai_code_completion.abap_lexer import split_statements
+from local_ai_code_completion.ddic import DdicIndex, build_index
+from local_ai_code_completion.minifier import ContextMinifier
+
+# The package shadows the module with its ai_completion instance (None without the API dependencies)
+completion = importlib.import_module("local_ai_code_completion.ai_completion").AICodeCompletion()
+
+SIZES = [100, 1_000, 10_000, 100_000]
+
+_SOURCE_LINES = [
+    "* Read the open items of the customer",
+    "METHOD get_open_items.",
+    "  DATA lt_items TYPE TABLE OF ty_item.",
+    "  SELECT * FROM zitems INTO TABLE @lt_items WHERE kunnr = @iv_kunnr.",
+    "  LOOP AT lt_items INTO DATA(ls_item).",
+    "    rv_total = rv_total + ls_item-netwr. \" running total",
+    "    WRITE: / |Item { ls_item-posnr }|, ls_item-netwr.",
+    "  ENDLOOP.",
+    "",
+    "ENDMETHOD.",
+]
+
+
+def abap_source(lines: int) -> str:
+    """Synthetic ABAP source of the given number of lines"""
+    return "\n".join(_SOURCE_LINES[i % len(_SOURCE_LINES)] for i in range(lines))
+
+
+def model_output(lines: int) -> str:
+    """Synthetic model output: a reasoning block, fences and markdown around ABAP"""
+    return (
+        "<think>\nThe user wants the open items.\n</think>\n"
+        "# Solution\n\n```abap\n" + abap_source(lines) + "\n```\n\n"
+    )
+
+
+def _halves(lines: int):
+    text = abap_source(lines)
+    middle = len(text) // 2
+    return text[:middle], text[middle:]
+
+
+def ddic_index(tables: int):
+    """Index of a synthetic DDIC export with the given number of tables, and a context to look up"""
+    directory = Path(tempfile.mkdtemp(prefix="lacc-ddic-"))
+    source = directory / "dd03l.csv"
+    rows = ["TABNAME,FIELDNAME,KEYFLAG,ROLLNAME,DATATYPE,LENG"]
+    for i in range(tables):
+        rows += [f"ZT{i:06d},MANDT,X,MANDT,CLNT,3", f"ZT{i:06d},KUNNR,,KUNNR,CHAR,10"]
+    source.write_text("\n".join(rows), encoding="utf-8")
+    build_index(str(source), str(directory / "ddic.idx"))
+    index = DdicIndex()
+    index.enabled = True
+    index._map(directory / "ddic.idx", "benchmark")
+    context = "\n".join(f"SELECT * FROM zt{i * 7 % tables:06d} INTO TABLE @DATA(lt_{i}) WHERE kunnr = @lv." for i in range(6))
+    return index, context
+
+
+# name -> (input builder: lines -> args, function)
+HOT_PATHS = {
+    "clean_abap_output": (lambda n: (model_output(n),), main.clean_abap_output),
+    "create_abap_code_prompt": (_halves, main.create_abap_code_prompt),
+    "create_abap_comment_prompt": (lambda n: (*_halves(n), "Sum the net values"), main.create_abap_comment_prompt),
+    "create_abap_debug_prompt": (_halves, main.create_abap_debug_prompt),
+    "create_prompt": (_halves, completion.create_prompt),
+    "line_count": (lambda n: (abap_source(n),), completion.line_count),
+    "find_line": (lambda n: (abap_source(n), n - 1, 0), completion.find_line),
+    "split_statements": (lambda n: (abap_source(n),), split_statements),
+    "minify": (_halves, ContextMinifier().minify),
+    "ddic_context": (lambda n: (*ddic_index(n), ""), lambda index, prefix, suffix: index.context_for(prefix, suffix)),
+}
+
+
+@pytest.mark.parametrize("lines", SIZES)
+@pytest.mark.parametrize("name", sorted(HOT_PATHS))
+def test_hot_path(benchmark, name, lines):
+    build, func = HOT_PATHS[name]
+    args = build(lines)
+    benchmark(f"{name}[{lines}]", func, *args, lines=lines)
@@ -2,127 +2,272 @@
 """
 Simple environment checker for ABAP Code Assistant
 Runs without external dependencies to diagnose basic issues
+
+All probes run concurrently under one overall deadline (LACC_ENV_CHECK_DEADLINE
+seconds); a probe still running at the deadline is reported as timed out.
+Results are cached per interpreter fingerprint, so `python env_check.py --json`
+returns the cached result instantly and only probes again when the interpreter,
+its installed packages or the relevant environment variables changed, or the
+result is older than LACC_ENV_CHECK_TTL seconds. `--refresh` forces a new run.
 """
 import sys
 import os
 import platform
 import subprocess
+import hashlib
+import importlib.util
+import json
+import shutil
+import site
+import sysconfig
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from pathlib import Path
 
-def check_basic_python():
+DEADLINE = float(os.getenv("LACC_ENV_CHECK_DEADLINE", "8"))
+CACHE_TTL = float(os.getenv("LACC_ENV_CHECK_TTL", str(24 * 3600)))
+CACHE_FILE = "env_check.json"
+REQUIRED_PACKAGES = {"groq": "groq", "dotenv": "python-dotenv", "pydantic": "pydantic"}
+
+
+def _remaining(deadline):
+    return max(0.1, deadline - time.monotonic())
+
+
+def _run(cmd, deadline):
+    """Run a command until the deadline; None if it is missing or timed out"""
+    try:
+        return subprocess.run(cmd, capture_output=True, text=True, timeout=_remaining(deadline))
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+
+
+def _result(ok, details, hint=""):
+    return {"ok": ok, "details": details, "hint": hint}
+
+
+def check_basic_python(deadline):
     """Check basic Python installation"""
-    print("🐍 Python Environment Check")
-    print("=" * 40)
-    
-    # Python version
     version = sys.version_info
-    print(f"Python Version: {version.major}.{version.minor}.{version.micro}")
-    
-    if version.major < 3 or (version.major == 3 and version.minor < 8):
-        print("❌ Python 3.8+ is required")
-        return False
-    else:
-        print("✅ Python version is compatible")
-    
-    # Python executable
-    print(f"Python Executable: {sys.executable}")
-    
-    # Platform info
-    print(f"Platform: {platform.platform()}")
-    print(f"Architecture: {platform.architecture()}")
-    
-    return True
-
-def check_pip():
+    details = [
+        f"Python Version: {version.major}.{version.minor}.{version.micro}",
+        f"Python Executable: {sys.executable}",
+        f"Platform: {platform.platform()}",
+        f"Architecture: {platform.architecture()}",
+    ]
+    if version < (3, 8):
+        return _result(False, details, "Python 3.8+ is required")
+    return _result(True, details)
+
+
+def check_pip(deadline):
     """Check pip availability"""
-    print("\n📦 Pip Check")
-    print("-" * 20)
-    
     pip_commands = [
         [sys.executable, "-m", "pip"],
         [sys.executable, "-m", "pip3"],
         ["pip3"],
         ["pip"]
     ]
-    
-    pip_found = False
     for cmd in pip_commands:
-        try:
-            result = subprocess.run(cmd + ["--version"], 
-                                 capture_output=True, text=True, timeout=10)
-            if result.returncode == 0:
-                print(f"✅ Pip found: {' '.join(cmd)}")
-                print(f"  Version: {result.stdout.strip()}")
-                pip_found = True
-                break
-        except:
-            continue
-    
-    if not pip_found:
-        print("❌ Pip not found")
-        print("💡 Install pip: python -m ensurepip --upgrade")
-        return False
-    
-    return True
+        result = _run(cmd + ["--version"], deadline)
+        if result is not None and result.returncode == 0:
+            return _result(True, [f"Pip found: {' '.join(cmd)}", f"Version: {result.stdout.strip()}"])
+    return _result(False, ["Pip not found"], "Install pip: python -m ensurepip --upgrade")
+
+
+def check_conda(deadline):
+    """Check the conda installation and active environment"""
+    conda = os.environ.get("CONDA_EXE") or shutil.which("conda")
+    if not conda:
+        # conda is optional
+        return _result(True, ["Conda: not installed"])
+    details = [f"Conda Executable: {conda}",
+               f"Active Environment: {os.environ.get('CONDA_DEFAULT_ENV', 'none')}"]
+    result = _run([conda, "--version"], deadline)
+    if result is None or result.returncode != 0:
+        return _result(False, details, "conda is on PATH but does not run; check the conda installation")
+    details.append(f"Version: {result.stdout.strip()}")
+    return _result(True, details)
 
-def check_environment_vars():
+
+def check_venv(deadline):
+    """Check the virtual environment and whether new ones can be created"""
+    in_venv = sys.prefix != getattr(sys, "base_prefix", sys.prefix)
+    details = [
+        f"Virtual Environment: {sys.prefix if in_venv else 'not active'}",
+        f"VIRTUAL_ENV: {os.environ.get('VIRTUAL_ENV', 'Not set')}",
+    ]
+    if importlib.util.find_spec("venv") is None or importlib.util.find_spec("ensurepip") is None:
+        return _result(False, details, "venv/ensurepip missing; on Debian/Ubuntu install python3-venv")
+    details.append("venv module: available")
+    return _result(True, details)
+
+
+def check_packages(deadline):
+    """Check that the backend's dependencies are installed, without importing them"""
+    missing = [package for module, package in REQUIRED_PACKAGES.items()
+               if importlib.util.find_spec(module) is None]
+    details = [f"{package}: {'missing' if package in missing else 'installed'}"
+               for package in REQUIRED_PACKAGES.values()]
+    if missing:
+        return _result(False, details, f"Install: {sys.executable} -m pip install {' '.join(missing)}")
+    return _result(True, details)
+
+
+def check_environment_vars(deadline):
     """Check relevant environment variables"""
-    print("\n🔧 Environment Variables")
-    print("-" * 30)
-    
-    env_vars = {
-        'PYTHONPATH': 'Python module search path',
-        'CONDA_DEFAULT_ENV': 'Conda environment',
-        'VIRTUAL_ENV': 'Virtual environment',
-        'PATH': 'System PATH'
-    }
-    
-    for var, desc in env_vars.items():
-        value = os.environ.get(var, 'Not set')
-        if value != 'Not set':
-            print(f"✅ {var}: {value}")
-        else:
-            print(f"ℹ️  {var}: {value}")
-    
-    return True
-
-def check_write_permissions():
-    """Check if we can write to the current directory"""
-    print("\n📝 Write Permissions")
-    print("-" * 25)
-    
+    env_vars = ['PYTHONPATH', 'CONDA_DEFAULT_ENV', 'VIRTUAL_ENV', 'PATH']
+    return _result(True, [f"{var}: {os.environ.get(var, 'Not set')}" for var in env_vars])
+
+
+def check_write_permissions(deadline):
+    """Check if we can write to the extension directory"""
     try:
-        test_file = Path(__file__).parent / "test_write.tmp"
+        test_file = Path(__file__).parent / f"test_write.{os.getpid()}.tmp"
         with open(test_file, 'w') as f:
             f.write("test")
         test_file.unlink()  # Clean up
-        print("✅ Can write to extension directory")
-        return True
+        return _result(True, ["Can write to extension directory"])
     except Exception as e:
-        print(f"❌ Cannot write to extension directory: {e}")
-        print("💡 Try running VS Code as administrator or check permissions")
-        return False
+        return _result(False, [f"Cannot write to extension directory: {e}"],
+                       "Try running VS Code as administrator or check permissions")
+
 
-def check_network():
+def check_network(deadline):
     """Check basic network connectivity"""
-    print("\n🌐 Network Connectivity")
-    print("-" * 25)
-    
     try:
         import urllib.request
-        urllib.request.urlopen('https://api.groq.com', timeout=5)
-        print("✅ Can reach Groq API")
-        return True
+        urllib.request.urlopen('https://api.groq.com', timeout=min(5, _remaining(deadline)))
+        return _result(True, ["Can reach Groq API"])
     except Exception as e:
-        print(f"❌ Cannot reach Groq API: {e}")
-        print("💡 Check your internet connection and firewall settings")
-        return False
+        return _result(False, [f"Cannot reach Groq API: {e}"],
+                       "Check your internet connection and firewall settings")
+
+
+# name -> (title, probe)
+CHECKS = {
+    "python": ("🐍 Python Environment", check_basic_python),
+    "pip": ("📦 Pip", check_pip),
+    "conda": ("🐍 Conda", check_conda),
+    "venv": ("📁 Virtual Environment", check_venv),
+    "packages": ("📚 Dependencies", check_packages),
+    "environment": ("🔧 Environment Variables", check_environment_vars),
+    "write": ("📝 Write Permissions", check_write_permissions),
+    "network": ("🌐 Network Connectivity", check_network),
+}
+
+
+def run_checks(timeout=DEADLINE):
+    """Run all probes concurrently; probes still running at the deadline time out"""
+    started = time.monotonic()
+    deadline = started + timeout
+    executor = ThreadPoolExecutor(max_workers=len(CHECKS), thread_name_prefix="env-check")
+    futures = {name: executor.submit(probe, deadline) for name, (_, probe) in CHECKS.items()}
+    wait(futures.values(), timeout=timeout)
+    # Don't wait for stragglers; their subprocesses are bounded by the same deadline.
+    # Probes that never started are cancelled by hand (shutdown's cancel_futures needs Python 3.9)
+    for future in futures.values():
+        future.cancel()
+    executor.shutdown(wait=False)
+    checks = {}
+    timed_out = []
+    for name, future in futures.items():
+        if not future.done():
+            timed_out.append(name)
+            checks[name] = _result(False, [f"Timed out after {timeout:g}s"], "This check is unusually slow on this machine")
+            continue
+        try:
+            checks[name] = future.result()
+        except Exception as e:
+            checks[name] = _result(False, [f"Check failed with error: {e}"])
+    return {
+        "fingerprint": interpreter_fingerprint(),
+        "checked_at": time.time(),
+        "duration_ms": round((time.monotonic() - started) * 1000),
+        "passed": sum(1 for check in checks.values() if check["ok"]),
+        "total": len(checks),
+        "timed_out": timed_out,
+        "checks": checks,
+    }
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except (OSError, TypeError):
+        return 0
+
+
+def interpreter_fingerprint():
+    """Identity of this interpreter, its installed packages and the relevant environment"""
+    parts = [
+        sys.executable, sys.version, sys.prefix, str(_mtime(sys.executable)),
+        # Installing or removing packages touches the site-packages directories
+        str(_mtime(sysconfig.get_paths().get("purelib"))),
+        str(_mtime(getattr(site, "USER_SITE", None))),
+    ]
+    parts += [os.environ.get(var, "") for var in ("PATH", "PYTHONPATH", "VIRTUAL_ENV", "CONDA_DEFAULT_ENV")]
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def _cache_path():
+    # Same location as the backend cache (local_ai_code_completion.storage), without importing the package
+    cache_dir = os.getenv("LACC_CACHE_DIR", "")
+    path = Path(cache_dir).expanduser() if cache_dir else Path.home() / ".cache" / "abap-code-assistant"
+    try:
+        path.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        path = Path(tempfile.gettempdir()) / "abap-code-assistant"
+        path.mkdir(parents=True, exist_ok=True)
+    return path / CACHE_FILE
+
+
+def load_cached():
+    """The cached result for this interpreter, or None if missing or stale"""
+    try:
+        with open(_cache_path(), "r", encoding="utf-8") as f:
+            report = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(report, dict) or report.get("fingerprint") != interpreter_fingerprint():
+        return None
+    if time.time() - report.get("checked_at", 0) > CACHE_TTL:
+        return None
+    return report
+
+
+def save_cached(report):
+    path = _cache_path()
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f".{CACHE_FILE}.", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(report, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+def get_report(refresh=False):
+    """Cached result if still valid, else a fresh run"""
+    if not refresh:
+        report = load_cached()
+        if report is not None:
+            report["cached"] = True
+            return report
+    report = run_checks()
+    # An incomplete result is not worth keeping; the next run probes again
+    if not report["timed_out"]:
+        save_cached(report)
+    report["cached"] = False
+    return report
+
 
 def create_install_script():
     """Create a simple installation script"""
     print("\n📝 Creating Installation Script")
     print("-" * 35)
-    
+
     script_content = f"""#!/bin/bash
 # ABAP Code Assistant - Dependency Installer
 # Run this script to install dependencies
@@ -140,51 +285,59 @@ echo "Installation failed"
 
 echo "Done!"
 """
-    
+
     try:
         script_path = Path(__file__).parent / "install_deps.sh"
         with open(script_path, 'w') as f:
             f.write(script_content)
-        
+
         # Make executable on Unix systems
         if platform.system() != "Windows":
             os.chmod(script_path, 0o755)
-        
+
         print(f"✅ Created install script: {script_path}")
         return True
     except Exception as e:
         print(f"❌ Failed to create install script: {e}")
         return False
 
-def main():
+
+def print_report(report):
+    """Print a report in the human-readable format"""
+    for name, (title, _) in CHECKS.items():
+        check = report["checks"].get(name)
+        if check is None:
+            continue
+        print(f"\n{title}")
+        print("-" * 30)
+        for detail in check["details"]:
+            print(f"{'✅' if check['ok'] else '❌'} {detail}")
+        if check["hint"]:
+            print(f"💡 {check['hint']}")
+
+
+def main(argv=None):
     """Main function"""
-    checks = [
-        check_basic_python,
-        check_pip,
-        check_environment_vars,
-        check_write_permissions,
-        check_network
-    ]
-    
-    results = []
-    for check in checks:
-        try:
-            result = check()
-            results.append(result)
-        except Exception as e:
-            print(f"❌ Check failed with error: {e}")
-            results.append(False)
-    
+    args = sys.argv[1:] if argv is None else argv
+    if "--json" in args:
+        # Fast path for the extension: cached unless --refresh
+        print(json.dumps(get_report(refresh="--refresh" in args)))
+        return
+
+    # Interactive runs always probe again
+    report = get_report(refresh=True)
+    print_report(report)
+
     # Summary
     print("\n" + "=" * 50)
     print("📊 CHECK SUMMARY")
     print("=" * 50)
-    
-    passed = sum(results)
-    total = len(results)
-    
-    print(f"Passed: {passed}/{total}")
-    
+
+    passed = report["passed"]
+    total = report["total"]
+
+    print(f"Passed: {passed}/{total} ({report['duration_ms']} ms)")
+
     if passed == total:
         print("🎉 All checks passed! Your environment looks good.")
         print("💡 Try running the extension now.")
@@ -195,10 +348,10 @@ def main():
         print("3. If Python/pip issues: Install Python 3.8+ and pip")
         print("4. If permission issues: Run VS Code as administrator")
         print("5. If network issues: Check firewall and internet connection")
-        
+
         # Create helpful files
         create_install_script()
-    
+
     print("\n💡 For more help, run: python check_dependencies.py")
 
 if __name__ == "__main__":
@@ -9,18 +9,20 @@ __version__ = "1.0.0"
 __author__ = "Python Migration"
 __email__ = "python@example.com"
 
+# The logger only needs the standard library, so it is always available
+from .logger import logger
+
 # Import with error handling for missing dependencies
 try:
     from .config import config
-    from .logger import logger
     from .setup import setup
     from .ai_completion import ai_completion
     
     __all__ = ["config", "logger", "setup", "ai_completion"]
 except ImportError as e:
     # If dependencies are missing, create placeholder objects
-    print(f"Warning: Some dependencies are missing: {e}")
-    print("Please run the setup command to install dependencies.")
+    logger.warning(f"Some dependencies are missing: {e}")
+    logger.warning("Please run the setup command to install dependencies.")
     
     # Create placeholder objects
     class PlaceholderConfig:
@@ -35,7 +37,6 @@ except ImportError as e:
             })()
     
     config = PlaceholderConfig()
-    logger = None
     setup = None
     ai_completion = None
     
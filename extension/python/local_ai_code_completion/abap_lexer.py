@@ -0,0 +1,178 @@
+"""
+ABAP lexer module for Local AI Code Completion
+Splits ABAP source into tokens and statements for local analysis
+"""
+import re
+from typing import Iterator, List, NamedTuple
+
+# Token kinds
+WORD = "word"
+STRING = "string"
+UNTERMINATED = "unterminated"   # literal cut off at the end of a line
+COMMENT = "comment"
+PERIOD = "period"
+COLON = "colon"
+COMMA = "comma"
+
+_TOKEN_RE = re.compile(r"""
+      (?P<ws>[ \t\r\f\v]+)
+    | (?P<newline>\n)
+    | (?P<comment>"[^\n]*)
+    | (?P<string>'(?:[^'\n]|'')*'|`(?:[^`\n]|``)*`)
+    | (?P<unterminated>['`][^\n]*)
+    | (?P<template>\|)
+    | (?P<period>\.)
+    | (?P<colon>:)
+    | (?P<comma>,)
+    | (?P<word>[^\s.,:'"`|]+)
+""", re.VERBOSE)
+
+
+class Token(NamedTuple):
+    """A lexical token with its 0-based line and column"""
+    kind: str
+    text: str
+    line: int
+    col: int
+
+
+class Statement:
+    """An ABAP statement: the tokens up to and including its period"""
+    __slots__ = ("tokens", "comments", "terminated")
+
+    def __init__(self):
+        self.tokens: List[Token] = []
+        self.comments: List[Token] = []
+        self.terminated = False
+
+    @property
+    def start_line(self) -> int:
+        return self.tokens[0].line if self.tokens else -1
+
+    @property
+    def end_line(self) -> int:
+        return self.tokens[-1].line if self.tokens else -1
+
+    @property
+    def words(self) -> List[str]:
+        """Upper-cased word tokens, the way ABAP keywords compare"""
+        return [t.text.upper() for t in self.tokens if t.kind == WORD]
+
+    @property
+    def keyword(self) -> str:
+        """The statement's leading keyword"""
+        for token in self.tokens:
+            if token.kind == WORD:
+                return token.text.upper()
+            if token.kind != COMMENT:
+                break
+        return ""
+
+    @property
+    def is_chained(self) -> bool:
+        return any(t.kind == COLON for t in self.tokens)
+
+    def text(self) -> str:
+        """Normalized statement text without comments"""
+        parts = []
+        for token in self.tokens:
+            if token.kind in (PERIOD, COMMA, COLON) and parts:
+                parts[-1] += token.text
+            else:
+                parts.append(token.text)
+        return " ".join(parts)
+
+    def __repr__(self) -> str:
+        return f"Statement({self.text()!r})"
+
+
+def _scan_template(code: str, pos: int) -> int:
+    """Return the end of a |string template| starting at pos, or -1 if unclosed"""
+    depth = 0
+    i = pos + 1
+    length = len(code)
+    while i < length:
+        ch = code[i]
+        if ch == "\n":
+            return -1
+        if ch == "\\":
+            i += 2
+            continue
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth = max(0, depth - 1)
+        elif ch == "|" and depth == 0:
+            return i + 1
+        i += 1
+    return -1
+
+
+def tokenize(code: str) -> Iterator[Token]:
+    """Yield the tokens of ABAP source, including comments"""
+    pos = 0
+    line = 0
+    line_start = 0
+    length = len(code)
+    match = _TOKEN_RE.match
+
+    while pos < length:
+        # A '*' in the first column starts a full-line comment
+        if pos == line_start and code[pos] == "*":
+            end = code.find("\n", pos)
+            end = length if end == -1 else end
+            yield Token(COMMENT, code[pos:end], line, 0)
+            pos = end
+            continue
+
+        m = match(code, pos)
+        if m is None:
+            # Unreachable with the catch-all word pattern, but never loop forever
+            pos += 1
+            continue
+        kind = m.lastgroup
+        end = m.end()
+        if kind == "newline":
+            line += 1
+            line_start = end
+        elif kind == "template":
+            close = _scan_template(code, pos)
+            if close == -1:
+                close = code.find("\n", pos)
+                close = length if close == -1 else close
+                yield Token(UNTERMINATED, code[pos:close], line, pos - line_start)
+            else:
+                yield Token(STRING, code[pos:close], line, pos - line_start)
+            end = close
+        elif kind != "ws":
+            yield Token(kind, m.group(), line, pos - line_start)
+        pos = end
+
+
+def split_statements(code: str) -> List[Statement]:
+    """Split ABAP source into statements; the last one may be unterminated"""
+    statements: List[Statement] = []
+    current = Statement()
+    for token in tokenize(code):
+        if token.kind == COMMENT:
+            current.comments.append(token)
+            continue
+        current.tokens.append(token)
+        if token.kind == PERIOD:
+            current.terminated = True
+            statements.append(current)
+            current = Statement()
+    if current.tokens:
+        statements.append(current)
+    return statements
+
+
+def strip_comments(code: str) -> str:
+    """Remove full-line and trailing comments, keeping line structure"""
+    lines = code.split("\n")
+    for token in tokenize(code):
+        if token.kind == COMMENT:
+            text = lines[token.line]
+            lines[token.line] = text[:token.col].rstrip()
+    return "\n".join(lines)
+
@@ -1,87 +1,91 @@
 """
 AI Code Completion module
-Handles code generation using Groq API
+Handles code generation through the configured model providers
 """
 import asyncio
-import json
-import time
-from typing import AsyncGenerator, Optional, Dict, Any
 import os
+import threading
+import time
+from typing import AsyncGenerator, Optional
 
 # Conditional import to handle missing dependencies
-try:
-    import groq
-    GROQ_AVAILABLE = True
-except ImportError:
-    GROQ_AVAILABLE = False
-    print("Warning: groq package not available. Please install dependencies.")
+from .logger import logger
 
 try:
     from .config import config
-    from .logger import logger
 except ImportError as e:
-    print(f"Warning: Could not import config or logger: {e}")
+    logger.warning(f"Could not import config: {e}")
     config = None
-    logger = None
+
+from .profiling import run_section
+from .reasoning import ThinkFilter
+from .stats import stats
+
+# Each subsystem below is optional for generation: a broken one only turns off its own feature
+try:
+    from .providers import ProviderError, Usage, is_rejected_request, model_name, provider_name, providers
+except Exception as e:
+    logger.warning(f"Could not import providers: {e}")
+    providers = None
+
+try:
+    from .governor import governor
+except Exception as e:
+    logger.warning(f"Could not import governor: {e}")
+    governor = None
+
+try:
+    from .overlap import OverlapDetector
+except Exception as e:
+    logger.warning(f"Could not import overlap detection: {e}")
+    OverlapDetector = None
+
+try:
+    from .prefetch import rate_budget
+except Exception as e:
+    logger.warning(f"Could not import prefetch: {e}")
+    rate_budget = None
+
+try:
+    from .router import router
+except Exception as e:
+    logger.warning(f"Could not import router: {e}")
+    router = None
+
+try:
+    from .scheduler import CancellationToken, scheduler
+except Exception as e:
+    logger.warning(f"Could not import scheduler: {e}")
+    CancellationToken = scheduler = None
+
+try:
+    from .tracing import tracer
+except Exception as e:
+    logger.warning(f"Could not import tracing: {e}")
+    tracer = None
+
+# Ask thinking models to skip or hide their reasoning where the API allows it
+HIDE_REASONING = os.getenv("LACC_HIDE_REASONING", "1") != "0"
 
 
 class AICodeCompletion:
-    """Handles AI code completion using Groq API"""
+    """Handles AI code completion using the configured provider"""
     
-    def __init__(self):
-        if not GROQ_AVAILABLE:
-            print("Error: groq package not available. Please install dependencies.")
-            self.model_config = None
-            self.is_generating = False
-            self.is_aborted = False
-            self.client = None
-            return
-
-        if config:
-            self.model_config = config.get_model_config()
-        else:
-            self.model_config = None
-        self.is_generating = False
-        self.is_aborted = False
-        self.client = None  # Initialize client lazily
+    @property
+    def model_config(self):
+        """Model configuration of the current config snapshot"""
+        return config.get_model_config() if config else None
     
-    def _get_client(self):
-        """Get or initialize the Groq client"""
-        if not GROQ_AVAILABLE:
-            print("Error: groq package not available. Please install dependencies.")
+    def _get_provider(self, model_config, mode: str = "code"):
+        """Get the provider configured for a mode, or None if it can't be used"""
+        if providers is None:
+            logger.error("No model providers available in this installation")
             return None
-            
-        if self.client is not None:
-            return self.client
-        
-        # Allow fallback to environment variable if config doesn't provide api_key
-        api_key = None
-        try:
-            api_key = self.model_config.api_key if self.model_config and getattr(self.model_config, 'api_key', None) else os.getenv('GROQ_API_KEY', None)
-        except Exception:
-            api_key = os.getenv('GROQ_API_KEY', None)
-
-        if not api_key:
-            print("No Groq API key provided. Set GROQ_API_KEY environment variable or update config.")
-            return None
-        
+        name = provider_name(model_config, mode)
         try:
-            # Initialize with minimal parameters to avoid compatibility issues
-            self.client = groq.Groq(api_key=api_key)
-            return self.client
-        except TypeError as e:
-            # Handle version compatibility issues
-            print(f"Groq client initialization issue: {e}")
-            print("Trying alternative initialization...")
-            try:
-                # Try without any additional parameters
-                self.client = groq.Groq(api_key=api_key)
-                return self.client
-            except Exception as e2:
-                print(f"Failed to initialize Groq client: {e2}")
-                return None
-        except Exception as e:
-            print(f"Failed to initialize Groq client: {e}")
+            return providers.get(model_config, name)
+        except ProviderError as e:
+            logger.error(str(e))
             return None
     
     def create_prompt(self, prefix: str, suffix: str) -> str:
@@ -90,132 +94,242 @@ class AICodeCompletion:
     
     def line_count(self, text: str) -> int:
         """Count the number of lines in text"""
-        return len(text.split('\n')) - 1
+        return text.count('\n')
     
     def find_line(self, text: str, end_line: int, start_line: int) -> str:
         """Find the line at the specified position"""
-        text_lines = text.split('\n')
         index = end_line - start_line
-        return text_lines[index] if index < len(text_lines) else ""
+        if index < 0:
+            return ""
+        # Walk to the line instead of splitting the whole text
+        pos = 0
+        for _ in range(index):
+            pos = text.find('\n', pos)
+            if pos == -1:
+                return ""
+            pos += 1
+        end = text.find('\n', pos)
+        return text[pos:] if end == -1 else text[pos:end]
     
-    async def generate_code_stream(self, prefix: str, suffix: str) -> AsyncGenerator[str, None]:
+    async def generate_code_stream(self, prefix: str, suffix: str,
+                                   token: Optional[CancellationToken] = None) -> AsyncGenerator[str, None]:
         """Generate code using streaming API"""
-        if not GROQ_AVAILABLE:
-            print("Error: groq package not available. Please install dependencies.")
-            return
-            
-        client = self._get_client()
-        if not client:
-            print("Groq client not initialized. Please set GROQ_API_KEY environment variable.")
-            return
-        
-        prompt = self.create_prompt(prefix, suffix)
-        
-        try:
-            stream = client.chat.completions.create(
-                model=self.model_config.name,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=self.model_config.temperature,
-                top_p=self.model_config.top_p,
-                max_tokens=1000,
-                stream=True
-            )
-            
-            for chunk in stream:
-                if self.is_aborted:
-                    print("Code generation aborted")
-                    break
-                
-                if chunk.choices[0].delta.content:
-                    content = chunk.choices[0].delta.content
-                    # Remove end of sequence token and trailing spaces
-                    stripped_content = content.replace("<EOT>", "").rstrip()
-                    if stripped_content:
-                        yield stripped_content
-                        
-        except Exception as e:
-            print(f"Error during code generation: {e}")
+        async for content in self.stream_code_with_prompt(self.create_prompt(prefix, suffix), token=token):
+            # Remove trailing spaces
+            stripped_content = content.rstrip()
+            if stripped_content:
+                yield stripped_content
     
-    async def generate_code(self, prefix: str, suffix: str) -> str:
+    async def generate_code(self, prefix: str, suffix: str,
+                            token: Optional[CancellationToken] = None) -> str:
         """Generate complete code (non-streaming)"""
-        if not GROQ_AVAILABLE:
-            print("Error: groq package not available. Please install dependencies.")
-            return ""
-            
-        client = self._get_client()
-        if not client:
-            print("Groq client not initialized. Please set GROQ_API_KEY environment variable.")
-            return ""
-        
-        prompt = self.create_prompt(prefix, suffix)
-        
-        try:
-            response = client.chat.completions.create(
-                model=self.model_config.name,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                temperature=self.model_config.temperature,
-                top_p=self.model_config.top_p,
-                max_tokens=1000
-            )
-            
-            content = response.choices[0].message.content
-            return content.replace("<EOT>", "").rstrip() if content else ""
-                
-        except Exception as e:
-            print(f"Error during code generation: {e}")
-            return ""
+        return await self.generate_code_with_prompt(self.create_prompt(prefix, suffix), token)
     
     def abort_generation(self):
-        """Abort current generation"""
-        self.is_aborted = True
-        print("Code generation aborted")
-    
-    def reset_state(self):
-        """Reset generation state"""
-        self.is_generating = False
-        self.is_aborted = False
+        """Abort all requests in flight"""
+        count = scheduler.cancel_all("aborted") if scheduler else 0
+        logger.info(f"Code generation aborted ({count} requests)")
     
-    async def generate_code_with_prompt(self, prompt: str) -> str:
+    async def generate_code_with_prompt(self, prompt: str, token: Optional[CancellationToken] = None,
+                                        mode: str = "code", overlap: Optional[OverlapDetector] = None) -> str:
         """Generate code using a custom prompt"""
-        if not GROQ_AVAILABLE:
-            print("Error: groq package not available. Please install dependencies.")
-            return ""
-            
-        client = self._get_client()
-        if not client:
-            print("Groq client not initialized. Please set GROQ_API_KEY environment variable.")
-            return ""
+        # Streamed internally so a cancelled request also stops the upstream call
+        parts = [content async for content in self.stream_code_with_prompt(prompt, token=token, mode=mode,
+                                                                           overlap=overlap)]
+        return "".join(parts).rstrip()
 
-        try:
-            response = client.chat.completions.create(
-                model=self.model_config.name,
-                messages=[
+    async def stream_code_with_prompt(self, prompt: str, temperature: Optional[float] = None,
+                                      max_tokens: int = 1000,
+                                      token: Optional[CancellationToken] = None,
+                                      mode: str = "code",
+                                      overlap: Optional[OverlapDetector] = None) -> AsyncGenerator[str, None]:
+        """Stream code for a custom prompt; closing the generator stops the upstream call"""
+        # Keep using this snapshot even if the config is reloaded meanwhile
+        model_config = self.model_config
+        provider = self._get_provider(model_config, mode)
+        if not provider:
+            return
+        if provider.name == "groq" and router:
+            # Pick the model expected to meet the latency target of this mode
+            model = router.choose(model_config, mode, len(prompt))
+        else:
+            model = model_name(model_config, provider.name)
+        # Close to the token quota: shorter answers, then a cheaper model
+        plan = governor.plan(provider.name, model_config) if governor else None
+        if plan and plan.level:
+            stats.increment(f"governor.level{plan.level}")
+            if plan.max_tokens:
+                max_tokens = min(max_tokens, plan.max_tokens)
+            if plan.model:
+                model = plan.model
+            logger.info(f"Token governor level {plan.level}: model {model}, max_tokens {max_tokens}")
+        if overlap is not None:
+            overlap.max_tokens = max_tokens
+        
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        done = object()
+        usage = Usage()
+        failed = threading.Event()
+        
+        def put(item):
+            try:
+                loop.call_soon_threadsafe(chunks.put_nowait, item)
+            except RuntimeError:
+                # The loop is already closed
+                stop.set()
+        
+        def open_stream(extra):
+            return provider.stream(
+                model,
+                [
                     {
                         "role": "user",
                         "content": prompt
                     }
                 ],
-                temperature=self.model_config.temperature,
-                top_p=self.model_config.top_p,
-                max_tokens=1000
+                usage=usage,
+                temperature=model_config.temperature if temperature is None else temperature,
+                top_p=model_config.top_p,
+                max_tokens=max_tokens,
+                **extra
             )
-
-            content = response.choices[0].message.content
-            return content.replace("<EOT>", "").rstrip() if content else ""
-
-        except Exception as e:
-            print(f"Error during code generation: {e}")
-            return ""
+        
+        def pump():
+            # Provider streams block, so they are read in a thread and fed to the loop
+            stream = None
+            extra = provider.reasoning_params(model) if HIDE_REASONING else {}
+            received = False
+            try:
+                while True:
+                    stream = open_stream(extra)
+                    try:
+                        for content in stream:
+                            if stop.is_set():
+                                break
+                            received = True
+                            put(content)
+                        break
+                    except Exception as e:
+                        if received or not extra or stop.is_set() or not is_rejected_request(e):
+                            raise
+                        # The model refused the reasoning options; ask again without them
+                        provider.reject_reasoning(model)
+                        extra = {}
+                        stream.close()
+            except Exception as e:
+                if not stop.is_set():
+                    failed.set()
+                    logger.error(f"Error during code generation ({provider.name}): {e}")
+            finally:
+                # Closing the stream drops the HTTP connection of a cancelled request
+                if stream is not None:
+                    try:
+                        stream.close()
+                    except Exception:
+                        pass
+                put(done)
+        
+        if token is not None:
+            if token.cancelled:
+                return
+            if token.expired:
+                # No time left for an API call
+                token.truncated = True
+                stats.increment("deadline.truncated")
+                return
+            # The thread stops between chunks; the consumer stops right away
+            token.add_callback(stop.set)
+            token.add_callback(lambda: put(done))
+        # Recorded when LACC_TRACE is on and this call serves a traced request
+        call = tracer.call(
+            provider.name, model, len(prompt), max_tokens,
+            getattr(model_config, "local_api_key" if provider.name == "local" else "api_key", "")
+        ) if tracer else None
+        # Fallback for models that still stream <think> blocks
+        think = ThinkFilter()
+        start = time.perf_counter()
+        first = None
+        chars = 0
+        if rate_budget:
+            rate_budget.record()
+        loop.run_in_executor(None, run_section, "api_call", pump)
+        truncated = False
+        try:
+            while True:
+                remaining = token.remaining() if token is not None else None
+                try:
+                    item = await (chunks.get() if remaining is None else asyncio.wait_for(chunks.get(), remaining))
+                except asyncio.TimeoutError:
+                    # Out of time: keep what streamed so far and stop the upstream call
+                    truncated = token.truncated = True
+                    stop.set()
+                    stats.increment("deadline.truncated")
+                    logger.info(f"Request {token.request_id} reached its deadline after {chars} streamed characters")
+                    item = done
+                if item is done:
+                    content = think.flush()
+                else:
+                    chars += len(item)
+                    if call is not None:
+                        call.chunk(len(item))
+                    content = think.feed(item)
+                content = content.replace("<EOT>", "")
+                # Time to the first useful output, not to the first reasoning token
+                if content and first is None:
+                    first = time.perf_counter()
+                if overlap is not None:
+                    # Passes whole lines once they can't be a copy of the surrounding code
+                    content = overlap.feed(content) + (overlap.flush() if item is done else "")
+                if content:
+                    yield content
+                if item is done:
+                    break
+                if overlap is not None and overlap.stopped:
+                    # Everything from here on repeats the suffix; stop paying for it
+                    logger.debug("Output started repeating the code after the cursor; stream stopped")
+                    break
+        finally:
+            # Stopping on overlap is a normal end, not a cancellation; a deadline stop still
+            # tells the router how slow the model was
+            cancelled = stop.is_set() and not truncated and not (overlap is not None and overlap.stopped)
+            stop.set()
+            if not cancelled and router:
+                end = time.perf_counter()
+                router.record(
+                    model,
+                    len(prompt),
+                    ((first or end) - start) * 1000,
+                    # Fall back to ~4 characters per token when no usage is reported
+                    usage.completion_tokens or chars // 4,
+                    (end - (first or end)) * 1000,
+                    error=failed.is_set() or first is None,
+                )
+            # Estimated like the router's tokens when the server reports no usage
+            if governor:
+                governor.record(
+                    provider.name,
+                    (usage.prompt_tokens + usage.completion_tokens) or (len(prompt) + chars) // 4
+                )
+            if call is not None:
+                call.finish(
+                    usage.prompt_tokens,
+                    usage.completion_tokens,
+                    "error" if failed.is_set() else "truncated" if truncated else "cancelled" if cancelled else "ok"
+                )
+            stats.increment(f"usage.{provider.name}.requests")
+            stats.increment(f"usage.{provider.name}.prompt_tokens", usage.prompt_tokens)
+            stats.increment(f"usage.{provider.name}.completion_tokens", usage.completion_tokens)
+            # Reasoning overhead: reported by the server, else estimated from filtered text
+            reasoning = usage.reasoning_tokens or think.reasoning_chars // 4
+            stats.increment("reasoning.requests")
+            if reasoning:
+                stats.increment("reasoning.with_reasoning")
+                stats.increment("reasoning.tokens", reasoning)
+                stats.increment("reasoning.filtered_blocks", think.blocks)
+                logger.debug(f"Reasoning overhead of {model}: {reasoning} tokens, "
+                             f"{think.blocks} think blocks filtered")
 
 
 # Global AI completion instance
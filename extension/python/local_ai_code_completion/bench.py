@@ -0,0 +1,81 @@
+"""
+Benchmark module for Local AI Code Completion
+Measures latency and throughput of a provider with the same ABAP prompts
+"""
+import statistics
+import time
+from typing import Any, Dict, List, Optional
+
+from .providers import Provider, Usage, model_name, providers
+
+# Small, representative requests for each mode
+BENCH_PROMPTS = {
+    "code": "Complete this ABAP code. Return ONLY ABAP code.\n\n"
+            "DATA: lt_mara TYPE TABLE OF mara.\nSELECT * FROM mara INTO TABLE lt_mara UP TO 10 ROWS.\nLOOP AT lt_mara",
+    "comment": "Generate ABAP code for this comment. Return ONLY ABAP code.\n\n"
+               "\" Read all open sales orders of a customer and sum their net values",
+    "debug": "Add debugging statements to this ABAP code. Return ONLY ABAP code.\n\n"
+             "METHOD get_total.\n  LOOP AT mt_items INTO DATA(ls_item).\n    rv_total = rv_total + ls_item-netwr.\n  ENDLOOP.\nENDMETHOD.",
+}
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_once(provider: Provider, model: str, prompt: str, max_tokens: int = 256,
+             temperature: float = 0.3) -> Dict[str, Any]:
+    """Stream one completion and time it"""
+    usage = Usage()
+    start = time.perf_counter()
+    first = None
+    chars = 0
+    stream = provider.stream(model, [{"role": "user", "content": prompt}], usage=usage,
+                             temperature=temperature, max_tokens=max_tokens)
+    try:
+        for content in stream:
+            if first is None:
+                first = time.perf_counter()
+            chars += len(content)
+    finally:
+        stream.close()
+    end = time.perf_counter()
+    ttft = (first or end) - start
+    # Fall back to ~4 characters per token when the server reports no usage
+    tokens = usage.completion_tokens or max(1, chars // 4)
+    generation = end - (first or start)
+    return {
+        "ttft_ms": round(ttft * 1000, 1),
+        "total_ms": round((end - start) * 1000, 1),
+        "tokens": tokens,
+        "tokens_per_sec": round(tokens / generation, 1) if generation > 0 else 0.0,
+    }
+
+
+def run_benchmark(model_config, provider: str, runs: int = 3, modes: Optional[List[str]] = None,
+                  model: Optional[str] = None) -> Dict[str, Any]:
+    """Run every benchmark prompt against a provider and summarize per mode"""
+    instance = providers.get(model_config, provider)
+    model = model or model_name(model_config, provider)
+    report: Dict[str, Any] = {"provider": provider, "model": model, "runs": runs, "modes": {}}
+    for mode in modes or list(BENCH_PROMPTS):
+        results, errors = [], []
+        for _ in range(runs):
+            try:
+                results.append(run_once(instance, model, BENCH_PROMPTS[mode], temperature=model_config.temperature))
+            except Exception as e:
+                errors.append(str(e))
+        ttft = [r["ttft_ms"] for r in results]
+        total = [r["total_ms"] for r in results]
+        report["modes"][mode] = {
+            "ok": len(results),
+            "errors": errors[:3],
+            "ttft_ms_p50": _percentile(ttft, 0.5),
+            "ttft_ms_p95": _percentile(ttft, 0.95),
+            "total_ms_p50": _percentile(total, 0.5),
+            "tokens_per_sec": round(statistics.mean(r["tokens_per_sec"] for r in results), 1) if results else 0.0,
+        }
+    return report
@@ -0,0 +1,150 @@
+"""
+Candidates module for Local AI Code Completion
+
+Starts several completions for one request concurrently with varied
+temperature, checks each with the local ABAP validator as its stream
+finishes and returns the first valid one. The other candidates are
+cancelled; the ones that finished are cached as alternatives the editor
+can cycle through without new calls.
+"""
+import asyncio
+import hashlib
+import os
+from typing import AsyncIterator, Callable, List, Optional, Set, Tuple
+
+from .logger import logger
+from .memory import BoundedCache
+from .stats import stats
+from .validator import validate_abap
+
+# Number of suffix characters that identify a request's context
+SUFFIX_HEAD_LENGTH = 512
+
+
+def candidate_count(mode: str, requested: int = 0) -> int:
+    """Number of candidates for a request (LACC_CANDIDATES applies to comment mode)"""
+    if requested > 0:
+        return min(requested, 8)
+    if mode != "comment":
+        return 1
+    try:
+        return max(1, min(int(os.getenv("LACC_CANDIDATES", "1")), 8))
+    except ValueError:
+        return 1
+
+
+def candidate_temperatures(base: float, count: int, step: float = 0.2) -> List[float]:
+    """Spread temperatures upwards from the configured one"""
+    return [round(min(1.0, base + i * step), 2) for i in range(count)]
+
+
+def request_key(file_path: str, mode: str, prefix: str, suffix: str, comment: str = "") -> str:
+    """Identify a request's context without keeping the text"""
+    digest = hashlib.sha1()
+    for part in (prefix, suffix[:SUFFIX_HEAD_LENGTH], comment):
+        digest.update(part.encode("utf-8", "surrogatepass"))
+        digest.update(b"\0")
+    return f"{mode}:{file_path}:{digest.hexdigest()}"
+
+
+class CandidateRace:
+    """Runs concurrent candidates and keeps the first valid one"""
+
+    def __init__(self, stream: Callable[[float], AsyncIterator[str]],
+                 clean: Callable[[str], str], prefix: str = "", suffix: str = "",
+                 grace: float = 0.0):
+        # stream(temperature) yields the chunks of one candidate
+        self.stream = stream
+        self.clean = clean
+        self.prefix = prefix
+        self.suffix = suffix
+        # Seconds the losing candidates may still finish as alternatives
+        self.grace = grace
+        self.finished: List[Tuple[str, bool]] = []
+        self._pending: Set[asyncio.Future] = set()
+
+    async def _candidate(self, temperature: float) -> Tuple[str, bool]:
+        """Collect one candidate and check it as soon as its stream finished"""
+        parts = []
+        async for chunk in self.stream(temperature):
+            parts.append(chunk)
+        code = self.clean("".join(parts))
+        if not code:
+            return "", False
+        result = validate_abap(code, self.prefix, self.suffix)
+        # Trivial issues are repaired locally, so the candidate still counts as valid
+        candidate = (result.repaired_code, not result.needs_model)
+        self.finished.append(candidate)
+        return candidate
+
+    async def run(self, temperatures: List[float]) -> Optional[str]:
+        """Return the first valid candidate, or the first finished one if none is valid"""
+        stats.increment("candidates.races")
+        stats.increment("candidates.started", len(temperatures))
+        pending = {asyncio.ensure_future(self._candidate(t)) for t in temperatures}
+        winner = None
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled() or task.exception() is not None:
+                        continue
+                    code, valid = task.result()
+                    if valid and winner is None:
+                        winner = code
+        finally:
+            self._pending = pending
+            if self.grace <= 0:
+                self._cancel()
+
+        if winner is None:
+            stats.increment("candidates.no_valid")
+            logger.debug("No candidate passed validation")
+            return self.finished[0][0] if self.finished else None
+        return winner
+
+    def _cancel(self):
+        """Cancel the candidates still streaming"""
+        for task in self._pending:
+            task.cancel()
+        stats.increment("candidates.cancelled", len(self._pending))
+        self._pending = set()
+
+    async def settle(self):
+        """Let the losing candidates finish within the grace period, then cancel them"""
+        if self._pending:
+            await asyncio.wait(self._pending, timeout=self.grace)
+            for task in self._pending:
+                if task.done() and not task.cancelled() and task.exception() is not None:
+                    logger.debug(f"Candidate failed: {task.exception()}")
+            self._pending = {task for task in self._pending if not task.done()}
+        self._cancel()
+
+    def alternatives(self, winner: Optional[str]) -> List[str]:
+        """Finished candidates other than the winner, valid ones first"""
+        ordered = [code for code, valid in self.finished if valid] + \
+                  [code for code, valid in self.finished if not valid]
+        result = []
+        for code in ordered:
+            if code != winner and code not in result:
+                result.append(code)
+        return result
+
+
+class AlternativesCache:
+    """Keeps the alternatives of recent multi-candidate requests in memory"""
+
+    def __init__(self, max_bytes: int = 2 * 1024 * 1024):
+        self._cache = BoundedCache("alternatives", max_bytes)
+
+    def store(self, key: str, winner: str, alternatives: List[str]):
+        if alternatives:
+            self._cache.put(key, [winner] + alternatives)
+
+    def get(self, key: str) -> List[str]:
+        """All candidates of a request, the shown one first"""
+        return list(self._cache.get(key) or [])
+
+
+# Global alternatives cache instance
+alternatives_cache = AlternativesCache()
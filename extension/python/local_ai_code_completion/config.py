@@ -1,42 +1,275 @@
 """
 Configuration module for Local AI Code Completion
+
+Configuration is loaded into immutable snapshots. Long-running backends run a
+ConfigWatcher that polls the .env and settings files and atomically swaps in a
+new snapshot when they change; requests keep the snapshot they started with.
 """
+import json
 import os
-from typing import Optional
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
 from pydantic import BaseModel, Field
-from dotenv import load_dotenv
+from dotenv import dotenv_values, find_dotenv, load_dotenv
+
+try:
+    from pydantic import ConfigDict
+    PYDANTIC_V2 = True
+except ImportError:
+    ConfigDict = None
+    PYDANTIC_V2 = False
 
-# Load environment variables from .env file
+# Values set by the caller's environment take precedence over .env and
+# settings files, like load_dotenv(override=False) does. Capture them before
+# load_dotenv mixes file values into os.environ.
+_PROCESS_ENV = dict(os.environ)
+
+# Load environment variables from .env file (for settings read directly from os.environ)
 load_dotenv()
 
+# Settings read into the model configuration
+MODEL_SETTINGS = (
+    "LACC_MODEL_NAME",
+    "LACC_TEMPERATURE",
+    "LACC_TOP_P",
+    "LACC_TIMEOUT",
+    "GROQ_API_KEY",
+    "GROQ_BASE_URL",
+    "LACC_PROVIDER",
+    "LACC_PROVIDER_CODE",
+    "LACC_PROVIDER_COMMENT",
+    "LACC_PROVIDER_DEBUG",
+    "LACC_LOCAL_BASE_URL",
+    "LACC_LOCAL_MODEL",
+    "LACC_LOCAL_API_KEY",
+    "LACC_ROUTER_MODELS",
+    "LACC_GOVERNOR_MODEL",
+    "LACC_LATENCY_TARGET_CODE_MS",
+    "LACC_LATENCY_TARGET_COMMENT_MS",
+    "LACC_LATENCY_TARGET_DEBUG_MS",
+)
+
+ConfigListener = Callable[["ConfigSnapshot", "ConfigSnapshot"], None]
+
 
 class ModelConfig(BaseModel):
     """Configuration for the AI model"""
+    if PYDANTIC_V2:
+        model_config = ConfigDict(frozen=True)
+    else:
+        class Config:
+            frozen = True
+
     name: str = Field(default="llama-3.3-70b-versatile", description="Groq model name to use")
     temperature: float = Field(default=0.3, ge=0, le=2, description="Temperature for generation")
     top_p: float = Field(default=0.3, ge=0, le=1, description="Top-p for generation")
     timeout: int = Field(default=15000, description="Timeout in milliseconds")
     api_key: str = Field(default="", description="Groq API key")
     base_url: str = Field(default="https://api.groq.com", description="Groq API base URL")
+    provider: str = Field(default="groq", description="Provider for all modes: groq or local")
+    provider_code: str = Field(default="", description="Provider for code completions")
+    provider_comment: str = Field(default="", description="Provider for comment-to-code")
+    provider_debug: str = Field(default="", description="Provider for debug code")
+    local_base_url: str = Field(default="http://127.0.0.1:8080", description="Local OpenAI-compatible server")
+    local_model: str = Field(default="local", description="Model name sent to the local server")
+    local_api_key: str = Field(default="", description="API key of the local server, if any")
+    router_models: str = Field(default="", description="Comma-separated fallback models in quality order")
+    governor_model: str = Field(default="", description="Model of the last token governor step")
+    latency_target_code_ms: int = Field(default=1500, description="Latency target for code completions")
+    latency_target_comment_ms: int = Field(default=8000, description="Latency target for comment-to-code")
+    latency_target_debug_ms: int = Field(default=5000, description="Latency target for debug code")
+
+    def to_dict(self) -> Dict:
+        """Get the configuration values as a dictionary"""
+        return self.model_dump() if PYDANTIC_V2 else self.dict()
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """Immutable view of the configuration at one point in time"""
+    model: ModelConfig
+    version: int
+    # (path, mtime_ns) of every watched file; mtime_ns is None for missing files
+    sources: Tuple[Tuple[str, Optional[int]], ...] = ()
+
+
+def _mtime_ns(path: str) -> Optional[int]:
+    """Get a file's modification time, or None if it does not exist"""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
 
 
 class Config:
     """Main configuration class"""
-    
+
     def __init__(self):
-        self.model = ModelConfig(
-            name=os.getenv("LACC_MODEL_NAME", "qwen/qwen3-32b"),
-            temperature=float(os.getenv("LACC_TEMPERATURE", "0.3")),
-            top_p=float(os.getenv("LACC_TOP_P", "0.3")),
-            timeout=int(os.getenv("LACC_TIMEOUT", "15000")),
-            api_key=os.getenv("GROQ_API_KEY", ""),
-            base_url=os.getenv("GROQ_BASE_URL", "https://api.groq.com")
+        self._lock = threading.Lock()
+        self._listeners: List[ConfigListener] = []
+        # Settings changed at runtime (e.g. the API key sent by the extension)
+        self._overrides: Dict[str, object] = {}
+        self._snapshot = self._load(version=1)
+
+    @property
+    def model(self) -> ModelConfig:
+        """Model configuration of the current snapshot"""
+        return self._snapshot.model
+
+    def watched_files(self) -> List[str]:
+        """Get the .env and settings files the configuration is read from"""
+        files = []
+        env_file = _PROCESS_ENV.get("LACC_ENV_FILE") or find_dotenv()
+        if env_file:
+            files.append(os.path.abspath(env_file))
+        settings_file = _PROCESS_ENV.get("LACC_SETTINGS_FILE")
+        if settings_file:
+            files.append(os.path.abspath(os.path.expanduser(settings_file)))
+        return files
+
+    def _read_values(self, files: List[str]) -> Dict[str, str]:
+        """Read settings from files, overridden by the process environment"""
+        values: Dict[str, str] = {}
+        for path in files:
+            if path.endswith(".json"):
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                    values.update({k: str(v) for k, v in data.items() if v is not None})
+                except (OSError, ValueError, AttributeError):
+                    continue
+            else:
+                values.update({k: v for k, v in dotenv_values(path).items() if v is not None})
+        values.update({k: v for k, v in _PROCESS_ENV.items() if k in MODEL_SETTINGS})
+        return values
+
+    def _load(self, version: int) -> ConfigSnapshot:
+        """Build a snapshot from the current files and environment"""
+        files = self.watched_files()
+        # Stat before reading so a write during the read triggers another reload
+        sources = tuple((path, _mtime_ns(path)) for path in files)
+        values = self._read_values(files)
+        model = ModelConfig(
+            name=values.get("LACC_MODEL_NAME", "qwen/qwen3-32b"),
+            temperature=float(values.get("LACC_TEMPERATURE", "0.3")),
+            top_p=float(values.get("LACC_TOP_P", "0.3")),
+            timeout=int(values.get("LACC_TIMEOUT", "15000")),
+            api_key=values.get("GROQ_API_KEY", ""),
+            base_url=values.get("GROQ_BASE_URL", "https://api.groq.com"),
+            provider=values.get("LACC_PROVIDER", "groq"),
+            provider_code=values.get("LACC_PROVIDER_CODE", ""),
+            provider_comment=values.get("LACC_PROVIDER_COMMENT", ""),
+            provider_debug=values.get("LACC_PROVIDER_DEBUG", ""),
+            local_base_url=values.get("LACC_LOCAL_BASE_URL", "http://127.0.0.1:8080"),
+            local_model=values.get("LACC_LOCAL_MODEL", "local"),
+            local_api_key=values.get("LACC_LOCAL_API_KEY", ""),
+            router_models=values.get("LACC_ROUTER_MODELS", ""),
+            governor_model=values.get("LACC_GOVERNOR_MODEL", ""),
+            latency_target_code_ms=int(values.get("LACC_LATENCY_TARGET_CODE_MS", "1500")),
+            latency_target_comment_ms=int(values.get("LACC_LATENCY_TARGET_COMMENT_MS", "8000")),
+            latency_target_debug_ms=int(values.get("LACC_LATENCY_TARGET_DEBUG_MS", "5000"))
         )
-    
+        if self._overrides:
+            model = ModelConfig(**{**model.to_dict(), **self._overrides})
+        return ConfigSnapshot(model=model, version=version, sources=sources)
+
+    def snapshot(self) -> ConfigSnapshot:
+        """Get the current configuration snapshot"""
+        return self._snapshot
+
     def get_model_config(self) -> ModelConfig:
         """Get the model configuration"""
-        return self.model
+        return self._snapshot.model
+
+    def sources_changed(self) -> bool:
+        """Check if any watched file was created, modified or removed"""
+        current = self._snapshot.sources
+        files = self.watched_files()
+        if [path for path, _ in current] != files:
+            return True
+        return any(_mtime_ns(path) != mtime for path, mtime in current)
+
+    def subscribe(self, listener: ConfigListener):
+        """Register a callback run with (old, new) snapshots after each swap"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def _swap(self, new: ConfigSnapshot):
+        """Install a new snapshot and notify listeners"""
+        old = self._snapshot
+        self._snapshot = new
+        for listener in list(self._listeners):
+            try:
+                listener(old, new)
+            except Exception:
+                # A broken listener must not keep other objects on stale config
+                pass
+
+    def reload(self) -> bool:
+        """Re-read the configuration; returns True if the model config changed"""
+        with self._lock:
+            old = self._snapshot
+            try:
+                new = self._load(version=old.version + 1)
+            except (ValueError, TypeError):
+                # Keep serving the last valid snapshot while a file is half-edited
+                return False
+            if new.model == old.model:
+                # Only remember the new mtimes, nothing to rebuild
+                self._snapshot = ConfigSnapshot(model=old.model, version=old.version, sources=new.sources)
+                return False
+            self._swap(new)
+            return True
+
+    def update_model(self, **changes) -> ModelConfig:
+        """Swap in a snapshot with some model settings overridden"""
+        with self._lock:
+            old = self._snapshot
+            model = ModelConfig(**{**old.model.to_dict(), **changes})
+            # Remembered so that later file reloads keep the override
+            self._overrides.update(changes)
+            if model != old.model:
+                self._swap(ConfigSnapshot(model=model, version=old.version + 1, sources=old.sources))
+            return model
+
+
+class ConfigWatcher:
+    """Polls the configuration files and hot-reloads them on change"""
+
+    def __init__(self, config: Config, interval: Optional[float] = None):
+        self.config = config
+        self.interval = interval if interval is not None else float(os.getenv("LACC_CONFIG_POLL_INTERVAL", "2.0"))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def check(self) -> bool:
+        """Reload the configuration if a watched file changed"""
+        if self.config.sources_changed():
+            return self.config.reload()
+        return False
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                pass
+
+    def start(self):
+        """Start polling in a background thread"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="lacc-config-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop polling"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
 
 
 # Global configuration instance
-config = Config() 
\ No newline at end of file
+config = Config()
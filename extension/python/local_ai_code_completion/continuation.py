@@ -0,0 +1,177 @@
+"""
+Continuation module for Local AI Code Completion
+Reuses recent completions when the user types ahead into them
+
+The extension inserts completions whole, so in practice this serves the
+rest of a completion whose first part was kept and the rest deleted.
+"""
+import hashlib
+import os
+import sys
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from .memory import CompactText, memory_accountant
+from .storage import load_json, save_json
+from .stats import stats
+
+CONTINUATIONS_FILE = "continuations.json"
+
+# Number of prefix characters kept verbatim for a cheap mismatch check
+TAIL_LENGTH = 64
+# Number of suffix characters that must be unchanged for a continuation hit
+SUFFIX_HEAD_LENGTH = 512
+
+
+def _digest(text: str) -> str:
+    """Hash a context string so it can be compared without storing it"""
+    return hashlib.sha1(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class _Entry:
+    """A remembered completion; contexts are kept as hashes, not text"""
+    __slots__ = ("time", "line", "prefix_len", "prefix_hash", "tail",
+                 "suffix_hash", "completion", "completion_len")
+
+    def __init__(self, data: dict):
+        self.time = data["time"]
+        self.line = data["line"]
+        self.prefix_len = data["prefix_len"]
+        self.prefix_hash = data["prefix_hash"]
+        self.tail = data["tail"]
+        self.suffix_hash = data["suffix_hash"]
+        self.completion = CompactText(data["completion"])
+        self.completion_len = len(data["completion"])
+
+    def to_dict(self) -> dict:
+        return {
+            "time": self.time,
+            "line": self.line,
+            "prefix_len": self.prefix_len,
+            "prefix_hash": self.prefix_hash,
+            "tail": self.tail,
+            "suffix_hash": self.suffix_hash,
+            "completion": str(self.completion),
+        }
+
+    def memory_size(self) -> int:
+        # Two 40-character hex digests take 89 bytes each
+        return (sys.getsizeof(self) + sys.getsizeof(self.tail) + 2 * 89
+                + self.completion.memory_size())
+
+
+class ContinuationCache:
+    """Remembers recent completions per file and cursor region"""
+
+    def __init__(self, max_files: int = 32, max_entries_per_file: int = 8,
+                 max_completion_chars: int = 8000):
+        self.max_files = max_files
+        self.max_entries_per_file = max_entries_per_file
+        self.max_completion_chars = max_completion_chars
+        self.ttl = float(os.getenv("LACC_CONTINUATION_TTL", "600"))
+        self._entries: Optional["OrderedDict[str, List[_Entry]]"] = None
+        memory_accountant.register("continuation", self)
+
+    def _load(self) -> "OrderedDict[str, List[_Entry]]":
+        """Load entries lazily from the cache directory"""
+        if self._entries is None:
+            data = load_json(CONTINUATIONS_FILE, {})
+            self._entries = OrderedDict()
+            if isinstance(data, dict):
+                for key, items in data.items():
+                    try:
+                        self._entries[key] = [_Entry(item) for item in items]
+                    except (KeyError, TypeError):
+                        continue
+        return self._entries
+
+    def _save(self):
+        entries = self._load()
+        save_json(CONTINUATIONS_FILE, {key: [e.to_dict() for e in items] for key, items in entries.items()})
+
+    def _key(self, file_path: str, mode: str) -> str:
+        return f"{mode}:{file_path}"
+
+    def lookup(self, file_path: str, mode: str, prefix: str, suffix: str) -> Optional[str]:
+        """Return the rest of a recent completion the new prefix has typed into"""
+        if not file_path:
+            return None
+        stats.increment("continuation.lookups")
+
+        now = time.time()
+        cursor_line = prefix.count("\n")
+        suffix_hash = _digest(suffix[:SUFFIX_HEAD_LENGTH])
+
+        for entry in reversed(self._load().get(self._key(file_path, mode), [])):
+            if now - entry.time > self.ttl:
+                continue
+            prefix_len = entry.prefix_len
+            typed_len = len(prefix) - prefix_len
+            # The user must have typed a non-empty, strict leading part of the completion
+            if typed_len <= 0 or typed_len >= entry.completion_len:
+                continue
+            if prefix[max(0, prefix_len - TAIL_LENGTH):prefix_len] != entry.tail:
+                continue
+            if entry.suffix_hash != suffix_hash:
+                continue
+            completion = str(entry.completion)
+            # Cursor region check: the cursor can only have moved into the completion
+            if not entry.line <= cursor_line <= entry.line + completion.count("\n"):
+                continue
+            if not completion.startswith(prefix[prefix_len:]):
+                continue
+            if _digest(prefix[:prefix_len]) != entry.prefix_hash:
+                continue
+
+            stats.increment("continuation.hits")
+            return completion[typed_len:]
+        return None
+
+    def record(self, file_path: str, mode: str, prefix: str, suffix: str, completion: str):
+        """Remember a completion shown for the given context"""
+        if not file_path or not completion or len(completion) > self.max_completion_chars:
+            return
+
+        entries = self._load()
+        key = self._key(file_path, mode)
+        file_entries = [e for e in entries.pop(key, []) if time.time() - e.time <= self.ttl]
+        file_entries.append(_Entry({
+            "time": time.time(),
+            "line": prefix.count("\n"),
+            "prefix_len": len(prefix),
+            "prefix_hash": _digest(prefix),
+            "tail": prefix[-TAIL_LENGTH:],
+            "suffix_hash": _digest(suffix[:SUFFIX_HEAD_LENGTH]),
+            "completion": completion,
+        }))
+        # Re-inserting the key keeps the most recently used files last
+        entries[key] = file_entries[-self.max_entries_per_file:]
+        while len(entries) > self.max_files:
+            entries.popitem(last=False)
+        memory_accountant.enforce()
+        self._save()
+
+    def memory_size(self) -> int:
+        """Accounted bytes of the in-memory entries"""
+        if self._entries is None:
+            return 0
+        return sum(e.memory_size() for items in self._entries.values() for e in items)
+
+    def evict(self, nbytes: int) -> int:
+        """Drop the least recently used files' entries until nbytes were freed"""
+        freed = 0
+        entries = self._entries or OrderedDict()
+        while entries and freed < nbytes:
+            _, items = entries.popitem(last=False)
+            freed += sum(e.memory_size() for e in items)
+        return freed
+
+    def clear(self):
+        """Forget all remembered completions"""
+        self._entries = OrderedDict()
+        save_json(CONTINUATIONS_FILE, {})
+
+
+# Global continuation cache instance
+continuation_cache = ContinuationCache()
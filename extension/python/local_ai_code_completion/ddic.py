@@ -0,0 +1,345 @@
+"""
+DDIC module for Local AI Code Completion
+
+Without the dictionary the model guesses the columns of database tables.
+LACC_DDIC_FILE points to a local export of table, structure and data
+element definitions, either CSV (DD03L-style columns: TABNAME, FIELDNAME,
+KEYFLAG, ROLLNAME, DATATYPE, LENG, DECIMALS, DDTEXT; rows with only a
+ROLLNAME describe data elements, rows without a FIELDNAME describe tables)
+or JSON (a list of such rows, or {"tables": {name: {"description",
+"fields": [...]}}, "data_elements": {name: {...}}}).
+
+The export is compiled once into a binary index in the cache directory,
+named after the export's fingerprint:
+
+    header   magic, table count
+    entries  sorted fixed-size (name, offset, length) records
+    records  one compact JSON document per table
+
+The index is memory-mapped and searched by bisection over the entries, so
+a lookup touches a few pages no matter how many tables the export has, and
+backends sharing the cache directory share the pages. Prompts get the key
+fields of the tables the code around the cursor refers to, plus the other
+fields it already uses.
+"""
+import asyncio
+import csv
+import hashlib
+import json
+import mmap
+import os
+import struct
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Set
+
+from .abap_lexer import WORD, split_statements
+from .logger import logger
+from .stats import stats
+from .storage import get_cache_dir
+from .workers import run_in_thread
+
+MAGIC = b"LACCDDIC"
+HEADER = struct.Struct("<8sI")
+# Table and structure names have at most 30 characters
+NAME_BYTES = 30
+ENTRY = struct.Struct(f"<{NAME_BYTES}sII")
+
+# Seconds between checks whether the export changed
+CHECK_INTERVAL = 2.0
+
+# Words after which a table or structure name is expected
+_TABLE_KEYWORDS = {"FROM", "JOIN", "UPDATE", "MODIFY", "INTO", "TABLES", "TYPE", "LIKE", "OF", "INCLUDE"}
+
+# Column aliases of common exports -> DD03L names
+_COLUMNS = {
+    "TABLE": "TABNAME", "TABLE_NAME": "TABNAME", "STRUCTURE": "TABNAME",
+    "FIELD": "FIELDNAME", "FIELD_NAME": "FIELDNAME", "NAME": "FIELDNAME",
+    "KEY": "KEYFLAG",
+    "DATA_ELEMENT": "ROLLNAME", "ELEMENT": "ROLLNAME",
+    "TYPE": "DATATYPE", "LENGTH": "LENG",
+    "DESCRIPTION": "DDTEXT", "TEXT": "DDTEXT",
+}
+
+
+def _normalize(row: Dict[str, Any]) -> Dict[str, str]:
+    result = {}
+    for key, value in row.items():
+        if key is None or value is None:
+            continue
+        key = str(key).strip().upper()
+        result[_COLUMNS.get(key, key)] = str(value).strip()
+    return result
+
+
+def _read_rows(source: str) -> Iterator[Dict[str, str]]:
+    """Rows of a CSV or JSON export, with DD03L column names"""
+    if source.lower().endswith(".json"):
+        with open(source, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, list):
+            for row in data:
+                yield _normalize(row)
+            return
+        for section in ("tables", "structures"):
+            for name, table in (data.get(section) or {}).items():
+                yield _normalize({"DDTEXT": table.get("description", ""), "TABNAME": name})
+                for field in table.get("fields", []):
+                    yield _normalize({**field, "TABNAME": name})
+        for name, element in (data.get("data_elements") or {}).items():
+            yield _normalize({**element, "ROLLNAME": name})
+        return
+    with open(source, "r", encoding="utf-8-sig", newline="") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+        except csv.Error:
+            dialect = csv.excel
+        for row in csv.DictReader(f, dialect=dialect):
+            yield _normalize(row)
+
+
+def _type_text(row: Dict[str, str]) -> str:
+    """CHAR(10), DEC(15,2), STRING, ..."""
+    datatype = row.get("DATATYPE", "").upper()
+    if not datatype:
+        return ""
+    length = row.get("LENG", "").lstrip("0")
+    decimals = row.get("DECIMALS", "").lstrip("0")
+    if not length:
+        return datatype
+    return f"{datatype}({length},{decimals})" if decimals else f"{datatype}({length})"
+
+
+def build_index(source: str, target: str) -> int:
+    """Compile an export into an index file; returns the number of tables (runs in a worker)"""
+    tables: Dict[str, Dict[str, Any]] = {}
+    elements: Dict[str, str] = {}
+    for row in _read_rows(source):
+        table = row.get("TABNAME", "").upper()
+        field = row.get("FIELDNAME", "").upper()
+        element = row.get("ROLLNAME", "").upper()
+        if not table:
+            if element:
+                elements[element] = _type_text(row)
+            continue
+        if len(table.encode("utf-8")) > NAME_BYTES:
+            continue
+        record = tables.setdefault(table, {"d": "", "k": [], "f": []})
+        if not field:
+            record["d"] = row.get("DDTEXT", "")
+            continue
+        # .INCLUDE/.APPEND rows only pull in the fields listed after them
+        if field.startswith("."):
+            continue
+        key = row.get("KEYFLAG", "").upper() in ("X", "TRUE", "1", "YES")
+        record["k" if key else "f"].append([field, element, _type_text(row)])
+
+    # Fields typed only by their data element take its type
+    for record in tables.values():
+        for field in record["k"] + record["f"]:
+            if not field[2] and field[1] in elements:
+                field[2] = elements[field[1]]
+
+    names = sorted(tables)
+    payloads = [json.dumps(tables[name], separators=(",", ":")).encode("utf-8") for name in names]
+    offset = HEADER.size + ENTRY.size * len(names)
+    tmp_path = f"{target}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(names)))
+        for name, payload in zip(names, payloads):
+            # NUL padding sorts before every character, so byte order matches name order
+            f.write(ENTRY.pack(name.encode("utf-8"), offset, len(payload)))
+            offset += len(payload)
+        for payload in payloads:
+            f.write(payload)
+    os.replace(tmp_path, target)
+    return len(names)
+
+
+def _field_text(field: List[str]) -> str:
+    name, element, type_text = field
+    return " ".join(part for part in (name, element if element != name else "", type_text) if part)
+
+
+def format_table(name: str, record: Dict[str, Any], used: Set[str]) -> str:
+    """Key fields of a table and the other fields the code already uses"""
+    lines = [f"{name} {record['d']}".rstrip()]
+    if record["k"]:
+        lines.append("  key: " + ", ".join(_field_text(field) for field in record["k"]))
+    others = [field for field in record["f"] if field[0] in used]
+    if others:
+        lines.append("  used: " + ", ".join(_field_text(field) for field in others))
+    hidden = len(record["f"]) - len(others)
+    if hidden:
+        lines.append(f"  (+{hidden} more fields)")
+    return "\n".join(lines)
+
+
+def _referenced_names(prefix: str, suffix: str):
+    """Candidate table names nearest the cursor first, and every word the code uses"""
+    statements = split_statements(prefix)[::-1] + split_statements(suffix)
+    candidates: List[str] = []
+    used: Set[str] = set()
+    for statement in statements:
+        previous = ""
+        for token in statement.tokens:
+            if token.kind != WORD:
+                previous = ""
+                continue
+            word = token.text.upper()
+            # vbak~vbeln, ls_vbak-erdat: the table and the component are both of interest
+            parts = word.replace("~", "-").split("-")
+            used.update(parts)
+            if "~" in word or previous in _TABLE_KEYWORDS:
+                candidates.append(parts[0].lstrip("@"))
+            previous = word
+    return list(dict.fromkeys(candidates)), used
+
+
+class DdicIndex:
+    """Memory-mapped index of a local DDIC export"""
+
+    def __init__(self):
+        self.source = os.path.expanduser(os.getenv("LACC_DDIC_FILE", ""))
+        self.enabled = bool(self.source) and os.getenv("LACC_DDIC", "1") != "0"
+        # Prompt budget for the definitions, and tables included at most
+        self.context_chars = int(os.getenv("LACC_DDIC_CHARS", "1200"))
+        self.max_tables = int(os.getenv("LACC_DDIC_MAX_TABLES", "6"))
+        self._mm: Optional[mmap.mmap] = None
+        self._count = 0
+        self._fingerprint = ""
+        # Fingerprint of an export that failed to build, so it is not retried on every request
+        self._failed = ""
+        self._checked = 0.0
+        self._current = ""
+        self._building: Optional[asyncio.Future] = None
+
+    def _source_fingerprint(self) -> str:
+        try:
+            st = os.stat(self.source)
+        except OSError:
+            return ""
+        key = f"{os.path.abspath(self.source)}\0{st.st_mtime_ns}\0{st.st_size}"
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+    def _index_path(self, fingerprint: str) -> Path:
+        return get_cache_dir() / f"ddic-{fingerprint}.idx"
+
+    def stale(self) -> bool:
+        """Whether the mapped index is missing or older than the export"""
+        now = time.monotonic()
+        if now - self._checked >= CHECK_INTERVAL:
+            self._checked = now
+            self._current = self._source_fingerprint()
+        return bool(self._current) and self._current not in (self._fingerprint, self._failed)
+
+    def _map(self, path: Path, fingerprint: str) -> bool:
+        try:
+            with open(path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return False
+        magic, count = HEADER.unpack_from(mm, 0)
+        if magic != MAGIC:
+            mm.close()
+            return False
+        if self._mm is not None:
+            self._mm.close()
+        self._mm, self._count, self._fingerprint = mm, count, fingerprint
+        return True
+
+    def _remove_old_indexes(self, keep: Path):
+        for path in get_cache_dir().glob("ddic-*.idx"):
+            if path != keep:
+                try:
+                    path.unlink()
+                except OSError:
+                    # Still mapped by another backend (Windows); removed next time
+                    pass
+
+    async def _build(self, fingerprint: str, run: Optional[Callable[..., Awaitable[Any]]]):
+        path = self._index_path(fingerprint)
+        try:
+            # Another backend sharing the cache directory may have built it already
+            if not self._map(path, fingerprint):
+                run = run or run_in_thread
+                started = time.perf_counter()
+                count = await run(build_index, self.source, str(path))
+                stats.increment("ddic.builds")
+                logger.info(f"Indexed {count} DDIC tables from {self.source} in {time.perf_counter() - started:.1f}s")
+                if not self._map(path, fingerprint):
+                    raise OSError(f"cannot map {path}")
+                self._remove_old_indexes(path)
+        except Exception as e:
+            self._failed = fingerprint
+            logger.warning(f"Could not index DDIC export {self.source}: {e}")
+        finally:
+            self._building = None
+
+    async def prepare(self, run: Optional[Callable[..., Awaitable[Any]]] = None):
+        """Build or map the index; rebuilds after export changes run in the background"""
+        if not self.enabled or not self.stale():
+            return
+        if self._building is None:
+            self._building = asyncio.ensure_future(self._build(self._current, run))
+        if self._mm is None:
+            # Nothing to answer from yet: wait for the first index
+            await asyncio.shield(self._building)
+
+    def lookup(self, name: str) -> Optional[Dict[str, Any]]:
+        """Definition of one table or structure, or None"""
+        mm = self._mm
+        key = name.upper().encode("utf-8")
+        if mm is None or not key or len(key) > NAME_BYTES:
+            return None
+        key = key.ljust(NAME_BYTES, b"\0")
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            position = HEADER.size + mid * ENTRY.size
+            entry_name = mm[position:position + NAME_BYTES]
+            if entry_name < key:
+                lo = mid + 1
+            elif entry_name > key:
+                hi = mid
+            else:
+                _, offset, length = ENTRY.unpack_from(mm, position)
+                return json.loads(mm[offset:offset + length])
+        return None
+
+    def context_for(self, prefix: str, suffix: str) -> str:
+        """Definitions of the tables the code around the cursor refers to, within the prompt budget"""
+        if not self.enabled or self._mm is None:
+            return ""
+        candidates, used = _referenced_names(prefix, suffix)
+        parts, total = [], 0
+        for name in candidates:
+            record = self.lookup(name)
+            if record is None:
+                continue
+            part = format_table(name, record, used)
+            if total + len(part) > self.context_chars:
+                break
+            parts.append(part)
+            total += len(part)
+            if len(parts) >= self.max_tables:
+                break
+        if parts:
+            stats.increment("ddic.requests")
+            stats.increment("ddic.tables", len(parts))
+            stats.increment("ddic.context_chars", total)
+        return "\n".join(parts)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "source": self.source,
+            "enabled": self.enabled,
+            "tables": self._count,
+            "index": str(self._index_path(self._fingerprint)) if self._fingerprint else "",
+        }
+
+
+# Global DDIC index instance
+ddic_index = DdicIndex()
@@ -0,0 +1,283 @@
+"""
+Debug templates module for Local AI Code Completion
+
+Most debug requests want the same instrumentation: a breakpoint, WRITEs of
+the variables in scope, line counts of internal tables, and the loop index
+and sy-subrc after the statement that set it. The template engine lexes
+the code before the cursor, finds what is in scope (declarations, inline
+declarations, method parameters, open loops) and emits that
+instrumentation without an API call.
+
+There is no runtime reading: the first GET RUN TIME of a program returns
+0, so a single measurement at the cursor would always print 0.
+
+The model is still asked when the request carries its own instruction (a
+selected comment) or when nothing worth instrumenting is in scope.
+"""
+import os
+import re
+from typing import Dict, List, Optional, Tuple
+
+from .abap_lexer import COMMA, WORD, Statement, split_statements
+from .stats import stats
+
+# Unit keyword -> keyword that closes it
+UNITS = {"METHOD": "ENDMETHOD", "FORM": "ENDFORM", "FUNCTION": "ENDFUNCTION", "MODULE": "ENDMODULE"}
+LOOPS = {"LOOP": "ENDLOOP", "DO": "ENDDO", "WHILE": "ENDWHILE"}
+DECLARATIONS = {"DATA", "CLASS-DATA", "STATICS", "FIELD-SYMBOLS", "PARAMETERS", "SELECT-OPTIONS"}
+# Statements whose outcome is in sy-subrc
+SUBRC_KEYWORDS = {"SELECT", "READ", "CALL", "AUTHORITY-CHECK", "FIND", "DELETE", "INSERT", "MODIFY",
+                  "UPDATE", "ASSIGN", "OPEN", "FETCH", "REPLACE"}
+PARAMETER_SECTIONS = {"IMPORTING", "EXPORTING", "CHANGING", "RETURNING", "TABLES", "USING"}
+# Variables written per request; the most recently declared are kept
+MAX_VARIABLES = 12
+
+# Variable kinds
+ELEMENTARY = "elementary"
+TABLE = "table"
+STRUCTURE = "structure"
+FIELD_SYMBOL = "field-symbol"
+REFERENCE = "reference"
+
+_INLINE_RE = re.compile(r"^@?(DATA|FIELD-SYMBOL)\(([^)]+)\)$", re.IGNORECASE)
+_ELEMENTARY_TYPES = {"I", "INT8", "STRING", "XSTRING", "C", "N", "P", "D", "T", "F", "X", "DECFLOAT16",
+                     "DECFLOAT34", "ABAP_BOOL", "CHAR1", "FLAG", "SYST_SUBRC", "SYTABIX", "TIMESTAMP",
+                     "TIMESTAMPL"}
+
+DEBUG_LINES = "lv_debug_lines"
+
+
+def _kind_from_name(name: str) -> str:
+    """Kind by the usual SAP naming conventions, when the type says nothing"""
+    lowered = name.lower()
+    if lowered.startswith("<"):
+        return FIELD_SYMBOL
+    prefix = lowered.split("_", 1)[0] if "_" in lowered else ""
+    if prefix in ("lt", "gt", "mt", "it", "et", "ct", "rt", "st"):
+        return TABLE
+    if prefix in ("ls", "gs", "ms", "is", "es", "cs", "rs", "wa", "ws"):
+        return STRUCTURE
+    if prefix in ("lo", "go", "mo", "io", "eo", "ro", "lr", "gr", "mr", "lx", "ox"):
+        return REFERENCE
+    return ELEMENTARY
+
+
+def _kind_from_type(name: str, type_words: List[str]) -> str:
+    words = [word.upper() for word in type_words]
+    if "TABLE" in words or "RANGE" in words:
+        return TABLE
+    if "REF" in words:
+        return REFERENCE
+    if name.startswith("<"):
+        return FIELD_SYMBOL
+    if len(words) >= 2 and words[0] in ("TYPE", "LIKE"):
+        base = words[1]
+        if base in _ELEMENTARY_TYPES or base.startswith("SY-") or base.startswith("SYST-"):
+            return ELEMENTARY
+    return _kind_from_name(name)
+
+
+def _words(statement: Statement) -> List[str]:
+    return [token.text for token in statement.tokens if token.kind == WORD]
+
+
+def _chain_parts(statement: Statement) -> List[List[str]]:
+    """Words of each part of a (possibly chained) statement, without the keyword"""
+    parts: List[List[str]] = [[]]
+    for token in statement.tokens[1:]:
+        if token.kind == COMMA:
+            parts.append([])
+        elif token.kind == WORD:
+            parts[-1].append(token.text)
+    return [part for part in parts if part]
+
+
+class DebugScope:
+    """What is visible at the cursor"""
+
+    def __init__(self):
+        # name -> kind, in declaration order
+        self.variables: Dict[str, str] = {}
+        # (keyword, table or "") of the loops open at the cursor, outermost first
+        self.loops: List[Tuple[str, str]] = []
+        self.last_keyword = ""
+        self.unit = ""
+
+    def declare(self, name: str, kind: str):
+        # A later declaration of the same name moves it to the end
+        self.variables.pop(name.lower(), None)
+        self.variables[name.lower()] = kind
+
+
+def _declare_statement(scope: DebugScope, statement: Statement):
+    keyword = statement.keyword
+    if keyword in DECLARATIONS:
+        structure_depth = 0
+        for part in _chain_parts(statement):
+            head = part[0].upper()
+            if head == "BEGIN" and len(part) >= 3:
+                if structure_depth == 0:
+                    scope.declare(part[2], STRUCTURE)
+                structure_depth += 1
+                continue
+            if head == "END":
+                structure_depth = max(0, structure_depth - 1)
+                continue
+            if structure_depth:
+                continue
+            kind = TABLE if keyword == "SELECT-OPTIONS" else _kind_from_type(part[0], part[1:])
+            scope.declare(part[0], kind)
+    # Inline declarations: DATA(x), @DATA(x), FIELD-SYMBOL(<x>)
+    words = [word.upper() for word in _words(statement)]
+    for index, token in enumerate(token for token in statement.tokens if token.kind == WORD):
+        match = _INLINE_RE.match(token.text)
+        if not match:
+            continue
+        name = match.group(2)
+        if match.group(1).upper() == "FIELD-SYMBOL":
+            scope.declare(name, FIELD_SYMBOL)
+        elif keyword == "SELECT" and index >= 2 and words[index - 2:index] == ["INTO", "TABLE"]:
+            scope.declare(name, TABLE)
+        else:
+            scope.declare(name, _kind_from_name(name))
+
+
+def _declare_parameters(scope: DebugScope, statement: Statement):
+    """Parameters of a METHODS/CLASS-METHODS/FORM definition"""
+    words = _words(statement)
+    upper = [word.upper() for word in words]
+    in_section = False
+    for index, word in enumerate(upper):
+        if word in PARAMETER_SECTIONS:
+            in_section = True
+            continue
+        if not in_section or word not in ("TYPE", "LIKE") or index == 0:
+            continue
+        name = words[index - 1]
+        match = re.match(r"^(?:VALUE|REFERENCE)\(([^)]+)\)$", name, re.IGNORECASE)
+        if match:
+            name = match.group(1)
+        # The type runs up to the next parameter name, section or OPTIONAL/DEFAULT
+        end = index + 1
+        while end < len(upper) and upper[end] not in PARAMETER_SECTIONS | {"OPTIONAL", "DEFAULT"}:
+            if end + 1 < len(upper) and upper[end + 1] in ("TYPE", "LIKE"):
+                break
+            end += 1
+        scope.declare(name, _kind_from_type(name, words[index:end]))
+
+
+def analyze_scope(prefix: str) -> DebugScope:
+    """Variables, open loops and the last statement before the cursor"""
+    statements = [statement for statement in split_statements(prefix) if statement.tokens]
+    # Start of the innermost open unit, if the cursor is inside one
+    unit_start: Optional[int] = None
+    for index, statement in enumerate(statements):
+        keyword = statement.keyword
+        if keyword in UNITS:
+            unit_start = index
+        elif keyword in UNITS.values():
+            unit_start = None
+
+    scope = DebugScope()
+    if unit_start is not None:
+        words = _words(statements[unit_start])
+        scope.unit = words[1] if len(words) > 1 else statements[unit_start].keyword
+    depth = 0
+    for index, statement in enumerate(statements):
+        keyword = statement.keyword
+        if index == unit_start:
+            if keyword == "FORM":
+                _declare_parameters(scope, statement)
+            continue
+        if keyword in UNITS:
+            depth += 1
+            continue
+        if keyword in UNITS.values():
+            depth = max(0, depth - 1)
+            continue
+        if keyword in ("METHODS", "CLASS-METHODS") and unit_start is not None:
+            # The definition of the method the cursor is in
+            words = _words(statement)
+            if len(words) > 1 and words[1].lower() == scope.unit.lower():
+                _declare_parameters(scope, statement)
+            continue
+        # Globals, and everything in the unit the cursor is in
+        if depth == 0 or (unit_start is not None and index > unit_start):
+            _declare_statement(scope, statement)
+
+    for statement in statements[unit_start + 1 if unit_start is not None else 0:]:
+        keyword = statement.keyword
+        if keyword in LOOPS and statement.terminated:
+            words = _words(statement)
+            table = words[2] if keyword == "LOOP" and len(words) > 2 and words[1].upper() == "AT" else ""
+            scope.loops.append((keyword, table))
+        elif keyword in LOOPS.values() and scope.loops:
+            scope.loops.pop()
+    if statements and statements[-1].terminated:
+        scope.last_keyword = statements[-1].keyword
+    return scope
+
+
+def _cursor_indent(prefix: str) -> Tuple[str, str]:
+    """Indentation of the inserted lines and what goes before the first one"""
+    line = prefix[prefix.rfind("\n") + 1:]
+    indent = line[:len(line) - len(line.lstrip())]
+    # Code before the cursor: start on a new line
+    return indent, ("\n" + indent) if line.strip() else ""
+
+
+def render(prefix: str) -> str:
+    """Instrumentation for the cursor position, or "" if nothing is worth instrumenting"""
+    scope = analyze_scope(prefix)
+    variables = [(name, kind) for name, kind in scope.variables.items()
+                 if kind in (ELEMENTARY, TABLE, FIELD_SYMBOL) and not name.startswith("lv_debug_")]
+    variables = variables[-MAX_VARIABLES:]
+    if not variables and not scope.loops:
+        return ""
+
+    lines = []
+    tables = [name for name, kind in variables if kind == TABLE]
+    if tables and DEBUG_LINES not in scope.variables:
+        lines.append(f"DATA {DEBUG_LINES} TYPE i.")
+    lines.append(f'" Debug instrumentation{f" ({scope.unit})" if scope.unit else ""}')
+    lines.append("BREAK-POINT.")
+    if scope.last_keyword in SUBRC_KEYWORDS:
+        lines.append(f"WRITE: / '{scope.last_keyword} sy-subrc:', sy-subrc.")
+    for keyword, table in scope.loops[-1:]:
+        if keyword == "LOOP":
+            lines.append(f"WRITE: / 'LOOP AT {table} sy-tabix:', sy-tabix.")
+        else:
+            lines.append(f"WRITE: / '{keyword} sy-index:', sy-index.")
+    for name, kind in variables:
+        if kind == TABLE:
+            lines.append(f"DESCRIBE TABLE {name} LINES {DEBUG_LINES}.")
+            lines.append(f"WRITE: / '{name} lines:', {DEBUG_LINES}.")
+        elif kind == FIELD_SYMBOL:
+            # Writing an unassigned field symbol would dump
+            lines.append(f"IF {name} IS ASSIGNED.")
+            lines.append(f"  WRITE: / '{name}:', {name}.")
+            lines.append("ENDIF.")
+        else:
+            lines.append(f"WRITE: / '{name}:', {name}.")
+
+    indent, lead = _cursor_indent(prefix)
+    return lead + ("\n" + indent).join(lines)
+
+
+class DebugTemplates:
+    """Answers plain debug requests from templates"""
+
+    def __init__(self):
+        self.enabled = os.getenv("LACC_DEBUG_TEMPLATES", "1") != "0"
+
+    def instrument(self, prefix: str, request: str = "") -> str:
+        """Template instrumentation, or "" if the model should be asked"""
+        if not self.enabled or request.strip():
+            return ""
+        code = render(prefix)
+        stats.increment("debug_templates.served" if code else "debug_templates.fallback")
+        return code
+
+
+# Global debug templates instance
+debug_templates = DebugTemplates()
@@ -0,0 +1,392 @@
+"""
+Digests module for Local AI Code Completion
+
+A digest is a compact summary of one ABAP file: a one-line purpose, its
+public signatures and its key types. Digests are built locally from the
+lexer, cached by content hash and can be refined by the model in
+low-priority batches. Prompt builders include the digests of related
+files (includes, referenced classes and interfaces) instead of their
+full source.
+"""
+import hashlib
+import os
+import re
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+from .abap_lexer import COMMENT, split_statements, tokenize
+from .logger import logger
+from .memory import BoundedCache
+from .stats import stats
+from .storage import load_json, save_json
+from .workers import run_in_thread
+
+DIGESTS_FILE = "digests.json"
+
+# Digests kept on disk
+MAX_STORED = 500
+# Signatures and types kept per digest
+MAX_ITEMS = 24
+# Characters of one signature line
+MAX_ITEM_CHARS = 160
+# Digests refined per model request
+REFINE_BATCH = 8
+# Refine requests a digest may go unanswered in before it keeps its local purpose
+MAX_REFINE_ATTEMPTS = 3
+
+ABAP_SUFFIX = ".abap"
+
+# Names of other development objects a file refers to
+_REFERENCE_RE = re.compile(
+    r"\b(?:INCLUDE|REF\s+TO|INHERITING\s+FROM|INTERFACES|NEW|CAST|TYPE)\s+([zy][\w/]*)"
+    r"|\b([zy][\w/]*)=>",
+    re.IGNORECASE
+)
+
+# Declarations worth keeping from a public section or interface
+_MEMBER_KEYWORDS = {"METHODS", "CLASS-METHODS", "EVENTS", "CLASS-EVENTS", "CONSTANTS", "DATA", "CLASS-DATA",
+                    "ALIASES"}
+_TYPE_KEYWORDS = {"TYPES"}
+
+
+def content_hash(text: str) -> str:
+    """Key of a file's digest; unchanged content keeps its digest"""
+    return hashlib.sha1(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def _purpose_from_comments(text: str) -> str:
+    """First meaningful header comment line, before the first statement"""
+    for token in tokenize(text):
+        if token.kind != COMMENT:
+            break
+        line = token.text.lstrip('*"&').strip(" -=*&\"")
+        # Skip separator lines and tool-generated interface blocks
+        if len(line) > 3 and not line.upper().startswith(("LOCAL INTERFACE", "IMPORTING", "EXPORTING")):
+            return line[:MAX_ITEM_CHARS]
+    return ""
+
+
+def _compact(statement) -> str:
+    text = statement.text()
+    return text if len(text) <= MAX_ITEM_CHARS else text[:MAX_ITEM_CHARS - 3] + "..."
+
+
+def build_digest(text: str, name: str = "") -> Dict[str, Any]:
+    """Summarize an ABAP file locally: kind, purpose, public signatures, key types"""
+    kind = "include"
+    signatures: List[str] = []
+    types: List[str] = []
+    # None outside class definitions, else whether the current section is public
+    public: Optional[bool] = None
+    in_implementation = False
+    for statement in split_statements(text):
+        words = statement.words
+        if not words:
+            continue
+        keyword = words[0]
+        if keyword in ("REPORT", "PROGRAM", "FUNCTION-POOL") and len(words) > 1:
+            kind, name = "program", name or words[1].lower()
+        elif keyword in ("CLASS", "INTERFACE") and len(words) > 1:
+            if "DEFERRED" in words or "LOAD" in words:
+                continue
+            if keyword == "CLASS" and "IMPLEMENTATION" in words:
+                in_implementation = True
+                continue
+            if kind == "include" or kind == "program" and "PUBLIC" in words:
+                kind, name = keyword.lower(), words[1].lower()
+            public = keyword == "INTERFACE"
+            header = _compact(statement)
+            if "PUBLIC" in words or keyword == "INTERFACE" or kind == "program":
+                signatures.append(header)
+        elif keyword in ("ENDCLASS", "ENDINTERFACE"):
+            public = None
+            in_implementation = False
+        elif keyword in ("PUBLIC", "PROTECTED", "PRIVATE") and words[1:2] == ["SECTION"]:
+            public = keyword == "PUBLIC"
+        elif keyword in ("FORM", "FUNCTION") and not in_implementation:
+            signatures.append(_compact(statement))
+        elif public and keyword in _MEMBER_KEYWORDS:
+            signatures.append(_compact(statement))
+        elif keyword in _TYPE_KEYWORDS and (public or public is None and not in_implementation):
+            types.append(_compact(statement))
+    purpose = _purpose_from_comments(text)
+    if not purpose:
+        purpose = f"{kind} {name}".strip() + f" with {len(signatures)} public declarations"
+    return {
+        "name": name,
+        "kind": kind,
+        "purpose": purpose,
+        "signatures": signatures[:MAX_ITEMS],
+        "types": types[:MAX_ITEMS],
+        "refined": False,
+    }
+
+
+def format_digest(digest: Dict[str, Any], max_chars: int = 800) -> str:
+    """Render a digest for a prompt, cut to max_chars"""
+    lines = [f"{digest.get('name') or '?'} ({digest.get('kind', 'include')}): {digest.get('purpose', '')}"]
+    size = len(lines[0])
+    for item in digest.get("signatures", []) + digest.get("types", []):
+        if size + len(item) + 3 > max_chars:
+            lines.append("  ...")
+            break
+        lines.append("  " + item)
+        size += len(item) + 3
+    return "\n".join(lines)
+
+
+def object_name(path: str) -> str:
+    """Development object name of a file: zcl_foo.clas.abap -> zcl_foo"""
+    return Path(path).name.split(".", 1)[0].lower()
+
+
+def uri_to_path(uri: str) -> str:
+    """Local path of a file:// URI, else the empty string"""
+    parsed = urlparse(uri)
+    if parsed.scheme != "file":
+        return ""
+    path = unquote(parsed.path)
+    # file:///c:/x -> c:/x on Windows
+    if os.name == "nt" and re.match(r"/[A-Za-z]:", path):
+        path = path[1:]
+    return path
+
+
+def referenced_names(text: str) -> List[str]:
+    """Names of Z/Y objects a source refers to, in order of first use"""
+    names: Dict[str, None] = {}
+    for match in _REFERENCE_RE.finditer(text):
+        names[(match.group(1) or match.group(2)).lower()] = None
+    return list(names)
+
+
+def _digest_file_job(path: str) -> Tuple[str, str, Dict[str, Any]]:
+    """Worker job: read and summarize one file"""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    return path, content_hash(text), build_digest(text, object_name(path))
+
+
+class DigestCache:
+    """Digests by content hash, in memory and on disk, plus the file index they come from"""
+
+    def __init__(self):
+        self.context_chars = int(os.getenv("LACC_DIGEST_CHARS", "1500"))
+        self.max_related = int(os.getenv("LACC_DIGEST_FILES", "4"))
+        self.refine_enabled = os.getenv("LACC_DIGEST_REFINE", "0") == "1"
+        self._digests = BoundedCache("digests", max_bytes=4 * 1024 * 1024)
+        self._loaded = False
+        # path -> (mtime_ns, content hash)
+        self._files: Dict[str, Tuple[int, str]] = {}
+        # directory -> (mtime_ns, {object name: path})
+        self._directories: Dict[str, Tuple[int, Dict[str, str]]] = {}
+        self._refining = False
+
+    @property
+    def enabled(self) -> bool:
+        return os.getenv("LACC_DIGESTS", "1") != "0"
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        data = load_json(DIGESTS_FILE, {})
+        if not isinstance(data, dict):
+            return
+        for key, digest in (data.get("digests") or {}).items():
+            if isinstance(digest, dict):
+                self._digests.put(key, digest)
+        for path, entry in (data.get("files") or {}).items():
+            if isinstance(entry, list) and len(entry) == 2:
+                self._files[path] = (entry[0], entry[1])
+
+    def _save(self):
+        keys = self._digests.keys()[-MAX_STORED:]
+        digests = {key: self._digests.get(key) for key in keys}
+        files = {path: list(entry) for path, entry in self._files.items() if entry[1] in digests}
+        save_json(DIGESTS_FILE, {"digests": digests, "files": files})
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        self._load()
+        return self._digests.get(key)
+
+    def store(self, key: str, digest: Dict[str, Any], save: bool = True):
+        self._load()
+        self._digests.put(key, digest)
+        if save:
+            self._save()
+
+    def _directory_index(self, directory: str) -> Dict[str, str]:
+        """ABAP files of a directory by object name, rebuilt when the directory changes"""
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return {}
+        cached = self._directories.get(directory)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        index: Dict[str, str] = {}
+        try:
+            entries = sorted(os.listdir(directory), key=lambda n: n.count("."))
+        except OSError:
+            entries = []
+        for entry in entries:
+            if entry.lower().endswith(ABAP_SUFFIX):
+                # zcl_x.clas.abap wins over zcl_x.clas.locals_imp.abap
+                index.setdefault(object_name(entry), os.path.join(directory, entry))
+        self._directories[directory] = (mtime, index)
+        return index
+
+    def related_files(self, file_path: str, text: str) -> List[str]:
+        """Files next to file_path that text refers to"""
+        if not file_path:
+            return []
+        index = self._directory_index(os.path.dirname(os.path.abspath(file_path)))
+        own = object_name(file_path)
+        related = []
+        for name in referenced_names(text):
+            path = index.get(name)
+            if path and name != own:
+                related.append(path)
+                if len(related) >= self.max_related:
+                    break
+        return related
+
+    def _cached_for(self, path: str) -> Optional[Dict[str, Any]]:
+        """Digest of a file whose content did not change since it was summarized"""
+        self._load()
+        entry = self._files.get(path)
+        if entry is None:
+            return None
+        try:
+            if os.stat(path).st_mtime_ns != entry[0]:
+                return None
+        except OSError:
+            return None
+        digest = self.get(entry[1])
+        if digest is not None:
+            stats.increment("digests.hits")
+        return digest
+
+    async def digest_files(self, paths: List[str], run: Optional[Callable[..., Awaitable[Any]]] = None
+                           ) -> Dict[str, Dict[str, Any]]:
+        """Digests of files, building the missing ones with run (the worker pool)"""
+        result: Dict[str, Dict[str, Any]] = {}
+        missing = []
+        for path in paths:
+            digest = self._cached_for(path)
+            if digest is not None:
+                result[path] = digest
+            else:
+                missing.append(path)
+        if not missing:
+            return result
+        run = run or run_in_thread
+        jobs = []
+        for path in missing:
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            jobs.append((path, mtime, run(_digest_file_job, path)))
+        for path, mtime, job in jobs:
+            try:
+                _, key, digest = await job
+            except Exception as e:
+                logger.debug(f"Could not digest {path}: {e}")
+                continue
+            # A digest refined earlier for the same content is kept
+            digest = self.get(key) or digest
+            self.store(key, digest, save=False)
+            self._files[path] = (mtime, key)
+            stats.increment("digests.built")
+            result[path] = digest
+        self._save()
+        return result
+
+    async def context_for(self, file_path: str, text: str,
+                          run: Optional[Callable[..., Awaitable[Any]]] = None) -> str:
+        """Digests of the files text refers to, within the prompt budget"""
+        if not self.enabled:
+            return ""
+        paths = self.related_files(file_path, text)
+        if not paths:
+            return ""
+        digests = await self.digest_files(paths, run)
+        parts, used = [], 0
+        per_file = max(200, self.context_chars // max(1, len(paths)))
+        for path in paths:
+            if path not in digests:
+                continue
+            part = format_digest(digests[path], per_file)
+            if used + len(part) > self.context_chars:
+                break
+            parts.append(part)
+            used += len(part)
+        if parts:
+            stats.increment("digests.requests")
+            stats.increment("digests.context_chars", used)
+        return "\n\n".join(parts)
+
+    def pending_refinement(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Locally built digests of indexed files that the model has not refined yet"""
+        pending = []
+        for _, key in self._files.values():
+            digest = self.get(key)
+            if (digest is not None and not digest.get("refined")
+                    and digest.get("refine_attempts", 0) < MAX_REFINE_ATTEMPTS):
+                pending.append((key, digest))
+        return pending[:REFINE_BATCH]
+
+    @staticmethod
+    def build_refine_prompt(batch: List[Tuple[str, Dict[str, Any]]]) -> str:
+        """One prompt asking for a purpose line for every digest of the batch"""
+        blocks = "\n\n".join(f"[{i + 1}] {format_digest(digest, 600)}" for i, (_, digest) in enumerate(batch))
+        return f"""You are an expert ABAP developer. Below are summaries of ABAP files with their public signatures.
+
+{blocks}
+
+For each numbered file write exactly one line "[n] purpose" describing in at most 15 words what the file does.
+Return ONLY these lines, no explanations:"""
+
+    async def refine(self, ask_model: Callable[[str], Awaitable[str]]) -> int:
+        """Refine one batch of purposes with the model; returns the number refined"""
+        batch = self.pending_refinement()
+        if not batch or self._refining:
+            return 0
+        self._refining = True
+        answered = set()
+        try:
+            answer = await ask_model(self.build_refine_prompt(batch))
+            for match in re.finditer(r"^\s*\[(\d+)\]\s*(.+)$", answer or "", re.MULTILINE):
+                index = int(match.group(1)) - 1
+                if 0 <= index < len(batch) and index not in answered:
+                    key, digest = batch[index]
+                    self.store(key, {**digest, "purpose": match.group(2).strip()[:MAX_ITEM_CHARS], "refined": True},
+                               save=False)
+                    answered.add(index)
+        finally:
+            self._refining = False
+            # Digests the model failed or forgot to answer are asked again in a later batch
+            for index, (key, _) in enumerate(batch):
+                current = self.get(key)
+                if index not in answered and current is not None:
+                    self.store(key, {**current, "refine_attempts": current.get("refine_attempts", 0) + 1},
+                               save=False)
+            self._save()
+        refined = len(answered)
+        stats.increment("digests.refined", refined)
+        return refined
+
+    def describe(self) -> Dict[str, Any]:
+        self._load()
+        return {
+            "digests": len(self._digests),
+            "indexed_files": len(self._files),
+            "refine": self.refine_enabled,
+        }
+
+
+# Global digest cache instance
+digest_cache = DigestCache()
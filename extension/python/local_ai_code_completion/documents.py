@@ -0,0 +1,251 @@
+"""
+Documents module for Local AI Code Completion
+
+The long-running backend mirrors each open ABAP document and applies the
+editor's incremental edits (range + new text) instead of receiving full
+snapshots. Lines live in a blocked list with a block start index, so edits
+and line lookups only touch the blocks they affect. Generate requests then
+carry just a document version and cursor position.
+"""
+import sys
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .memory import memory_accountant
+
+# Lines per block; blocks are split beyond twice this size
+BLOCK_SIZE = 512
+
+
+def _utf16_index(line: str, character: int) -> int:
+    """Convert an editor column (UTF-16 code units) to a str index"""
+    if line.isascii():
+        return min(character, len(line))
+    units = 0
+    for index, ch in enumerate(line):
+        if units >= character:
+            return index
+        units += 2 if ord(ch) > 0xFFFF else 1
+    return len(line)
+
+
+class DocumentVersionError(ValueError):
+    """The mirror is missing or not at the version the request refers to"""
+
+
+class LineStore:
+    """Text as a blocked list of lines with a line-offset index over the blocks"""
+
+    def __init__(self, text: str = ""):
+        lines = text.split("\n")
+        self._blocks: List[List[str]] = [lines[i:i + BLOCK_SIZE] for i in range(0, len(lines), BLOCK_SIZE)] or [[""]]
+        self._starts: List[int] = []
+        self._bytes = sum(sys.getsizeof(line) for line in lines)
+        self._reindex(0)
+
+    def _reindex(self, from_block: int):
+        """Rebuild block start lines from the given block on"""
+        del self._starts[from_block:]
+        line = self._starts[-1] + len(self._blocks[from_block - 1]) if from_block else 0
+        for block in self._blocks[from_block:]:
+            self._starts.append(line)
+            line += len(block)
+        self._line_count = line
+
+    def _locate(self, line: int) -> Tuple[int, int]:
+        """Block index and offset within the block of a line"""
+        if not 0 <= line < self._line_count:
+            raise IndexError(f"Line {line} out of range (0-{self._line_count - 1})")
+        block = bisect_right(self._starts, line) - 1
+        return block, line - self._starts[block]
+
+    @property
+    def line_count(self) -> int:
+        return self._line_count
+
+    def line(self, line: int) -> str:
+        block, offset = self._locate(line)
+        return self._blocks[block][offset]
+
+    def lines(self, start: int = 0, end: Optional[int] = None) -> List[str]:
+        """Lines start..end (exclusive), touching only the blocks in range"""
+        end = self._line_count if end is None else min(end, self._line_count)
+        start = max(0, start)
+        if start >= end:
+            return []
+        block, offset = self._locate(start)
+        result: List[str] = []
+        while len(result) < end - start:
+            result.extend(self._blocks[block][offset:offset + end - start - len(result)])
+            block += 1
+            offset = 0
+        return result
+
+    def text(self) -> str:
+        return "\n".join(line for block in self._blocks for line in block)
+
+    def memory_size(self) -> int:
+        return self._bytes
+
+    def replace(self, start_line: int, start_char: int, end_line: int, end_char: int, text: str):
+        """Replace a range given in editor coordinates with new text"""
+        end_line = min(end_line, self._line_count - 1)
+        first, last = self.line(start_line), self.line(end_line)
+        head = first[:_utf16_index(first, start_char)]
+        tail = last[_utf16_index(last, end_char):]
+        self._splice(start_line, end_line + 1, (head + text + tail).split("\n"))
+
+    def _splice(self, start: int, end: int, new_lines: List[str]):
+        """Replace lines start..end (exclusive) with new_lines"""
+        first_block, first_offset = self._locate(start)
+        last_block, _ = self._locate(end - 1)
+        merged = [line for block in self._blocks[first_block:last_block + 1] for line in block]
+        removed = merged[first_offset:first_offset + end - start]
+        merged[first_offset:first_offset + end - start] = new_lines
+        self._bytes += sum(sys.getsizeof(line) for line in new_lines) - sum(sys.getsizeof(line) for line in removed)
+
+        # Keep blocks between BLOCK_SIZE/2 and 2*BLOCK_SIZE lines where possible
+        if len(merged) < BLOCK_SIZE // 2 and last_block + 1 < len(self._blocks):
+            last_block += 1
+            merged.extend(self._blocks[last_block])
+        if len(merged) > 2 * BLOCK_SIZE:
+            replacement = [merged[i:i + BLOCK_SIZE] for i in range(0, len(merged), BLOCK_SIZE)]
+        else:
+            replacement = [merged] if merged else []
+        self._blocks[first_block:last_block + 1] = replacement
+        if not self._blocks:
+            self._blocks = [[""]]
+        self._reindex(first_block)
+
+
+class Document:
+    """An open document mirrored from the editor"""
+    __slots__ = ("uri", "version", "store")
+
+    def __init__(self, uri: str, text: str, version: int):
+        self.uri = uri
+        self.version = version
+        self.store = LineStore(text)
+
+    def apply(self, changes: List[Dict[str, Any]], version: int):
+        """Apply editor content changes in order; a change without range replaces everything"""
+        for change in changes:
+            change_range = change.get("range")
+            if change_range is None:
+                self.store = LineStore(change.get("text", ""))
+                continue
+            start, end = change_range["start"], change_range["end"]
+            self.store.replace(start["line"], start["character"], end["line"], end["character"], change.get("text", ""))
+        self.version = version
+
+    def context(self, line: int, character: int, max_prefix_lines: int = 0,
+                max_suffix_lines: int = 0) -> Tuple[str, str]:
+        """Prefix and suffix around a cursor, as the extension used to build them"""
+        store = self.store
+        current = store.line(line)
+        split = _utf16_index(current, character)
+        first = max(0, line - max_prefix_lines) if max_prefix_lines else 0
+        last = min(store.line_count, line + 1 + max_suffix_lines) if max_suffix_lines else store.line_count
+        prefix = "\n".join(store.lines(first, line) + [current[:split]])
+        suffix = "\n".join([current[split:]] + store.lines(line + 1, last))
+        return prefix, suffix
+
+    def cursor_lines(self, line: int, character: int) -> Tuple[str, str]:
+        """Text before the cursor on its line, and the line above"""
+        current = self.store.line(line)
+        previous = self.store.line(line - 1) if line > 0 else ""
+        return current[:_utf16_index(current, character)], previous
+
+    def selection(self, start_line: int, start_char: int, end_line: int, end_char: int) -> Tuple[str, str, str]:
+        """Lines before, selected text and lines after a selection (comment mode)"""
+        store = self.store
+        first, last = store.line(start_line), store.line(end_line)
+        if start_line == end_line:
+            selected = first[_utf16_index(first, start_char):_utf16_index(first, end_char)]
+        else:
+            selected = "\n".join(
+                [first[_utf16_index(first, start_char):]]
+                + store.lines(start_line + 1, end_line)
+                + [last[:_utf16_index(last, end_char)]]
+            )
+        prefix = "\n".join(store.lines(0, start_line))
+        suffix = "\n".join(store.lines(end_line + 1))
+        return prefix, selected, suffix
+
+
+class DocumentStore:
+    """Mirrors of the documents open in the editor, registered with the memory accountant"""
+
+    def __init__(self, max_documents: int = 64):
+        self.max_documents = max_documents
+        self._documents: "OrderedDict[str, Document]" = OrderedDict()
+        self._lock = threading.Lock()
+        memory_accountant.register("documents", self)
+
+    def open(self, uri: str, text: str, version: int) -> Document:
+        document = Document(uri, text, version)
+        with self._lock:
+            self._documents.pop(uri, None)
+            self._documents[uri] = document
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+        memory_accountant.enforce()
+        return document
+
+    def change(self, uri: str, version: int, changes: List[Dict[str, Any]]) -> Document:
+        """Apply incremental changes; the extension resends the full text on a version error"""
+        with self._lock:
+            document = self._documents.get(uri)
+            if document is None:
+                raise DocumentVersionError(f"Document not open: {uri}")
+            if version <= document.version:
+                # Stale or repeated event
+                return document
+            try:
+                document.apply(changes, version)
+            except (IndexError, KeyError, TypeError) as e:
+                # The mirror can't be trusted any more
+                del self._documents[uri]
+                raise DocumentVersionError(f"Could not apply changes to {uri}: {e}")
+            self._documents.move_to_end(uri)
+        return document
+
+    def close(self, uri: str):
+        with self._lock:
+            self._documents.pop(uri, None)
+
+    def get(self, uri: str, version: Optional[int] = None) -> Document:
+        """Get a mirrored document, checking it is at the expected version"""
+        with self._lock:
+            document = self._documents.get(uri)
+        if document is None:
+            raise DocumentVersionError(f"Document not open: {uri}")
+        if version is not None and document.version != version:
+            raise DocumentVersionError(f"Document {uri} is at version {document.version}, not {version}")
+        return document
+
+    def describe(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                uri: {"version": d.version, "lines": d.store.line_count}
+                for uri, d in self._documents.items()
+            }
+
+    def memory_size(self) -> int:
+        with self._lock:
+            return sum(d.store.memory_size() for d in self._documents.values())
+
+    def evict(self, nbytes: int) -> int:
+        """Forget least recently edited documents; the extension reopens them on demand"""
+        freed = 0
+        with self._lock:
+            while self._documents and freed < nbytes:
+                _, document = self._documents.popitem(last=False)
+                freed += document.store.memory_size()
+        return freed
+
+
+# Global document store instance
+document_store = DocumentStore()
@@ -0,0 +1,192 @@
+"""
+Governor module for Local AI Code Completion
+
+Tracks the tokens reported by the API over a rolling minute and the current
+calendar month, shared by all backend processes through the cache
+directory; updates hold a lock file so concurrent backends don't lose
+each other's tokens. As usage approaches the per-minute quota
+(LACC_TOKENS_PER_MINUTE) or the monthly budget (LACC_TOKEN_BUDGET_MONTHLY),
+requests degrade in steps instead of running into the quota wall:
+
+    level 1  smaller context (LACC_GOVERNOR_CONTEXT_CHARS), no related-file digests
+    level 2  also lower max_tokens (LACC_GOVERNOR_MAX_TOKENS)
+    level 3  also a cheaper model (LACC_GOVERNOR_MODEL, default the last
+             LACC_ROUTER_MODELS entry; without either the model stays)
+
+The levels start at the usage fractions in LACC_GOVERNOR_STEPS. Local
+providers have no quota and are never degraded.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+from .storage import file_lock, get_cache_dir, load_json, save_json
+
+GOVERNOR_FILE = "governor.json"
+
+# Providers without quotas
+UNMETERED_PROVIDERS = {"local"}
+# Days of history kept on disk
+KEEP_DAYS = 62
+
+
+class Plan(NamedTuple):
+    """How a request is sized under the current usage"""
+    level: int
+    context_chars: int      # 0 = unlimited
+    include_related: bool
+    max_tokens: int         # 0 = the caller's default
+    model: str              # "" = the normal model choice
+
+
+FULL = Plan(0, 0, True, 0, "")
+
+
+def trim_context(prefix: str, suffix: str, budget: int) -> Tuple[str, str]:
+    """Keep the text closest to the cursor within a character budget, split 3:1 before/after"""
+    if budget <= 0 or len(prefix) + len(suffix) <= budget:
+        return prefix, suffix
+    suffix_budget = min(len(suffix), budget // 4)
+    prefix_budget = budget - suffix_budget
+    if len(prefix) < prefix_budget:
+        suffix_budget = budget - len(prefix)
+        prefix_budget = len(prefix)
+    # Cut at line boundaries so the model never sees half a statement at the edge
+    trimmed_prefix = prefix[len(prefix) - prefix_budget:]
+    newline = trimmed_prefix.find("\n")
+    if 0 <= newline < len(trimmed_prefix) - 1 and prefix_budget < len(prefix):
+        trimmed_prefix = trimmed_prefix[newline + 1:]
+    trimmed_suffix = suffix[:suffix_budget]
+    newline = trimmed_suffix.rfind("\n")
+    if newline > 0 and suffix_budget < len(suffix):
+        trimmed_suffix = trimmed_suffix[:newline]
+    return trimmed_prefix, trimmed_suffix
+
+
+class TokenGovernor:
+    """Rolling token usage and the degradation level derived from it"""
+
+    def __init__(self):
+        self.minute_limit = int(os.getenv("LACC_TOKENS_PER_MINUTE", "6000"))
+        self.monthly_budget = int(os.getenv("LACC_TOKEN_BUDGET_MONTHLY", "0"))
+        self.steps = [float(step) for step in os.getenv("LACC_GOVERNOR_STEPS", "0.6,0.8,0.95").split(",")][:3]
+        self.context_chars = int(os.getenv("LACC_GOVERNOR_CONTEXT_CHARS", "4000"))
+        self.max_tokens = int(os.getenv("LACC_GOVERNOR_MAX_TOKENS", "300"))
+        self._lock = threading.Lock()
+        # (time, tokens) of the last minute and tokens per day ("YYYY-MM-DD")
+        self._minute: List[Tuple[float, int]] = []
+        self._days: Dict[str, int] = {}
+        self._mtime = None
+
+    def _path(self):
+        return get_cache_dir() / GOVERNOR_FILE
+
+    def _load(self):
+        """Reload the shared usage when another process has written it"""
+        try:
+            mtime = os.stat(self._path()).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        self._mtime = mtime
+        data = load_json(GOVERNOR_FILE, {})
+        if not isinstance(data, dict):
+            data = {}
+        now = time.time()
+        self._minute = [(float(t), int(n)) for t, n in data.get("minute", []) if now - float(t) < 60]
+        self._days = {day: int(n) for day, n in (data.get("days") or {}).items()}
+
+    def _save(self):
+        cutoff = time.strftime("%Y-%m-%d", time.localtime(time.time() - KEEP_DAYS * 86400))
+        self._days = {day: n for day, n in self._days.items() if day >= cutoff}
+        save_json(GOVERNOR_FILE, {"minute": [list(entry) for entry in self._minute], "days": self._days})
+        try:
+            self._mtime = os.stat(self._path()).st_mtime_ns
+        except OSError:
+            self._mtime = None
+
+    def usage(self) -> Dict[str, int]:
+        """Tokens used in the last minute and in the current month"""
+        with self._lock:
+            self._load()
+            now = time.time()
+            month = time.strftime("%Y-%m", time.localtime(now))
+            return {
+                "minute": sum(n for t, n in self._minute if now - t < 60),
+                "month": sum(n for day, n in self._days.items() if day.startswith(month)),
+            }
+
+    def pressure(self) -> float:
+        """Highest fraction of a limit already used"""
+        usage = self.usage()
+        fractions = [0.0]
+        if self.minute_limit > 0:
+            fractions.append(usage["minute"] / self.minute_limit)
+        if self.monthly_budget > 0:
+            fractions.append(usage["month"] / self.monthly_budget)
+        return max(fractions)
+
+    def level(self) -> int:
+        pressure = self.pressure()
+        return sum(1 for step in self.steps if pressure >= step)
+
+    def plan(self, provider: str, model_config=None) -> Plan:
+        """Sizing of the next request to a provider"""
+        if provider in UNMETERED_PROVIDERS:
+            return FULL
+        level = self.level()
+        if level == 0:
+            return FULL
+        model = ""
+        if level >= 3:
+            model = self._cheapest_model(model_config)
+        return Plan(
+            level,
+            self.context_chars,
+            False,
+            self.max_tokens if level >= 2 else 0,
+            model,
+        )
+
+    @staticmethod
+    def _cheapest_model(model_config) -> str:
+        """Model of the last step; "" keeps the normal model choice"""
+        configured = getattr(model_config, "governor_model", "")
+        if configured:
+            return configured
+        # Router models are listed in quality order, so the last one is the cheapest
+        models = [name.strip() for name in (getattr(model_config, "router_models", "") or "").split(",") if name.strip()]
+        return models[-1] if models else ""
+
+    def record(self, provider: str, tokens: int):
+        """Add the tokens of a finished request"""
+        if provider in UNMETERED_PROVIDERS or tokens <= 0:
+            return
+        with self._lock, file_lock(GOVERNOR_FILE):
+            # Merge with what other processes recorded meanwhile; under the lock nobody
+            # writes between this read and the save
+            self._mtime = None
+            self._load()
+            now = time.time()
+            day = time.strftime("%Y-%m-%d", time.localtime(now))
+            self._minute = [(t, n) for t, n in self._minute if now - t < 60]
+            self._minute.append((now, tokens))
+            self._days[day] = self._days.get(day, 0) + tokens
+            self._save()
+
+    def describe(self) -> Dict[str, Any]:
+        usage = self.usage()
+        return {
+            "tokens_last_minute": usage["minute"],
+            "tokens_this_month": usage["month"],
+            "tokens_per_minute_limit": self.minute_limit,
+            "monthly_budget": self.monthly_budget,
+            "level": self.level(),
+            "steps": self.steps,
+        }
+
+
+# Global token governor instance
+governor = TokenGovernor()
@@ -1,19 +1,26 @@
 """
 Logger module for Local AI Code Completion
+
+Records are handed to a queue and written by a background listener thread,
+so logging never blocks the request path. Output goes to stderr or a rotating
+log file; stdout is reserved for protocol output read by the VS Code extension.
 """
+import atexit
 import logging
+import logging.handlers
+import os
+import queue
 import sys
 from typing import Optional
 
-# Try to import rich for pretty logging; fall back to basic logging if unavailable
-try:
-    from rich.console import Console
-    from rich.logging import RichHandler
-    RICH_AVAILABLE = True
-except Exception:
-    Console = None
-    RichHandler = None
-    RICH_AVAILABLE = False
+
+def _parse_level(value: str) -> int:
+    """Convert a level name or number from the environment to a logging level"""
+    value = (value or "").strip().upper()
+    if value.isdigit():
+        return int(value)
+    level = logging.getLevelName(value)
+    return level if isinstance(level, int) else logging.WARNING
 
 
 class Logger:
@@ -21,40 +28,91 @@ class Logger:
 
     def __init__(self, name: str = "Local AI Completion"):
         self.name = name
-        # Initialize console and logger instance variables
-        self.console = Console() if RICH_AVAILABLE else None
+        # Rich is only loaded when requested with LACC_LOG_RICH=1
+        self.console = None
         self.logger = logging.getLogger(name)
+        self.logger.propagate = False
+        self._queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        self._listener: Optional[logging.handlers.QueueListener] = None
         self._setup_logger()
 
-    def _setup_logger(self):
-        """Setup the logger with rich formatting"""
-        self.logger.setLevel(logging.DEBUG)
-
-        if RICH_AVAILABLE and RichHandler is not None:
+    def _create_rich_handler(self) -> Optional[logging.Handler]:
+        """Create a Rich handler writing to stderr, if rich is installed"""
+        try:
+            from rich.console import Console
+            from rich.logging import RichHandler
+        except Exception:
+            return None
+
+        try:
+            self.console = Console(stderr=True)
+            handler = RichHandler(
+                console=self.console,
+                show_time=True,
+                show_path=False,
+                markup=True,
+                rich_tracebacks=True
+            )
+            handler.setFormatter(logging.Formatter("%(message)s", datefmt="[%X]"))
+            return handler
+        except Exception:
+            # Fall back to basic handler if rich handler setup fails
+            self.console = None
+            return None
+
+    def _create_handler(self) -> logging.Handler:
+        """Create the handler the background listener writes to"""
+        log_file = os.getenv("LACC_LOG_FILE", "")
+        if log_file:
             try:
-                rich_handler = RichHandler(
-                    console=self.console,
-                    show_time=True,
-                    show_path=False,
-                    markup=True,
-                    rich_tracebacks=True
+                handler = logging.handlers.RotatingFileHandler(
+                    os.path.expanduser(log_file),
+                    maxBytes=int(os.getenv("LACC_LOG_MAX_BYTES", str(1024 * 1024))),
+                    backupCount=int(os.getenv("LACC_LOG_BACKUP_COUNT", "3")),
+                    encoding="utf-8",
+                    delay=True
                 )
-                rich_handler.setLevel(logging.DEBUG)
-
-                formatter = logging.Formatter("%(message)s", datefmt="[%X]")
-                rich_handler.setFormatter(formatter)
-                self.logger.addHandler(rich_handler)
-                return
-            except Exception:
-                # Fall back to basic handler if rich handler setup fails
+                handler.setFormatter(logging.Formatter("%(asctime)s - %(process)d - %(levelname)s - %(message)s"))
+                return handler
+            except (OSError, ValueError):
+                # Fall back to stderr if the log file cannot be used
                 pass
 
-        # Fallback to basic console logging
-        handler = logging.StreamHandler(sys.stdout)
-        handler.setLevel(logging.DEBUG)
-        formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-        handler.setFormatter(formatter)
-        self.logger.addHandler(handler)
+        if os.getenv("LACC_LOG_RICH", "") == "1":
+            rich_handler = self._create_rich_handler()
+            if rich_handler is not None:
+                return rich_handler
+
+        # Never log to stdout: the extension treats stdout as the command result
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+        return handler
+
+    def _setup_logger(self):
+        """Setup the queue handler and its background listener"""
+        level = _parse_level(os.getenv("LACC_LOG_LEVEL", "WARNING"))
+        self.logger.setLevel(level)
+
+        handler = self._create_handler()
+        handler.setLevel(level)
+        self.logger.addHandler(logging.handlers.QueueHandler(self._queue))
+
+        self._listener = logging.handlers.QueueListener(self._queue, handler, respect_handler_level=True)
+        self._listener.start()
+        # Drain queued records before the interpreter exits
+        atexit.register(self.dispose)
+
+    def set_level(self, level: str):
+        """Change the log level at runtime"""
+        parsed = _parse_level(level)
+        self.logger.setLevel(parsed)
+        if self._listener:
+            for handler in self._listener.handlers:
+                handler.setLevel(parsed)
+
+    def is_enabled_for(self, level: int) -> bool:
+        """Check if a level is enabled, to skip building expensive messages"""
+        return self.logger.isEnabledFor(level)
 
     def info(self, message: str, *args, **kwargs):
         """Log info message"""
@@ -77,7 +135,18 @@ class Logger:
         self.logger.critical(message, *args, **kwargs)
 
     def dispose(self):
-        """Clean up logger resources"""
+        """Flush queued records and clean up logger resources"""
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            try:
+                listener.stop()
+            except Exception:
+                pass
+            for handler in listener.handlers:
+                try:
+                    handler.close()
+                except Exception:
+                    pass
         for handler in list(self.logger.handlers):
             try:
                 self.logger.removeHandler(handler)
@@ -87,4 +156,4 @@ class Logger:
 
 
 # Global logger instance
-logger = Logger() 
\ No newline at end of file
+logger = Logger()
@@ -0,0 +1,270 @@
+"""
+Memory module for Local AI Code Completion
+
+Every backend cache and index registers with the global memory accountant,
+which enforces a total budget (LACC_MEMORY_BUDGET_MB) with size-aware
+eviction and can shrink caches further when the process RSS exceeds
+LACC_MAX_RSS_MB.
+"""
+import os
+import sys
+import threading
+import tracemalloc
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Protocol
+
+from .logger import logger
+
+MB = 1024 * 1024
+
+
+class AccountedCache(Protocol):
+    """Interface a cache implements to be managed by the accountant"""
+
+    def memory_size(self) -> int: ...
+
+    def evict(self, nbytes: int) -> int: ...
+
+
+def estimate_size(value: Any) -> int:
+    """Estimate the memory held by a cached value (shallow for containers)"""
+    if isinstance(value, (str, bytes, int, float, type(None))):
+        return sys.getsizeof(value)
+    if isinstance(value, CompactText):
+        return value.memory_size()
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    size = getattr(value, "memory_size", None)
+    if callable(size):
+        return size()
+    return sys.getsizeof(value)
+
+
+def current_rss() -> int:
+    """Get the resident set size of this process in bytes (0 if unknown)"""
+    try:
+        # Linux: second field of statm is resident pages
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        # Peak rather than current RSS, but the best available on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except Exception:
+        return 0
+
+
+class CompactText:
+    """Stores a string compactly: UTF-8 bytes, zlib-compressed when large"""
+    __slots__ = ("_data", "_compressed")
+
+    COMPRESS_THRESHOLD = 1024
+
+    def __init__(self, text: str):
+        data = text.encode("utf-8", "surrogatepass")
+        self._compressed = len(data) >= self.COMPRESS_THRESHOLD
+        self._data = zlib.compress(data, 1) if self._compressed else data
+
+    def __str__(self) -> str:
+        data = zlib.decompress(self._data) if self._compressed else self._data
+        return data.decode("utf-8", "surrogatepass")
+
+    def memory_size(self) -> int:
+        return sys.getsizeof(self._data) + 56
+
+
+class MemoryAccountant:
+    """Tracks memory used by backend caches and enforces a total budget"""
+
+    def __init__(self, budget_bytes: Optional[int] = None):
+        if budget_bytes is None:
+            budget_bytes = int(float(os.getenv("LACC_MEMORY_BUDGET_MB", "64")) * MB)
+        self.budget_bytes = budget_bytes
+        self.max_rss_bytes = int(float(os.getenv("LACC_MAX_RSS_MB", "0")) * MB)
+        self._caches: Dict[str, AccountedCache] = {}
+        self._lock = threading.RLock()
+        self.evicted_bytes = 0
+
+    def register(self, name: str, cache: AccountedCache):
+        """Register a cache or index under a subsystem name"""
+        with self._lock:
+            self._caches[name] = cache
+
+    def unregister(self, name: str):
+        with self._lock:
+            self._caches.pop(name, None)
+
+    def sizes(self) -> Dict[str, int]:
+        """Accounted bytes per registered cache"""
+        with self._lock:
+            return {name: cache.memory_size() for name, cache in self._caches.items()}
+
+    def _effective_budget(self) -> int:
+        """The budget, halved while the process is above its RSS cap"""
+        if self.max_rss_bytes and current_rss() > self.max_rss_bytes:
+            return self.budget_bytes // 2
+        return self.budget_bytes
+
+    def enforce(self) -> int:
+        """Evict from the largest caches until the total fits the budget"""
+        with self._lock:
+            budget = self._effective_budget()
+            sizes = self.sizes()
+            total = sum(sizes.values())
+            freed_total = 0
+            while total > budget and sizes:
+                # Size-aware: the largest cache gives up memory first
+                name = max(sizes, key=sizes.get)
+                freed = self._caches[name].evict(total - budget)
+                if freed <= 0:
+                    sizes.pop(name)
+                    continue
+                sizes[name] -= freed
+                total -= freed
+                freed_total += freed
+            if freed_total:
+                self.evicted_bytes += freed_total
+                logger.debug(f"Memory accountant evicted {freed_total} bytes")
+            return freed_total
+
+    def report(self) -> Dict[str, Any]:
+        """Accounted memory per cache, budget and process RSS"""
+        sizes = self.sizes()
+        return {
+            "budget_bytes": self.budget_bytes,
+            "accounted_bytes": sum(sizes.values()),
+            "evicted_bytes": self.evicted_bytes,
+            "rss_bytes": current_rss(),
+            "max_rss_bytes": self.max_rss_bytes,
+            "caches": sizes,
+        }
+
+
+class BoundedCache:
+    """LRU cache with size-aware eviction, registered with the memory accountant"""
+
+    def __init__(self, name: str, max_bytes: Optional[int] = None,
+                 sizeof: Callable[[Any], int] = estimate_size,
+                 accountant: Optional[MemoryAccountant] = None):
+        self.name = name
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._items: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.accountant = accountant or memory_accountant
+        self.accountant.register(name, self)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any, size: Optional[int] = None):
+        with self._lock:
+            self._remove(key)
+            size = size if size is not None else self.sizeof(value)
+            self._items[key] = value
+            self._sizes[key] = size
+            self._bytes += size
+            if self.max_bytes is not None and self._bytes > self.max_bytes:
+                self.evict(self._bytes - self.max_bytes)
+        self.accountant.enforce()
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value = self._items.get(key, default)
+            self._remove(key)
+            return value
+
+    def _remove(self, key: Hashable):
+        if key in self._items:
+            del self._items[key]
+            self._bytes -= self._sizes.pop(key)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def keys(self) -> List[Hashable]:
+        with self._lock:
+            return list(self._items.keys())
+
+    def memory_size(self) -> int:
+        return self._bytes
+
+    def evict(self, nbytes: int) -> int:
+        """Drop least recently used items until nbytes were freed"""
+        freed = 0
+        with self._lock:
+            while self._items and freed < nbytes:
+                key = next(iter(self._items))
+                freed += self._sizes[key]
+                self._remove(key)
+                self.evictions += 1
+        return freed
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+
+def _subsystem_for(filename: str) -> str:
+    """Map a source file to the backend subsystem it belongs to"""
+    path = filename.replace("\\", "/")
+    if "/local_ai_code_completion/" in path:
+        module = path.rsplit("/", 1)[-1].rsplit(".", 1)[0]
+        return "local_ai_code_completion" if module == "__init__" else module
+    if "/site-packages/" in path or "/dist-packages/" in path:
+        package = path.split("-packages/", 1)[1].split("/", 1)[0]
+        return f"lib:{package.split('.', 1)[0]}"
+    if path.endswith("/main.py") or path.endswith("/server.py"):
+        return path.rsplit("/", 1)[-1].rsplit(".", 1)[0]
+    if path.startswith("<"):
+        return "python:internal"
+    return "python:stdlib"
+
+
+def tracemalloc_report(limit: int = 10) -> Dict[str, Any]:
+    """Break traced memory down by subsystem from a tracemalloc snapshot"""
+    if not tracemalloc.is_tracing():
+        return {"tracing": False}
+    snapshot = tracemalloc.take_snapshot()
+    by_subsystem: Dict[str, int] = {}
+    by_file = snapshot.statistics("filename")
+    for stat in by_file:
+        name = _subsystem_for(stat.traceback[0].filename)
+        by_subsystem[name] = by_subsystem.get(name, 0) + stat.size
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "tracing": True,
+        "traced_bytes": current,
+        "peak_traced_bytes": peak,
+        "subsystems": dict(sorted(by_subsystem.items(), key=lambda item: -item[1])),
+        "top_lines": [
+            {"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", "bytes": stat.size}
+            for stat in snapshot.statistics("lineno")[:limit]
+        ],
+    }
+
+
+# Global memory accountant instance
+memory_accountant = MemoryAccountant()
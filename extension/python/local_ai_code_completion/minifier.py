@@ -0,0 +1,182 @@
+"""
+Minifier module for Local AI Code Completion
+
+Shrinks the context sent to the model without changing what the code
+means: full-line and trailing comments are dropped, indentation and
+alignment whitespace collapse to single spaces, repeated identical global
+declarations are sent once and, optionally, long runs of literal rows
+(VALUE tables, APPEND ... TO lines) are cut to their first rows.
+
+The lines around the cursor stay verbatim so the model still sees the
+exact indentation, comments and partial line it continues from. The
+comment of a comment-mode request is a separate prompt part and is never
+touched.
+"""
+import os
+from typing import List, Optional, Tuple
+
+from .abap_lexer import COLON, COMMENT, STRING, WORD, tokenize
+from .logger import logger
+from .stats import stats
+
+# Statements that only declare something; identical repeats carry no new information
+DECLARATION_KEYWORDS = {"DATA", "TYPES", "CONSTANTS", "FIELD-SYMBOLS", "STATICS", "CLASS-DATA", "TABLES"}
+# Procedures with their own local declarations: the same DATA line in two of them declares two variables
+UNIT_KEYWORDS = {"METHOD": "ENDMETHOD", "FORM": "ENDFORM", "FUNCTION": "ENDFUNCTION", "MODULE": "ENDMODULE",
+                 # Attributes of two classes or interfaces are two sets of components
+                 "CLASS": "ENDCLASS", "INTERFACE": "ENDINTERFACE"}
+# CLASS ... DEFINITION DEFERRED and the like only name a class and open no block
+FORWARD_WORDS = {"DEFERRED", "LOAD"}
+UNIT_ENDS = set(UNIT_KEYWORDS.values())
+
+
+def _minify_line(tokens) -> Tuple[str, str, bool]:
+    """Minified text of one line's tokens, its shape and whether it holds a literal"""
+    text = []
+    shape = []
+    has_literal = False
+    end = None
+    for token in tokens:
+        if token.kind == COMMENT:
+            continue
+        # Keep adjacency ('text'(001), 1.5, ls_a-b.): only existing gaps become one space
+        if end is not None and token.col > end:
+            text.append(" ")
+            shape.append(" ")
+        text.append(token.text)
+        if token.kind == STRING:
+            has_literal = True
+            shape.append("'?'")
+        elif token.kind == WORD and token.text.isdigit():
+            has_literal = True
+            shape.append("0")
+        else:
+            shape.append(token.text)
+        end = token.col + len(token.text)
+    return "".join(text), "".join(shape), has_literal
+
+
+def _declaration_key(tokens, text: str) -> Optional[str]:
+    """Key of a line holding exactly one complete, unchained declaration"""
+    words = [token for token in tokens if token.kind != COMMENT]
+    if not words or words[0].kind != WORD or words[0].text.upper() not in DECLARATION_KEYWORDS:
+        return None
+    if not text.endswith(".") or text.count(".") != 1 or any(token.kind == COLON for token in words):
+        return None
+    return text
+
+
+def _first_word(tokens) -> str:
+    for token in tokens:
+        if token.kind != COMMENT:
+            return token.text.upper() if token.kind == WORD else ""
+    return ""
+
+
+def _opens_unit(tokens, first: str) -> bool:
+    if first not in UNIT_KEYWORDS:
+        return False
+    if first in ("CLASS", "INTERFACE"):
+        return not any(token.kind == WORD and token.text.upper().rstrip(".") in FORWARD_WORDS for token in tokens)
+    return True
+
+
+class Declarations:
+    """Global declarations already sent, and whether the lines so far end inside a procedure or class"""
+
+    def __init__(self):
+        self.seen: set = set()
+        self.in_unit = False
+
+
+class ContextMinifier:
+    """Minifies prompt context outside the cursor region"""
+
+    def __init__(self):
+        self.enabled = os.getenv("LACC_MINIFY", "1") != "0"
+        # Lines before and after the cursor that are sent verbatim
+        self.cursor_lines = max(1, int(os.getenv("LACC_MINIFY_CURSOR_LINES", "8")))
+        # Rows of a literal table kept; 0 keeps whole tables
+        self.literal_rows = int(os.getenv("LACC_MINIFY_LITERAL_ROWS", "0"))
+
+    def minify_lines(self, lines: List[str], declarations: Optional[Declarations] = None) -> List[str]:
+        """Minify whole lines; global declarations already sent are dropped"""
+        if not lines:
+            return []
+        declarations = Declarations() if declarations is None else declarations
+        per_line: List[list] = [[] for _ in lines]
+        for token in tokenize("\n".join(lines)):
+            per_line[token.line].append(token)
+
+        result: List[str] = []
+        # Shape of the current run of literal rows and how many rows were elided
+        run_shape = None
+        run_length = 0
+        elided = 0
+
+        def close_run():
+            if elided:
+                result.append(f"* ... {elided} more similar lines")
+
+        for tokens in per_line:
+            text, shape, has_literal = _minify_line(tokens)
+            if not text:
+                continue
+            first = _first_word(tokens)
+            if _opens_unit(tokens, first):
+                declarations.in_unit = True
+            elif first in UNIT_ENDS:
+                declarations.in_unit = False
+            key = None if declarations.in_unit else _declaration_key(tokens, text)
+            if key is not None:
+                if key in declarations.seen:
+                    continue
+                declarations.seen.add(key)
+            if self.literal_rows > 0 and has_literal and shape == run_shape:
+                run_length += 1
+                if run_length > self.literal_rows:
+                    elided += 1
+                    continue
+            else:
+                close_run()
+                run_shape = shape if has_literal else None
+                run_length = 1
+                elided = 0
+            result.append(text)
+        close_run()
+        return result
+
+    def minify(self, prefix: str, suffix: str) -> Tuple[str, str]:
+        """Minified prefix and suffix; the lines next to the cursor are kept verbatim"""
+        if not self.enabled:
+            return prefix, suffix
+        before = prefix.split("\n")
+        after = suffix.split("\n")
+        # The partial line at the cursor and its neighbours stay as they are
+        head, tail = before[:-self.cursor_lines], before[-self.cursor_lines:]
+        near, rest = after[:self.cursor_lines], after[self.cursor_lines:]
+        if not head and not rest:
+            return prefix, suffix
+
+        # Only repeats of a global declaration already sent earlier in the prompt are dropped
+        declarations = Declarations()
+        minified_head = self.minify_lines(head, declarations)
+        # The verbatim region is sent as it is; only its declarations are noted
+        self.minify_lines(tail + near, declarations)
+        minified_prefix = "\n".join(minified_head + tail)
+        minified_suffix = "\n".join(near + self.minify_lines(rest, declarations))
+
+        before_chars = len(prefix) + len(suffix)
+        after_chars = len(minified_prefix) + len(minified_suffix)
+        # ~4 characters per token, like the rest of the backend's estimates
+        saved_tokens = (before_chars - after_chars) // 4
+        stats.increment("minify.requests")
+        stats.increment("minify.chars_before", before_chars)
+        stats.increment("minify.chars_after", after_chars)
+        stats.increment("minify.tokens_saved", saved_tokens)
+        logger.info(f"Minified context: {before_chars} -> {after_chars} chars (~{saved_tokens} prompt tokens saved)")
+        return minified_prefix, minified_suffix
+
+
+# Global context minifier instance
+context_minifier = ContextMinifier()
@@ -0,0 +1,178 @@
+"""
+Overlap module for Local AI Code Completion
+
+Models often re-emit the lines that already follow the cursor, or start by
+repeating the last lines before it. The detector sits in the streaming
+path and compares each completed output line with the head of the suffix
+and the tail of the prefix:
+
+- once the output reproduces the suffix head, the stream is stopped and
+  the duplicated lines are dropped
+- repeated prefix lines at the start of the output are trimmed
+
+Lines are compared with whitespace stripped. Short lines such as ENDIF.
+match too easily, so a match must cover MIN_MATCH_CHARS characters before
+it counts.
+"""
+from typing import List
+
+from .stats import stats
+
+# Non-blank prefix lines a repeated start of the output is compared with
+PREFIX_TAIL_LINES = 6
+# Non-blank suffix lines an output line is compared with
+SUFFIX_HEAD_LINES = 3
+# Characters a match must cover before it is trusted
+MIN_MATCH_CHARS = 16
+# Suffix lines the model would likely have gone on to copy, for the savings estimate
+SUFFIX_LOOKAHEAD_LINES = 20
+
+
+def _key(line: str) -> str:
+    return " ".join(line.split())
+
+
+class OverlapDetector:
+    """Filters one output stream against the context around the cursor"""
+
+    def __init__(self, prefix: str, suffix: str, max_tokens: int = 1000):
+        before = prefix.split("\n")
+        # The last element is the partial cursor line the output continues
+        self.prefix_tail = [_key(line) for line in before[:-1] if line.strip()][-PREFIX_TAIL_LINES:]
+        suffix_lines = [_key(line) for line in suffix.split("\n") if line.strip()]
+        self.suffix_head = suffix_lines[:SUFFIX_HEAD_LINES]
+        self._lookahead_chars = sum(len(line) for line in suffix_lines[:SUFFIX_LOOKAHEAD_LINES])
+        self.max_tokens = max_tokens
+        self.stopped = False
+        self.emitted_chars = 0
+        self._partial = ""
+        self._started = False
+        # Output lines held back while they might be a repeat
+        self._prefix_held: List[str] = []
+        self._suffix_held: List[str] = []
+
+    @staticmethod
+    def _keys(lines: List[str]) -> List[str]:
+        return [_key(line) for line in lines if line.strip()]
+
+    def _prefix_state(self, keys: List[str]) -> str:
+        """'repeat' if keys end the prefix, 'maybe' if they could still become a repeat, else ''"""
+        tail = self.prefix_tail
+        count = len(keys)
+        if not count or count > len(tail):
+            return ""
+        if tail[len(tail) - count:] == keys:
+            return "repeat"
+        for start in range(len(tail) - count):
+            if tail[start:start + count] == keys:
+                return "maybe"
+        return ""
+
+    def _suffix_state(self, keys: List[str]) -> str:
+        """'repeat' if keys reproduce enough of the suffix head, 'maybe' while they still might"""
+        head = self.suffix_head
+        count = len(keys)
+        if not count or head[:count] != keys[:len(head)]:
+            return ""
+        if count >= len(head) and sum(len(key) for key in keys) >= MIN_MATCH_CHARS:
+            return "repeat"
+        if count >= len(head):
+            # The whole head matched but is too short to be sure
+            return ""
+        return "maybe"
+
+    def _is_prefix_repeat(self, lines: List[str]) -> bool:
+        keys = self._keys(lines)
+        return self._prefix_state(keys) == "repeat" and sum(map(len, keys)) >= MIN_MATCH_CHARS
+
+    def _suffix_line(self, line: str) -> str:
+        """Run one line through the suffix check; returns the text to emit"""
+        if not self.suffix_head:
+            return line + "\n"
+        held = self._suffix_held + [line]
+        if not line.strip() and self._suffix_held:
+            # Blank lines don't break a run
+            self._suffix_held = held
+            return ""
+        state = self._suffix_state(self._keys(held))
+        if state == "repeat":
+            self._stop()
+            return ""
+        if state == "maybe":
+            self._suffix_held = held
+            return ""
+        self._suffix_held = []
+        if len(held) == 1:
+            return line + "\n"
+        # The run broke; this line may still start a new one
+        return "".join(text + "\n" for text in held[:-1]) + self._suffix_line(line)
+
+    def _stop(self):
+        self.stopped = True
+        self._suffix_held = []
+        self._partial = ""
+        stats.increment("overlap.suffix_stops")
+        # The rest of the suffix is what the model was about to copy, within its token budget
+        remaining = max(0, self.max_tokens - self.emitted_chars // 4)
+        stats.increment("overlap.tokens_saved", min(remaining, self._lookahead_chars // 4))
+
+    def _drop_prefix_repeat(self, lines: List[str]):
+        stats.increment("overlap.prefix_trimmed_lines", len(self._keys(lines)))
+        stats.increment("overlap.tokens_saved", sum(len(line) + 1 for line in lines) // 4)
+
+    def _line(self, line: str) -> str:
+        """Handle one completed output line"""
+        if self._started:
+            return self._suffix_line(line)
+        held = self._prefix_held + [line]
+        keys = self._keys(held)
+        if not keys or self._prefix_state(keys):
+            # Leading blank lines and a possible repeat of the prefix wait
+            self._prefix_held = held
+            return ""
+        self._started = True
+        self._prefix_held = []
+        if self._is_prefix_repeat(held[:-1]):
+            # The output repeated the end of the prefix before going on
+            self._drop_prefix_repeat(held[:-1])
+            held = held[-1:]
+        return "".join(self._suffix_line(text) for text in held)
+
+    def feed(self, chunk: str) -> str:
+        """Add streamed output; returns the text that is safe to pass on"""
+        if self.stopped or not chunk:
+            return ""
+        self._partial += chunk
+        out = []
+        while "\n" in self._partial and not self.stopped:
+            line, self._partial = self._partial.split("\n", 1)
+            out.append(self._line(line))
+        text = "".join(out)
+        self.emitted_chars += len(text)
+        return text
+
+    def flush(self) -> str:
+        """End of the stream: release whatever is still held back"""
+        if self.stopped:
+            return ""
+        prefix_held, self._prefix_held = self._prefix_held, []
+        partial, self._partial = self._partial, ""
+        if prefix_held and self._is_prefix_repeat(prefix_held + [partial]):
+            # Nothing but a copy of the lines before the cursor
+            self._drop_prefix_repeat(prefix_held + [partial])
+            return ""
+        if prefix_held and self._is_prefix_repeat(prefix_held):
+            # The repeat was followed by a last line without a line break
+            self._drop_prefix_repeat(prefix_held)
+            prefix_held = []
+        out = "".join(self._suffix_line(line) for line in prefix_held)
+        held = self._suffix_held + [partial]
+        keys = self._keys(held)
+        if not self.stopped and keys and self._suffix_state(keys) and sum(map(len, keys)) >= MIN_MATCH_CHARS:
+            # The stream ended while copying the start of the suffix
+            self._stop()
+        elif not self.stopped:
+            out += "".join(line + "\n" for line in self._suffix_held) + partial
+        self._suffix_held = []
+        self.emitted_chars += len(out)
+        return out
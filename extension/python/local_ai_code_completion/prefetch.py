@@ -0,0 +1,189 @@
+"""
+Prefetch module for Local AI Code Completion
+
+Cursor and idle notifications at likely trigger points (right after a
+comment line, on the first line of a METHOD, while typing LOOP AT) start
+a background-priority generation. The result is kept by its exact context
+so the explicit request that usually follows is answered without an API
+call. Prefetch only spends a share of the per-minute request budget and is
+cancelled by further edits.
+"""
+import asyncio
+import itertools
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from .logger import logger
+from .memory import BoundedCache
+from .scheduler import BACKGROUND, CancellationToken, RequestCancelled, scheduler
+from .stats import stats
+
+# Statements whose body is usually written right after them
+BLOCK_KEYWORDS = {"METHOD", "FORM", "FUNCTION", "LOOP", "IF", "DO", "WHILE", "CASE", "TRY", "SELECT"}
+
+
+def trigger_point(before_cursor: str, previous_line: str) -> str:
+    """Kind of trigger point for the text before the cursor and the line above, or "" """
+    current = before_cursor.strip()
+    if current:
+        # Typing LOOP AT: the table and the loop body are predictable
+        if current.upper().startswith("LOOP AT") and not current.endswith("."):
+            return "loop"
+        return ""
+    previous = previous_line.strip()
+    if previous_line.startswith("*") or previous.startswith('"'):
+        return "comment"
+    words = previous.upper().split()
+    if words and words[0] in BLOCK_KEYWORDS and previous.endswith("."):
+        return "block"
+    return ""
+
+
+class RateBudget:
+    """Upstream requests of the last minute, against the provider's per-minute limit"""
+
+    def __init__(self):
+        self.limit = max(1, int(os.getenv("LACC_RATE_LIMIT_RPM", "30")))
+        # Share of the limit prefetch may use; explicit requests keep the rest
+        self.share = float(os.getenv("LACC_PREFETCH_SHARE", "0.25"))
+        self._requests: Deque[float] = deque()
+        self._prefetches: Deque[float] = deque()
+
+    def _trim(self, now: float):
+        for times in (self._requests, self._prefetches):
+            while times and now - times[0] > 60:
+                times.popleft()
+
+    def record(self):
+        """Count one upstream request"""
+        now = time.monotonic()
+        self._trim(now)
+        self._requests.append(now)
+
+    def allow_prefetch(self) -> bool:
+        """Take a prefetch slot if the budget has room for it"""
+        now = time.monotonic()
+        self._trim(now)
+        prefetch_limit = self.limit * self.share
+        if len(self._prefetches) >= prefetch_limit or len(self._requests) >= self.limit - prefetch_limit:
+            return False
+        self._prefetches.append(now)
+        return True
+
+    def describe(self) -> Dict[str, Any]:
+        self._trim(time.monotonic())
+        return {
+            "limit_per_minute": self.limit,
+            "requests_last_minute": len(self._requests),
+            "prefetches_last_minute": len(self._prefetches),
+        }
+
+
+class Prefetcher:
+    """Starts background generations at trigger points and serves their results"""
+
+    def __init__(self):
+        self.enabled = os.getenv("LACC_PREFETCH", "1") != "0"
+        # Seconds a prefetched completion stays usable
+        self.ttl = float(os.getenv("LACC_PREFETCH_TTL", "120"))
+        # (document, request key) -> (time, completion)
+        self._results = BoundedCache("prefetch", max_bytes=1024 * 1024)
+        # document -> (request key, task, scheduler request ID)
+        self._inflight: Dict[str, Tuple[str, asyncio.Task, str]] = {}
+        self._ids = itertools.count(1)
+
+    def start(self, document: str, line: int, key: str,
+              job: Callable[[CancellationToken], Awaitable[str]], debounce: Optional[float] = None) -> bool:
+        """Prefetch the completion for a context; False if skipped"""
+        if not self.enabled:
+            return False
+        inflight = self._inflight.get(document)
+        if inflight and inflight[0] == key and not inflight[1].done():
+            return False
+        if self._results.get((document, key)) is not None:
+            return False
+        if not rate_budget.allow_prefetch():
+            stats.increment("prefetch.throttled")
+            return False
+        # Only the newest trigger point of a document is prefetched
+        self.cancel_document(document, "superseded")
+        request_id = f"prefetch-{next(self._ids)}"
+        task = asyncio.ensure_future(self._run(document, line, key, job, debounce, request_id))
+        self._inflight[document] = (key, task, request_id)
+        stats.increment("prefetch.started")
+        return True
+
+    async def _run(self, document: str, line: int, key: str,
+                   job: Callable[[CancellationToken], Awaitable[str]], debounce: Optional[float],
+                   request_id: str) -> Optional[str]:
+        try:
+            completion = await scheduler.submit(
+                job, document=document, line=line, priority=BACKGROUND,
+                request_id=request_id, debounce=debounce
+            )
+        except (RequestCancelled, asyncio.CancelledError):
+            stats.increment("prefetch.cancelled")
+            return None
+        except Exception as e:
+            logger.debug(f"Prefetch for {document} failed: {e}")
+            return None
+        finally:
+            inflight = self._inflight.get(document)
+            if inflight and inflight[2] == request_id:
+                del self._inflight[document]
+        if completion:
+            self._results.put((document, key), (time.time(), completion))
+            stats.increment("prefetch.completed")
+        return completion
+
+    async def take(self, document: str, key: str) -> Optional[str]:
+        """A prefetched completion for exactly this context, waiting for one in flight"""
+        entry = self._results.pop((document, key))
+        if entry is None:
+            inflight = self._inflight.get(document)
+            if not inflight or inflight[0] != key:
+                return None
+            # The explicit request joins the prefetch instead of starting over
+            stats.increment("prefetch.joined")
+            try:
+                await asyncio.shield(inflight[1])
+            except asyncio.CancelledError:
+                if not inflight[1].cancelled():
+                    # This request itself was cancelled
+                    raise
+                # The prefetch was dropped before it ran; the caller generates normally
+                return None
+            entry = self._results.pop((document, key))
+            if entry is None:
+                return None
+        if time.time() - entry[0] > self.ttl:
+            return None
+        stats.increment("prefetch.hits")
+        return entry[1]
+
+    def cancel_document(self, document: str, reason: str = "edited"):
+        """Cancel the prefetch of a document and drop its results"""
+        inflight = self._inflight.pop(document, None)
+        if inflight and not scheduler.cancel(inflight[2], reason):
+            # Not submitted to the scheduler yet
+            inflight[1].cancel()
+        for key in self._results.keys():
+            if key[0] == document:
+                self._results.pop(key)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._inflight),
+            "cached": len(self._results),
+            "budget": rate_budget.describe(),
+        }
+
+
+# Global rate budget instance
+rate_budget = RateBudget()
+
+# Global prefetcher instance
+prefetcher = Prefetcher()
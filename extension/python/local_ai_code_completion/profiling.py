@@ -0,0 +1,181 @@
+"""
+Profiling module for Local AI Code Completion
+
+`python main.py <command> --profile` (or LACC_PROFILE=1) runs a command
+under cProfile and a stack sampler and writes <command>-<time>-<pid>.prof
+(pstats) and .collapsed (one "frame;frame;frame count" line per stack, for
+flamegraph.pl or speedscope) to LACC_PROFILE_DIR. cProfile only sees the
+main thread; the sampler also covers the threads that stream API calls.
+
+Hot paths run inside frames named "section:<name>" (prompt_build,
+client_init, api_call, clean_output, ...), so a sampling profiler attached
+to a long-running backend (e.g. `py-spy dump --pid`) shows meaningful
+frames. Section call counts and times also go to the stats counters.
+"""
+import asyncio
+import atexit
+import cProfile
+import functools
+import os
+import sys
+import threading
+import time
+import types
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from .stats import stats
+from .storage import get_cache_dir
+
+SECTION_PREFIX = "section:"
+
+
+def _rename(func: Callable, name: str) -> Callable:
+    """Copy of func whose frames carry the given name"""
+    code = func.__code__.replace(co_name=name)
+    if hasattr(code, "co_qualname"):
+        code = code.replace(co_qualname=name)
+    return types.FunctionType(code, func.__globals__, name, func.__defaults__, func.__closure__)
+
+
+def _call(func, args, kwargs):
+    return func(*args, **kwargs)
+
+
+async def _call_async(func, args, kwargs):
+    return await func(*args, **kwargs)
+
+
+_runners: Dict[str, Callable] = {}
+
+
+def _runner(name: str, is_async: bool) -> Callable:
+    key = f"{name}:{is_async}"
+    runner = _runners.get(key)
+    if runner is None:
+        runner = _rename(_call_async if is_async else _call, SECTION_PREFIX + name)
+        _runners[key] = runner
+    return runner
+
+
+def _record(name: str, started: float):
+    stats.increment(f"sections.{name}.calls")
+    stats.increment(f"sections.{name}.ms", (time.perf_counter() - started) * 1000)
+
+
+def run_section(name: str, func: Callable, *args, **kwargs) -> Any:
+    """Call func inside a section frame"""
+    started = time.perf_counter()
+    try:
+        return _runner(name, False)(func, args, kwargs)
+    finally:
+        _record(name, started)
+
+
+def section(name: str) -> Callable[[Callable], Callable]:
+    """Decorator running a function (sync or async) inside a section frame"""
+    def decorate(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            runner = _runner(name, True)
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await runner(func, args, kwargs)
+                finally:
+                    _record(name, started)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return run_section(name, func, *args, **kwargs)
+        return wrapper
+    return decorate
+
+
+class StackSampler:
+    """Samples the stacks of all threads at a fixed interval"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _frame_name(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_name(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="lacc-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    def write_collapsed(self, path: Path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfileSession:
+    """cProfile plus stack sampling for one backend invocation"""
+
+    def __init__(self, command: str, profiler: Optional[cProfile.Profile] = None):
+        self.command = command
+        # main.py enables its profiler before its imports and passes it in
+        self._enable = profiler is None
+        self.profiler = profiler or cProfile.Profile()
+        self.sampler = StackSampler(float(os.getenv("LACC_PROFILE_INTERVAL_MS", "5")) / 1000)
+        directory = os.getenv("LACC_PROFILE_DIR", "")
+        self.directory = Path(directory).expanduser() if directory else get_cache_dir() / "profiles"
+        self._stopped = False
+
+    def start(self):
+        if self._enable:
+            self.profiler.enable()
+        self.sampler.start()
+        atexit.register(self.stop)
+
+    def stop(self) -> Optional[Path]:
+        """Stop profiling and write the outputs; returns the pstats path"""
+        if self._stopped:
+            return None
+        self._stopped = True
+        self.profiler.disable()
+        self.sampler.stop()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        base = self.directory / f"{self.command}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        stats_path = base.with_suffix(".prof")
+        self.profiler.dump_stats(str(stats_path))
+        self.sampler.write_collapsed(base.with_suffix(".collapsed"))
+        # stdout carries command output, so the location goes to stderr
+        print(f"Profile written to {stats_path} and {base.with_suffix('.collapsed')}", file=sys.stderr)
+        return stats_path
+
+
+def start_profiling(command: str, profiler: Optional[cProfile.Profile] = None) -> ProfileSession:
+    """Profile the rest of this invocation"""
+    session = ProfileSession(command, profiler)
+    session.start()
+    return session
@@ -0,0 +1,314 @@
+"""
+Providers module for Local AI Code Completion
+
+A provider covers chat, streaming, model listing and usage for one kind of
+backend. GroqProvider wraps the Groq SDK; LocalProvider talks to any local
+OpenAI-compatible server (e.g. a CPU llama.cpp server on localhost) with
+the standard library only, for low-latency and offline completions.
+"""
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterator, List, Optional
+
+from .logger import logger
+from .profiling import section
+
+try:
+    import groq
+    GROQ_AVAILABLE = True
+except ImportError:
+    GROQ_AVAILABLE = False
+
+PROVIDER_NAMES = ("groq", "local")
+MODES = ("code", "comment", "debug")
+
+Messages = List[Dict[str, str]]
+
+# Groq request fields that turn off or hide reasoning, by model name fragment
+GROQ_REASONING_PARAMS = (
+    ("qwen3", {"reasoning_effort": "none", "reasoning_format": "hidden"}),
+    ("deepseek-r1", {"reasoning_format": "hidden"}),
+    ("gpt-oss", {"reasoning_effort": "low", "include_reasoning": False}),
+)
+
+
+class Usage:
+    """Token usage of one call, filled in when the server reports it"""
+    __slots__ = ("prompt_tokens", "completion_tokens", "reasoning_tokens")
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.reasoning_tokens = 0
+
+    def update(self, data: Any):
+        """Take counts from an SDK usage object or a JSON dict"""
+        if data is None:
+            return
+        get = data.get if isinstance(data, dict) else lambda key, default=None: getattr(data, key, default)
+        self.prompt_tokens = get("prompt_tokens", 0) or self.prompt_tokens
+        self.completion_tokens = get("completion_tokens", 0) or self.completion_tokens
+        details = get("completion_tokens_details", None)
+        if details is not None:
+            reasoning = details.get("reasoning_tokens") if isinstance(details, dict) else getattr(details, "reasoning_tokens", None)
+            self.reasoning_tokens = reasoning or self.reasoning_tokens
+
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "reasoning_tokens": self.reasoning_tokens,
+        }
+
+
+class ProviderError(Exception):
+    """A provider could not be used or a call failed"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+def is_rejected_request(error: Exception) -> bool:
+    """Whether the server (or SDK) refused the request fields rather than failing"""
+    if isinstance(error, TypeError):
+        return True
+    status = getattr(error, "status", None) or getattr(error, "status_code", None)
+    return status in (400, 422)
+
+
+class Provider(ABC):
+    """Interface every model backend implements; calls block and run in threads"""
+
+    name = ""
+
+    def __init__(self):
+        # Models that rejected the reasoning fields
+        self._reasoning_rejected = set()
+
+    def available(self) -> bool:
+        return True
+
+    def reasoning_params(self, model: str) -> Dict[str, Any]:
+        """Extra request fields asking the model to skip or hide its reasoning"""
+        return {}
+
+    def reject_reasoning(self, model: str):
+        """Stop sending reasoning fields for a model that refused them"""
+        if model not in self._reasoning_rejected:
+            logger.info(f"{self.name} model {model} does not accept reasoning options")
+            self._reasoning_rejected.add(model)
+
+    @abstractmethod
+    def chat(self, model: str, messages: Messages, usage: Optional[Usage] = None, **params) -> str:
+        """Complete a chat and return the message content"""
+
+    @abstractmethod
+    def stream(self, model: str, messages: Messages, usage: Optional[Usage] = None, **params) -> Iterator[str]:
+        """Yield content chunks; closing the iterator drops the connection"""
+
+    @abstractmethod
+    def list_models(self) -> List[str]:
+        """Names of the models the backend serves"""
+
+
+class GroqProvider(Provider):
+    """Groq cloud API through the groq SDK"""
+
+    name = "groq"
+
+    def __init__(self, api_key: str, base_url: Optional[str] = None):
+        super().__init__()
+        if not GROQ_AVAILABLE:
+            raise ProviderError("groq package not available. Please install dependencies.")
+        if not api_key:
+            raise ProviderError("No Groq API key provided. Set GROQ_API_KEY environment variable or update config.")
+        try:
+            # Initialize with minimal parameters to avoid compatibility issues;
+            # without a base URL the SDK uses its default endpoint
+            self.client = groq.Groq(api_key=api_key, base_url=base_url or None)
+        except Exception as e:
+            raise ProviderError(f"Failed to initialize Groq client: {e}")
+
+    def available(self) -> bool:
+        return GROQ_AVAILABLE
+
+    def reasoning_params(self, model: str) -> Dict[str, Any]:
+        if model in self._reasoning_rejected:
+            return {}
+        for fragment, fields in GROQ_REASONING_PARAMS:
+            if fragment in model.lower():
+                # Sent as extra body fields so older SDK versions pass them through
+                return {"extra_body": dict(fields)}
+        return {}
+
+    def chat(self, model: str, messages: Messages, usage: Optional[Usage] = None, **params) -> str:
+        response = self.client.chat.completions.create(model=model, messages=messages, **params)
+        if usage is not None:
+            usage.update(getattr(response, "usage", None))
+        content = response.choices[0].message.content
+        return content or ""
+
+    def stream(self, model: str, messages: Messages, usage: Optional[Usage] = None, **params) -> Iterator[str]:
+        stream = self.client.chat.completions.create(model=model, messages=messages, stream=True, **params)
+        try:
+            for chunk in stream:
+                if usage is not None:
+                    # Groq reports usage on the last chunk under x_groq
+                    x_groq = getattr(chunk, "x_groq", None)
+                    usage.update(getattr(x_groq, "usage", None) or getattr(chunk, "usage", None))
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            close = getattr(stream, "close", None)
+            if close:
+                close()
+
+    def list_models(self) -> List[str]:
+        return [model.id for model in self.client.models.list().data]
+
+
+class LocalProvider(Provider):
+    """Any OpenAI-compatible server, e.g. `llama-server --port 8080` on CPU"""
+
+    name = "local"
+
+    def __init__(self, base_url: str, api_key: str = "", timeout: Optional[float] = 60.0):
+        super().__init__()
+        self.base_url = base_url.rstrip("/")
+        if not self.base_url.endswith("/v1"):
+            self.base_url += "/v1"
+        self.api_key = api_key
+        # Seconds per call; None blocks without a limit
+        self.timeout = timeout
+
+    def _request(self, path: str, payload: Optional[Dict[str, Any]] = None):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(f"{self.base_url}{path}", data=data, headers=headers)
+        try:
+            return urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            detail = e.read().decode("utf-8", errors="replace")[:500]
+            raise ProviderError(f"Local model server returned {e.code}: {detail}", status=e.code)
+        except (urllib.error.URLError, OSError) as e:
+            raise ProviderError(f"Local model server not reachable at {self.base_url}: {e}")
+
+    def available(self) -> bool:
+        try:
+            self._request("/models").close()
+            return True
+        except ProviderError:
+            return False
+
+    def reasoning_params(self, model: str) -> Dict[str, Any]:
+        if model in self._reasoning_rejected:
+            return {}
+        # Understood by llama.cpp and vLLM chat templates of hybrid thinking models
+        return {"chat_template_kwargs": {"enable_thinking": False}}
+
+    def chat(self, model: str, messages: Messages, usage: Optional[Usage] = None, **params) -> str:
+        with self._request("/chat/completions", {"model": model, "messages": messages, **params}) as response:
+            data = json.load(response)
+        if usage is not None:
+            usage.update(data.get("usage"))
+        return data["choices"][0]["message"].get("content") or ""
+
+    def stream(self, model: str, messages: Messages, usage: Optional[Usage] = None, **params) -> Iterator[str]:
+        payload = {"model": model, "messages": messages, "stream": True,
+                   "stream_options": {"include_usage": True}, **params}
+        response = self._request("/chat/completions", payload)
+        try:
+            # Server-sent events: one "data: {...}" line per chunk
+            for raw in response:
+                line = raw.decode("utf-8", errors="replace").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                event = json.loads(data)
+                if usage is not None and event.get("usage"):
+                    usage.update(event["usage"])
+                choices = event.get("choices") or []
+                content = choices[0].get("delta", {}).get("content") if choices else None
+                if content:
+                    yield content
+        finally:
+            response.close()
+
+    def list_models(self) -> List[str]:
+        with self._request("/models") as response:
+            data = json.load(response)
+        return [model["id"] for model in data.get("data", [])]
+
+
+def provider_name(model_config, mode: str = "code") -> str:
+    """Provider configured for a mode (LACC_PROVIDER_<MODE>, else LACC_PROVIDER)"""
+    name = getattr(model_config, f"provider_{mode}", "") or getattr(model_config, "provider", "") or "groq"
+    if name not in PROVIDER_NAMES:
+        logger.warning(f"Unknown provider '{name}', using groq")
+        return "groq"
+    return name
+
+
+def model_name(model_config, provider: str) -> str:
+    """Model to request from a provider"""
+    if provider == "local":
+        return getattr(model_config, "local_model", "") or "local"
+    return model_config.name
+
+
+def _provider_inputs(model_config, provider: str) -> tuple:
+    """Settings a provider instance is built from"""
+    if provider == "local":
+        return (provider, getattr(model_config, "local_base_url", ""), getattr(model_config, "local_api_key", ""),
+                getattr(model_config, "timeout", 15000))
+    # Allow fallback to environment variable if config doesn't provide api_key
+    api_key = getattr(model_config, "api_key", "") or os.getenv("GROQ_API_KEY", "")
+    return (provider, api_key, getattr(model_config, "base_url", ""))
+
+
+@section("client_init")
+def create_provider(model_config, provider: str) -> Provider:
+    """Build a provider from the model configuration"""
+    inputs = _provider_inputs(model_config, provider)
+    if provider == "local":
+        _, base_url, api_key, timeout = inputs
+        # LACC_TIMEOUT=0 means no limit; urlopen(timeout=0) would make the socket non-blocking
+        return LocalProvider(base_url or "http://127.0.0.1:8080", api_key, timeout / 1000 if timeout else None)
+    _, api_key, base_url = inputs
+    return GroqProvider(api_key, base_url)
+
+
+class ProviderRegistry:
+    """Caches provider instances by the settings they were built from"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._providers: Dict[tuple, Provider] = {}
+
+    def get(self, model_config, provider: str) -> Provider:
+        key = _provider_inputs(model_config, provider)
+        with self._lock:
+            instance = self._providers.get(key)
+            if instance is None:
+                instance = create_provider(model_config, provider)
+                # Providers built from outdated settings are dropped
+                self._providers = {k: v for k, v in self._providers.items() if k[0] != provider}
+                self._providers[key] = instance
+            return instance
+
+    def clear(self):
+        with self._lock:
+            self._providers.clear()
+
+
+# Global provider registry instance
+providers = ProviderRegistry()
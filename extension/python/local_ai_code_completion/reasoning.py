@@ -0,0 +1,83 @@
+"""
+Reasoning module for Local AI Code Completion
+Drops <think>...</think> blocks of thinking models from streamed output
+"""
+from typing import Tuple
+
+OPEN_TAG = "<think>"
+CLOSE_TAG = "</think>"
+
+
+def _partial_tag(text: str, tag: str) -> int:
+    """Length of the longest suffix of text that is a proper prefix of tag"""
+    for size in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:size]):
+            return size
+    return 0
+
+
+class ThinkFilter:
+    """Streaming filter that discards whole think blocks across chunk boundaries
+
+    Text that could be the start of a tag is held back until the next chunk
+    decides it. An unterminated block at the end of the stream is reasoning
+    that ran out of tokens and is dropped as well.
+    """
+
+    def __init__(self):
+        self.inside = False
+        self.reasoning_chars = 0
+        self.blocks = 0
+        self._pending = ""
+        # Whitespace after a closing tag is dropped until real output starts
+        self._after_close = False
+
+    def feed(self, chunk: str) -> str:
+        """Return the visible part of a chunk"""
+        text = self._pending + chunk
+        self._pending = ""
+        visible = []
+        while text:
+            if self.inside:
+                end = text.find(CLOSE_TAG)
+                if end == -1:
+                    keep = _partial_tag(text, CLOSE_TAG)
+                    self.reasoning_chars += len(text) - keep
+                    self._pending = text[len(text) - keep:]
+                    return "".join(visible)
+                self.reasoning_chars += end
+                text = text[end + len(CLOSE_TAG):]
+                self.inside = False
+                self._after_close = True
+                continue
+            if self._after_close:
+                text = text.lstrip()
+                if not text:
+                    break
+                self._after_close = False
+            start = text.find(OPEN_TAG)
+            if start == -1:
+                keep = _partial_tag(text, OPEN_TAG)
+                visible.append(text[:len(text) - keep])
+                self._pending = text[len(text) - keep:]
+                break
+            visible.append(text[:start])
+            text = text[start + len(OPEN_TAG):]
+            self.inside = True
+            self.blocks += 1
+        return "".join(visible)
+
+    def flush(self) -> str:
+        """Return held-back text at the end of the stream"""
+        pending, self._pending = self._pending, ""
+        if self.inside:
+            self.reasoning_chars += len(pending)
+            return ""
+        return pending
+
+
+def strip_think(text: str) -> Tuple[str, int]:
+    """Remove think blocks from a complete text; returns (text, reasoning_chars)"""
+    think = ThinkFilter()
+    visible = think.feed(text) + think.flush()
+    return visible, think.reasoning_chars
@@ -0,0 +1,291 @@
+"""
+Replay module for Local AI Code Completion
+
+Plays a trace recorded with LACC_TRACE=1 against the backend, offline:
+
+- a stand-in OpenAI-compatible server answers every model call with
+  chunks of the recorded sizes at the recorded offsets
+- the requests go to the backend server at their recorded arrival
+  offsets, divided by the speed factor, with their recorded mode,
+  priority, debounce, deadline, document and line
+
+Hashed traces are replayed with filler code of the recorded sizes; traces
+written with LACC_TRACE_CODE=text send the recorded code. A marker line
+before the cursor tells the stand-in which request a prompt belongs to.
+
+The report holds latency percentiles overall and per mode next to the
+recorded ones, outcomes and upstream call counts. Saved reports of two
+versions of the backend can be compared with compare_reports.
+"""
+import asyncio
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .bench import _percentile
+from .logger import logger
+from .scheduler import DeadlineExceeded, RequestCancelled
+
+MARKER = "* lacc-replay {}"
+_MARKER_RE = re.compile(r"lacc-replay (\d+)")
+
+# Filler for hashed traces; prefix, suffix and output differ so overlap detection doesn't fire
+PREFIX_FILLER = (
+    "DATA lv_total TYPE i.\n"
+    "SELECT * FROM mara INTO TABLE @DATA(lt_mara) UP TO 10 ROWS.\n"
+    "LOOP AT lt_mara INTO DATA(ls_mara).\n"
+    "  lv_total = lv_total + 1.\n"
+    "ENDLOOP.\n"
+)
+SUFFIX_FILLER = (
+    "WRITE: / 'Total:', lv_total.\n"
+    "CLEAR lt_mara.\n"
+)
+COMMENT_FILLER = "\" Read the open items of the customer and sum their amounts\n"
+OUTPUT_FILLER = (
+    "  IF lv_count > 0.\n"
+    "    lv_count = lv_count - 1.\n"
+    "  ENDIF.\n"
+)
+# Answer to a call no recorded call matches, e.g. a repair prompt
+UNMATCHED_CALL = {"chunks": [[50.0, 24]], "prompt_tokens": 0, "completion_tokens": 6}
+
+
+def filler(pattern: str, chars: int) -> str:
+    """chars characters of a repeated pattern"""
+    if chars <= 0:
+        return ""
+    return (pattern * (chars // len(pattern) + 1))[:chars]
+
+
+def play_chunks(call: Dict[str, Any]) -> List[List[float]]:
+    """Chunks to stream for a recorded call"""
+    chunks = [list(chunk) for chunk in call.get("chunks") or []]
+    if call.get("outcome") not in ("truncated", "cancelled") or len(chunks) < 2:
+        return chunks
+    # The recorded stream was cut off; go on at its pace until max_tokens or until the backend hangs up
+    gap = (chunks[-1][0] - chunks[0][0]) / (len(chunks) - 1)
+    size = max(1, round(sum(chars for _, chars in chunks) / len(chunks)))
+    total = sum(chars for _, chars in chunks)
+    while total + size <= call.get("max_tokens", 1000) * 4:
+        chunks.append([chunks[-1][0] + gap, size])
+        total += size
+    return chunks
+
+
+def replay_context(record: Dict[str, Any], index: int):
+    """Prefix, suffix and comment to send for a recorded request, with the marker of its index"""
+    if "prefix" in record:
+        prefix, suffix, comment = record["prefix"], record.get("suffix", ""), record.get("comment", "")
+    else:
+        prefix = filler(PREFIX_FILLER, record.get("prefix_chars", 0))
+        suffix = filler(SUFFIX_FILLER, record.get("suffix_chars", 0))
+        comment = filler(COMMENT_FILLER, record.get("comment_chars", 0)).rstrip("\n")
+    # On its own line right before the cursor line, which is never trimmed or minified
+    before, _, cursor_line = prefix.rpartition("\n")
+    marker = MARKER.format(index)
+    prefix = f"{before}\n{marker}\n{cursor_line}" if before else f"{marker}\n{cursor_line}"
+    return prefix, suffix, comment
+
+
+class StandInServer:
+    """OpenAI-compatible server that streams the recorded calls of a trace"""
+
+    def __init__(self, records: List[Dict[str, Any]]):
+        self.calls = {index: record.get("calls") or [] for index, record in enumerate(records)}
+        self._served: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "unmatched": 0, "aborted": 0}
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="lacc-replay", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def script(self, prompt: str) -> Dict[str, Any]:
+        """Recorded call to play for a prompt: the next unplayed call of its request"""
+        match = _MARKER_RE.search(prompt)
+        calls = self.calls.get(int(match.group(1))) if match else None
+        if not calls:
+            self._count("unmatched")
+            return UNMATCHED_CALL
+        with self._lock:
+            index = int(match.group(1))
+            served = self._served.get(index, 0)
+            self._served[index] = served + 1
+            self.counters["calls"] += 1
+        # Later calls than recorded (another candidate count, a new repair) repeat the last one
+        return calls[min(served, len(calls) - 1)]
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _json(self, data: Dict[str, Any]):
+                body = json.dumps(data).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._json({"data": [{"id": "replay"}]})
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                prompt = "".join(str(message.get("content", "")) for message in payload.get("messages", []))
+                call = stand_in.script(prompt)
+                chunks = play_chunks(call)
+                text = filler(OUTPUT_FILLER, sum(chars for _, chars in chunks))
+                usage = {"prompt_tokens": call.get("prompt_tokens", 0),
+                         "completion_tokens": call.get("completion_tokens", 0)}
+                start = time.perf_counter()
+                if not payload.get("stream"):
+                    time.sleep((chunks[-1][0] if chunks else 0) / 1000)
+                    self._json({"choices": [{"message": {"content": text}}], "usage": usage})
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                position = 0
+                try:
+                    for offset, chars in chunks:
+                        delay = offset / 1000 - (time.perf_counter() - start)
+                        if delay > 0:
+                            time.sleep(delay)
+                        content = text[position:position + chars]
+                        position += chars
+                        self._event({"choices": [{"delta": {"content": content}}]})
+                    self._event({"choices": [], "usage": usage})
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    # The backend stopped the stream (cancelled, deadline, overlap)
+                    stand_in._count("aborted")
+
+            def _event(self, data: Dict[str, Any]):
+                self.wfile.write(f"data: {json.dumps(data)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+        return Handler
+
+
+def _latency(values: List[float]) -> Dict[str, float]:
+    return {
+        "p50": _percentile(values, 0.5),
+        "p90": _percentile(values, 0.9),
+        "p99": _percentile(values, 0.99),
+        "max": max(values) if values else 0.0,
+    }
+
+
+async def replay(records: List[Dict[str, Any]], send: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+                 speed: float = 1.0) -> Dict[str, Any]:
+    """Send the recorded requests at their arrival offsets; send(request) answers one like the server"""
+    if speed <= 0:
+        raise ValueError(f"Replay speed must be above 0, got {speed}")
+    if not records:
+        return {"requests": 0}
+    first = records[0].get("time", 0)
+    results: List[Optional[Dict[str, Any]]] = [None] * len(records)
+
+    async def one(index: int, record: Dict[str, Any]):
+        await asyncio.sleep(max(0.0, (record.get("time", first) - first) / speed - (time.monotonic() - started)))
+        prefix, suffix, comment = replay_context(record, index)
+        args: Dict[str, Any] = {
+            "prefix": prefix,
+            "suffix": suffix,
+            "comment": comment,
+            "mode": record.get("mode", "code"),
+            "priority": record.get("priority", "explicit"),
+            "file": f"replay-{record.get('document') or index}.abap",
+            "line": record.get("line", prefix.count("\n")),
+            "candidates": record.get("candidates", 0),
+        }
+        if record.get("debounce_ms") is not None:
+            args["debounceMs"] = record["debounce_ms"]
+        if record.get("timeout_ms") is not None:
+            args["timeoutMs"] = record["timeout_ms"]
+        begin = time.perf_counter()
+        try:
+            result = await send({"id": f"replay-{index}", "command": "generate", "args": args})
+            outcome = "truncated" if result.get("truncated") else "ok"
+        except DeadlineExceeded:
+            outcome = "deadline"
+        except RequestCancelled:
+            outcome = "cancelled"
+        except Exception as e:
+            logger.debug(f"Replayed request {index} failed: {e}")
+            outcome = "error"
+        results[index] = {"mode": args["mode"], "outcome": outcome,
+                          "latency_ms": round((time.perf_counter() - begin) * 1000, 1)}
+
+    started = time.monotonic()
+    await asyncio.gather(*(one(index, record) for index, record in enumerate(records)))
+    wall = time.monotonic() - started
+
+    report: Dict[str, Any] = {
+        "requests": len(records),
+        "speed": speed,
+        "wall_s": round(wall, 2),
+        "outcomes": {},
+        "latency_ms": _latency([r["latency_ms"] for r in results if r["outcome"] != "cancelled"]),
+        "recorded_latency_ms": _latency([r.get("duration_ms", 0.0) for r in records
+                                         if r.get("outcome") != "cancelled"]),
+        "modes": {},
+    }
+    for result in results:
+        report["outcomes"][result["outcome"]] = report["outcomes"].get(result["outcome"], 0) + 1
+    for mode in sorted({result["mode"] for result in results}):
+        latencies = [r["latency_ms"] for r in results if r["mode"] == mode and r["outcome"] != "cancelled"]
+        recorded = [r.get("duration_ms", 0.0) for r in records
+                    if r.get("mode", "code") == mode and r.get("outcome") != "cancelled"]
+        report["modes"][mode] = {
+            "requests": sum(1 for r in results if r["mode"] == mode),
+            "latency_ms_p50": _percentile(latencies, 0.5),
+            "latency_ms_p90": _percentile(latencies, 0.9),
+            "recorded_ms_p50": _percentile(recorded, 0.5),
+        }
+    return report
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Latency change of a replay against the report of another version"""
+    changes: Dict[str, Any] = {}
+
+    def add(name: str, old: float, new: float):
+        changes[name] = {
+            "baseline": old,
+            "current": new,
+            "change_pct": round((new - old) / old * 100, 1) + 0.0 if old else None,
+        }
+
+    for key in ("p50", "p90", "p99"):
+        add(f"latency_ms_{key}", baseline.get("latency_ms", {}).get(key, 0.0), current["latency_ms"][key])
+    for mode, values in current.get("modes", {}).items():
+        old = baseline.get("modes", {}).get(mode)
+        if old:
+            add(f"{mode}_latency_ms_p50", old.get("latency_ms_p50", 0.0), values["latency_ms_p50"])
+    return changes
@@ -0,0 +1,250 @@
+"""
+Router module for Local AI Code Completion
+
+Keeps rolling time-to-first-token, tokens/sec and error statistics per
+model and picks the model for each request from its mode, prompt size and
+the latency target configured for that mode. Models are tried in quality
+order (LACC_MODEL_NAME first, then LACC_ROUTER_MODELS); the first one
+expected to meet the target wins.
+
+Samples expire after MAX_SAMPLE_AGE so a model that was slow or failing
+for a while gets a fresh start, and a better model that was passed over is
+tried again every PROBE_INTERVAL seconds so its statistics stay current.
+The statistics are shared by all backend processes through router.json;
+updates hold a lock file and merge with what the others recorded.
+"""
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from .storage import file_lock, load_json, save_json
+
+ROUTER_FILE = "router.json"
+
+# Rolling window per model
+WINDOW = 50
+# Samples needed before a model's estimate is trusted
+MIN_SAMPLES = 3
+# Seconds after which a sample no longer counts
+MAX_SAMPLE_AGE = 6 * 3600
+# Seconds before a model that was passed over is tried again
+PROBE_INTERVAL = 600
+# Expected output tokens per mode
+EXPECTED_TOKENS = {"code": 120, "comment": 400, "debug": 400}
+# Default latency targets per mode in milliseconds
+DEFAULT_TARGETS = {"code": 1500, "comment": 8000, "debug": 5000}
+
+
+class ModelStats:
+    """Rolling latency, throughput and error samples of one model"""
+
+    def __init__(self, samples: Optional[List[list]] = None):
+        # (time, prompt_chars, ttft_ms, tokens_per_sec, error)
+        self.samples: Deque[Tuple[float, int, float, float, bool]] = deque(
+            (tuple(s) for s in (samples or [])), maxlen=WINDOW
+        )
+
+    def record(self, prompt_chars: int, ttft_ms: float, tokens_per_sec: float, error: bool):
+        self.samples.append((time.time(), prompt_chars, ttft_ms, tokens_per_sec, error))
+
+    def expire(self, cutoff: float):
+        """Drop the samples taken before cutoff"""
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+
+    @property
+    def last_sample(self) -> float:
+        return self.samples[-1][0] if self.samples else 0.0
+
+    @property
+    def successes(self) -> List[Tuple[float, int, float, float, bool]]:
+        return [s for s in self.samples if not s[4]]
+
+    def error_rate(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(1 for s in self.samples if s[4]) / len(self.samples)
+
+    def ttft_ms(self, prompt_chars: int) -> Optional[float]:
+        """Estimated time to first token for a prompt size (linear in prompt size)"""
+        ok = self.successes
+        if len(ok) < MIN_SAMPLES:
+            return None
+        sizes = [s[1] for s in ok]
+        ttfts = [s[2] for s in ok]
+        mean_size = statistics.mean(sizes)
+        spread = sum((x - mean_size) ** 2 for x in sizes)
+        if spread < 1e6:
+            # Prompt sizes too similar to fit a slope
+            return statistics.median(ttfts)
+        mean_ttft = statistics.mean(ttfts)
+        slope = sum((x - mean_size) * (y - mean_ttft) for x, y in zip(sizes, ttfts)) / spread
+        slope = max(0.0, slope)
+        return max(0.0, mean_ttft + slope * (prompt_chars - mean_size))
+
+    def tokens_per_sec(self) -> Optional[float]:
+        rates = [s[3] for s in self.successes if s[3] > 0]
+        return statistics.median(rates) if len(rates) >= MIN_SAMPLES else None
+
+    def summary(self) -> Dict[str, Any]:
+        ok = self.successes
+        tps = self.tokens_per_sec()
+        return {
+            "samples": len(self.samples),
+            "ttft_ms_p50": round(statistics.median(s[2] for s in ok), 1) if ok else None,
+            "tokens_per_sec": round(tps, 1) if tps else None,
+            "error_rate": round(self.error_rate(), 3),
+        }
+
+
+class ModelRouter:
+    """Chooses a model per request from rolling per-model statistics"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Optional[Dict[str, ModelStats]] = None
+        self.last_decisions: Dict[str, Dict[str, Any]] = {}
+        # When this process last sent a probe request to a passed-over model
+        self._probes: Dict[str, float] = {}
+
+    def _load(self) -> Dict[str, ModelStats]:
+        if self._stats is None:
+            data = load_json(ROUTER_FILE, {})
+            self._stats = {}
+            if isinstance(data, dict):
+                for model, samples in (data.get("models") or {}).items():
+                    try:
+                        self._stats[model] = ModelStats(samples)
+                    except (TypeError, ValueError):
+                        continue
+                for mode, decision in (data.get("decisions") or {}).items():
+                    # Keep whichever decision is newer, ours or another process's
+                    mine = self.last_decisions.get(mode)
+                    if isinstance(decision, dict) and (mine is None or decision.get("time", 0) > mine.get("time", 0)):
+                        self.last_decisions[mode] = decision
+        cutoff = time.time() - MAX_SAMPLE_AGE
+        for stats in self._stats.values():
+            stats.expire(cutoff)
+        return self._stats
+
+    def _save(self):
+        save_json(ROUTER_FILE, {
+            "models": {model: [list(s) for s in st.samples] for model, st in self._load().items()},
+            "decisions": self.last_decisions,
+        })
+
+    @staticmethod
+    def candidates(model_config) -> List[str]:
+        """Models in quality order: the configured model, then the router models"""
+        models = [model_config.name]
+        for name in (getattr(model_config, "router_models", "") or "").split(","):
+            name = name.strip()
+            if name and name not in models:
+                models.append(name)
+        return models
+
+    @staticmethod
+    def target_ms(model_config, mode: str) -> int:
+        return getattr(model_config, f"latency_target_{mode}_ms", 0) or DEFAULT_TARGETS.get(mode, 5000)
+
+    def estimate_ms(self, model: str, mode: str, prompt_chars: int) -> Optional[float]:
+        """Expected latency of a request, or None while the model has too few samples"""
+        stats = self._load().get(model)
+        if stats is None:
+            return None
+        ttft = stats.ttft_ms(prompt_chars)
+        tps = stats.tokens_per_sec()
+        if ttft is None or tps is None:
+            return None
+        return ttft + EXPECTED_TOKENS.get(mode, 200) / tps * 1000
+
+    def _probe_due(self, model: str, now: float) -> bool:
+        """Whether a passed-over model has gone untried for PROBE_INTERVAL"""
+        stats = self._load().get(model)
+        last = max(stats.last_sample if stats else 0.0, self._probes.get(model, 0.0))
+        return now - last >= PROBE_INTERVAL
+
+    def decide(self, model_config, mode: str, prompt_chars: int) -> Dict[str, Any]:
+        """Pick the best-quality model expected to meet the mode's latency target"""
+        models = self.candidates(model_config)
+        target = self.target_ms(model_config, mode)
+        estimates: Dict[str, Optional[float]] = {}
+        choice, reason = None, ""
+        now = time.time()
+        for model in models:
+            estimate = self.estimate_ms(model, mode, prompt_chars)
+            estimates[model] = round(estimate, 1) if estimate is not None else None
+            stats = self._load().get(model)
+            failing = stats is not None and len(stats.samples) >= MIN_SAMPLES and stats.error_rate() > 0.5
+            too_slow = estimate is not None and estimate > target
+            if len(models) > 1 and (failing or too_slow) and self._probe_due(model, now):
+                # Passed over for a while: one request tells whether that is still right
+                choice, reason = model, "re-probing"
+                break
+            if failing:
+                continue
+            if len(models) == 1:
+                choice, reason = model, "only candidate"
+                break
+            if estimate is None:
+                # Unknown models are tried so they collect samples
+                choice, reason = model, "exploring"
+                break
+            if estimate <= target:
+                choice, reason = model, "meets target"
+                break
+        if choice is None:
+            known = {m: e for m, e in estimates.items() if e is not None}
+            choice = min(known, key=known.get) if known else models[0]
+            reason = "fastest, target missed" if known else "no usable statistics"
+        return {
+            "model": choice,
+            "reason": reason,
+            "target_ms": target,
+            "prompt_chars": prompt_chars,
+            "estimates_ms": estimates,
+        }
+
+    def choose(self, model_config, mode: str, prompt_chars: int) -> str:
+        """Pick the model for a request and remember the decision"""
+        with self._lock:
+            decision = self.decide(model_config, mode, prompt_chars)
+            decision["time"] = time.time()
+            self.last_decisions[mode] = decision
+            if decision["reason"] == "re-probing":
+                self._probes[decision["model"]] = decision["time"]
+        return decision["model"]
+
+    def record(self, model: str, prompt_chars: int, ttft_ms: float, tokens: int,
+               generation_ms: float, error: bool = False):
+        """Add the measurements of a finished request"""
+        tokens_per_sec = tokens / (generation_ms / 1000) if generation_ms > 0 and tokens else 0.0
+        with self._lock, file_lock(ROUTER_FILE):
+            # Merge with what other processes recorded meanwhile; under the lock nobody
+            # writes between this read and the save
+            self._stats = None
+            stats = self._load().setdefault(model, ModelStats())
+            stats.record(prompt_chars, ttft_ms, tokens_per_sec, error)
+            self._save()
+
+    def describe(self, model_config=None) -> Dict[str, Any]:
+        """Per-model statistics, the latest decision per mode and what would be chosen now"""
+        with self._lock:
+            report: Dict[str, Any] = {
+                "models": {model: stats.summary() for model, stats in self._load().items()},
+                "last_decisions": dict(self.last_decisions),
+            }
+            if model_config is not None:
+                report["candidates"] = self.candidates(model_config)
+                report["targets_ms"] = {mode: self.target_ms(model_config, mode) for mode in DEFAULT_TARGETS}
+                # Decisions for a typical 4000-character prompt
+                report["would_choose"] = {
+                    mode: self.decide(model_config, mode, 4000)["model"] for mode in DEFAULT_TARGETS
+                }
+        return report
+
+
+# Global model router instance
+router = ModelRouter()
@@ -0,0 +1,296 @@
+"""
+Scheduler module for Local AI Code Completion
+
+Every generate request gets its own ID and cancellation token. A debounce
+window sits in front of the upstream call of background requests (explicit
+commands run at once unless they ask for one), a newer request for the same
+document region supersedes (cancels) older ones, and a bounded number of
+upstream calls run at once with explicit commands ahead of background
+prefetch. Within a priority, waiting requests of different clients (editor
+windows sharing one server) take turns, so a busy window can't starve the
+others.
+
+A request may carry a deadline (its token's time budget). Debounce and
+queueing stop at the deadline; once the job runs, each stage checks the
+remaining budget itself and the API call returns what streamed so far.
+"""
+import asyncio
+import heapq
+import itertools
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .logger import logger
+from .stats import stats
+
+# Request priorities; lower runs first
+EXPLICIT = 0
+BACKGROUND = 1
+
+PRIORITIES = {"explicit": EXPLICIT, "background": BACKGROUND}
+
+# Client a request is submitted for; set by the server per connection
+current_client: ContextVar[str] = ContextVar("lacc_client", default="")
+
+
+class RequestCancelled(Exception):
+    """Raised to the caller of a request that was cancelled or superseded"""
+
+
+class DeadlineExceeded(RequestCancelled):
+    """Raised when a request's deadline passed before its job could start"""
+
+
+class CancellationToken:
+    """Cancellation state and time budget of one request"""
+    __slots__ = ("request_id", "reason", "deadline", "truncated", "_cancelled", "_callbacks")
+
+    def __init__(self, request_id: Any = None, timeout: Optional[float] = None):
+        self.request_id = request_id
+        self.reason = ""
+        # time.monotonic() at which the request must answer; None = no deadline
+        self.deadline = time.monotonic() + timeout if timeout else None
+        # Set when the answer was cut short by the deadline
+        self.truncated = False
+        self._cancelled = False
+        self._callbacks: List[Callable[[], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline, None without one"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    def cancel(self, reason: str = "cancelled"):
+        """Cancel the request; callbacks run once"""
+        if self._cancelled:
+            return
+        self._cancelled = True
+        self.reason = reason
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.debug(f"Cancellation callback failed: {e}")
+
+    def add_callback(self, callback: Callable[[], None]):
+        """Run callback on cancellation (immediately if already cancelled)"""
+        if self._cancelled:
+            callback()
+        else:
+            self._callbacks.append(callback)
+
+    def raise_if_cancelled(self):
+        if self._cancelled:
+            raise RequestCancelled(f"Request {self.request_id} {self.reason}")
+
+    def raise_if_expired(self, stage: str):
+        if self.expired:
+            stats.increment("deadline.queue_expired")
+            raise DeadlineExceeded(f"Request {self.request_id} reached its deadline while {stage}")
+
+
+class _Request:
+    __slots__ = ("request_id", "document", "line", "priority", "client", "token", "created")
+
+    def __init__(self, request_id: Any, document: str, line: int, priority: int, client: str = "",
+                 timeout: Optional[float] = None):
+        self.request_id = request_id
+        self.document = document
+        self.line = line
+        self.priority = priority
+        self.client = client
+        self.token = CancellationToken(request_id, timeout)
+        self.created = time.monotonic()
+
+
+class RequestScheduler:
+    """Debounces, supersedes, prioritizes and cancels generate requests"""
+
+    def __init__(self, debounce: Optional[float] = None, max_concurrent: Optional[int] = None,
+                 region_lines: Optional[int] = None):
+        self.debounce = debounce if debounce is not None else float(os.getenv("LACC_DEBOUNCE_MS", "100")) / 1000
+        self.max_concurrent = max_concurrent or max(1, int(os.getenv("LACC_MAX_CONCURRENT", "4")))
+        # Requests whose cursors are at most this many lines apart share a region
+        self.region_lines = region_lines if region_lines is not None else int(os.getenv("LACC_SUPERSEDE_LINES", "30"))
+        self._active: Dict[Any, _Request] = {}
+        # (priority, fair-share tag, sequence, slot)
+        self._waiting: List[Tuple[int, float, int, asyncio.Future]] = []
+        # Start-time fair queueing: each client's last tag and the tag of the last granted slot
+        self._client_tags: Dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._running = 0
+        self._sequence = itertools.count()
+        self._ids = itertools.count(1)
+
+    def _supersede(self, new: _Request):
+        """Cancel older requests for the same document region"""
+        if not new.document:
+            return
+        for request in list(self._active.values()):
+            if (request.document == new.document
+                    and abs(request.line - new.line) <= self.region_lines
+                    and request.priority >= new.priority):
+                request.token.cancel("superseded")
+                stats.increment("scheduler.superseded")
+
+    async def _sleep(self, token: CancellationToken, delay: float):
+        """Sleep for the debounce window, waking up early on cancellation"""
+        waiter = asyncio.get_running_loop().create_future()
+        token.add_callback(lambda: waiter.done() or waiter.set_result(None))
+        try:
+            await asyncio.wait_for(waiter, delay)
+        except asyncio.TimeoutError:
+            pass
+
+    def _fair_tag(self, client: str) -> float:
+        """Queue position of a client's next request: one turn after its previous one"""
+        tag = max(self._virtual_time, self._client_tags.get(client, 0.0)) + 1
+        self._client_tags[client] = tag
+        return tag
+
+    async def _acquire(self, request: _Request):
+        """Wait for an upstream slot; explicit requests are served first, clients take turns"""
+        if self._running < self.max_concurrent and not self._waiting:
+            self._running += 1
+            return
+        loop = asyncio.get_running_loop()
+        slot = loop.create_future()
+        heapq.heappush(self._waiting, (request.priority, self._fair_tag(request.client), next(self._sequence), slot))
+        token = request.token
+        token.add_callback(lambda: slot.done() or slot.cancel())
+        timer = None
+        if token.deadline is not None:
+            timer = loop.call_later(token.remaining(), lambda: slot.done() or slot.cancel())
+        try:
+            await slot
+        except asyncio.CancelledError:
+            if slot.done() and not slot.cancelled():
+                # The slot was granted just before the cancellation; hand it on
+                self._release()
+            token.raise_if_cancelled()
+            token.raise_if_expired("queued")
+            raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+
+    def _release(self):
+        """Hand the slot to the next waiting request"""
+        self._running -= 1
+        while self._waiting:
+            _, tag, _, slot = heapq.heappop(self._waiting)
+            if not slot.done():
+                self._virtual_time = max(self._virtual_time, tag)
+                self._running += 1
+                slot.set_result(None)
+                return
+
+    async def submit(self, job: Callable[[CancellationToken], Awaitable[Any]], document: str = "",
+                     line: int = 0, priority: int = EXPLICIT, request_id: Any = None,
+                     debounce: Optional[float] = None, client: Optional[str] = None,
+                     timeout: Optional[float] = None) -> Any:
+        """Run job(token) once the request survived debounce and got a slot within its timeout
+
+        Explicit requests are user commands and skip the default debounce;
+        a debounce passed by the caller still applies.
+        """
+        if request_id is None or request_id in self._active:
+            request_id = f"r{next(self._ids)}"
+        request = _Request(request_id, document, line, priority, current_client.get() if client is None else client,
+                           timeout)
+        token = request.token
+        self._supersede(request)
+        self._active[request_id] = request
+        stats.increment("scheduler.requests")
+        try:
+            if debounce is not None:
+                delay = debounce
+            else:
+                delay = self.debounce if priority != EXPLICIT else 0
+            if delay > 0:
+                await self._sleep(token, min(delay, token.remaining() if token.deadline is not None else delay))
+            token.raise_if_cancelled()
+            token.raise_if_expired("debouncing")
+
+            await self._acquire(request)
+            try:
+                token.raise_if_cancelled()
+                token.raise_if_expired("queued")
+                stats.increment("scheduler.queue_ms", (time.monotonic() - request.created) * 1000)
+                task = asyncio.ensure_future(job(token))
+                # Cancelling the task closes the upstream stream of the request
+                token.add_callback(task.cancel)
+                try:
+                    return await task
+                except asyncio.CancelledError:
+                    token.raise_if_cancelled()
+                    raise
+            finally:
+                self._release()
+        except RequestCancelled:
+            stats.increment("scheduler.cancelled")
+            logger.debug(f"Request {request_id} {token.reason}")
+            raise
+        except asyncio.CancelledError:
+            # The caller's task was cancelled (its client went away) while debouncing, queued or running
+            token.cancel("cancelled")
+            stats.increment("scheduler.cancelled")
+            logger.debug(f"Request {request_id} cancelled with its task")
+            raise RequestCancelled(f"Request {request_id} cancelled") from None
+        finally:
+            self._active.pop(request_id, None)
+
+    def cancel(self, request_id: Any, reason: str = "cancelled") -> bool:
+        """Cancel one request by ID"""
+        request = self._active.get(request_id)
+        if request is None:
+            return False
+        request.token.cancel(reason)
+        return True
+
+    def cancel_document(self, document: str, reason: str = "cancelled") -> int:
+        """Cancel all requests for a document"""
+        requests = [r for r in self._active.values() if r.document == document]
+        for request in requests:
+            request.token.cancel(reason)
+        return len(requests)
+
+    def cancel_client(self, client: str, reason: str = "client disconnected") -> int:
+        """Cancel all requests of a client and forget its queue position"""
+        requests = [r for r in self._active.values() if r.client == client]
+        for request in requests:
+            request.token.cancel(reason)
+        self._client_tags.pop(client, None)
+        return len(requests)
+
+    def cancel_all(self, reason: str = "cancelled") -> int:
+        requests = list(self._active.values())
+        for request in requests:
+            request.token.cancel(reason)
+        return len(requests)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "active": len(self._active),
+            "running": self._running,
+            "waiting": sum(1 for *_, slot in self._waiting if not slot.done()),
+            "clients": len({r.client for r in self._active.values()}),
+            "debounce_ms": round(self.debounce * 1000),
+            "max_concurrent": self.max_concurrent,
+        }
+
+
+# Global request scheduler instance
+scheduler = RequestScheduler()
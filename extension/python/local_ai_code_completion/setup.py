@@ -1,27 +1,17 @@
 """
 Setup module for Local AI Code Completion
-Handles Groq API setup and validation
+Handles Groq API (or local model server) setup and validation
 """
-import asyncio
-import sys
-import time
-from typing import Optional, Dict, Any
-
 # Conditional import to handle missing dependencies
-try:
-    import groq
-    GROQ_AVAILABLE = True
-except ImportError:
-    GROQ_AVAILABLE = False
-    print("Warning: groq package not available. Please install dependencies.")
+from .logger import logger
+from .providers import GROQ_AVAILABLE, ProviderError, model_name, provider_name, providers
+from .workers import run_in_thread
 
 try:
     from .config import config
-    from .logger import logger
 except ImportError as e:
-    print(f"Warning: Could not import config or logger: {e}")
+    logger.warning(f"Could not import config: {e}")
     config = None
-    logger = None
 
 
 class GroqSetup:
@@ -29,112 +19,103 @@ class GroqSetup:
     
     def __init__(self):
         if not GROQ_AVAILABLE:
-            print("Error: groq package not available. Please install dependencies.")
-            self.model_config = None
-            self.client = None
-            return
-            
-        if config:
-            self.model_config = config.get_model_config()
-        else:
-            self.model_config = None
-        self.client = None
+            logger.error("groq package not available. Please install dependencies.")
+        self.provider = None
+    
+    @property
+    def model_config(self):
+        """Model configuration of the current config snapshot"""
+        return config.get_model_config() if config else None
+    
+    @property
+    def provider_name(self) -> str:
+        """Provider used for code completions"""
+        return provider_name(self.model_config, "code") if self.model_config else "groq"
     
     async def check_api_key(self) -> bool:
-        """Check if Groq API key is provided"""
+        """Check if Groq API key is provided (or the local server is reachable)"""
+        if self.provider_name == "local":
+            try:
+                self.provider = providers.get(self.model_config, "local")
+            except ProviderError as e:
+                logger.error(str(e))
+                return False
+            if not await run_in_thread(self.provider.available):
+                logger.error(f"Local model server not reachable at {self.model_config.local_base_url}")
+                return False
+            logger.info("Local model server is reachable")
+            return True
+        
         if not GROQ_AVAILABLE:
-            print("Error: groq package not available. Please install dependencies.")
+            logger.error("groq package not available. Please install dependencies.")
             return False
             
         if not self.model_config or not self.model_config.api_key:
-            print("No Groq API key provided. Please set GROQ_API_KEY environment variable.")
+            logger.error("No Groq API key provided. Please set GROQ_API_KEY environment variable.")
             return False
         
         try:
-            # Initialize with minimal parameters to avoid compatibility issues
-            self.client = groq.Groq(api_key=self.model_config.api_key)
-            print("Groq API key is valid")
+            self.provider = providers.get(self.model_config, "groq")
+            logger.info("Groq API key is valid")
             return True
-        except TypeError as e:
-            # Handle version compatibility issues
-            print(f"Groq client compatibility issue: {e}")
-            print("Trying alternative client initialization...")
-            try:
-                # Try without any additional parameters
-                self.client = groq.Groq(api_key=self.model_config.api_key)
-                print("Groq API key is valid (alternative initialization)")
-                return True
-            except Exception as e2:
-                print(f"Invalid Groq API key: {e2}")
-                return False
-        except Exception as e:
-            print(f"Invalid Groq API key: {e}")
+        except ProviderError as e:
+            logger.error(f"Invalid Groq API key: {e}")
             return False
     
     async def check_model_availability(self) -> bool:
         """Check if the specified model is available"""
-        if not GROQ_AVAILABLE:
-            print("Error: groq package not available. Please install dependencies.")
-            return False
-            
-        if not self.client:
+        if not self.provider:
             return False
         
+        model = model_name(self.model_config, self.provider.name)
         try:
             # Test a simple completion to check model availability
-            response = self.client.chat.completions.create(
-                model=self.model_config.name,
-                messages=[{"role": "user", "content": "Hello"}],
+            await run_in_thread(
+                self.provider.chat,
+                model,
+                [{"role": "user", "content": "Hello"}],
                 max_tokens=1
             )
-            print(f"Model {self.model_config.name} is available")
+            logger.info(f"Model {model} is available")
             return True
         except Exception as e:
-            print(f"Model {self.model_config.name} is not available: {e}")
+            logger.error(f"Model {model} is not available: {e}")
             return False
     
     async def get_available_models(self) -> list:
         """Get list of available models"""
-        if not GROQ_AVAILABLE:
-            print("Error: groq package not available. Please install dependencies.")
-            return []
-            
-        if not self.client:
+        if not self.provider:
             return []
         
         try:
-            models = self.client.models.list()
-            return [model.id for model in models.data]
+            return await run_in_thread(self.provider.list_models)
         except Exception as e:
-            print(f"Failed to get available models: {e}")
+            logger.error(f"Failed to get available models: {e}")
             return []
     
     async def setup(self) -> bool:
         """Complete setup process"""
-        if not GROQ_AVAILABLE:
-            print("Error: groq package not available. Please install dependencies.")
-            return False
-            
         # Check API key
         if not await self.check_api_key():
-            print("Please get your API key from https://console.groq.com/keys")
+            if self.provider_name == "groq":
+                logger.error("Please get your API key from https://console.groq.com/keys")
             return False
         
         # Check model availability
         if not await self.check_model_availability():
-            print(f"Model {self.model_config.name} is not available")
+            logger.error(f"Model {model_name(self.model_config, self.provider.name)} is not available")
             available_models = await self.get_available_models()
             if available_models:
-                print(f"Available models: {', '.join(available_models)}")
+                logger.error(f"Available models: {', '.join(available_models)}")
             return False
         
-        print("Setup completed successfully")
+        logger.info("Setup completed successfully")
         return True
     
     def cleanup(self):
         """Clean up resources"""
-        self.client = None
-        print("Groq client cleaned up")
+        self.provider = None
+        logger.debug("Provider cleaned up")
 
 
 # Global setup instance
@@ -0,0 +1,173 @@
+"""
+Stats module for Local AI Code Completion
+Keeps backend counters that survive across backend invocations
+"""
+import atexit
+import threading
+from typing import Dict, Any
+
+from .storage import file_lock, load_json, save_json
+
+STATS_FILE = "stats.json"
+
+
+class Stats:
+    """Collects backend counters and persists them to the cache directory"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending: Dict[str, float] = {}
+        atexit.register(self.flush)
+
+    def increment(self, name: str, amount: float = 1):
+        """Increment a counter by the given amount"""
+        with self._lock:
+            self._pending[name] = self._pending.get(name, 0) + amount
+
+    def flush(self):
+        """Merge pending counters into the persisted stats file"""
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+        # Other backends and CLI runs merge into the same file
+        with file_lock(STATS_FILE):
+            data = load_json(STATS_FILE, {})
+            counters = data.get("counters", {}) if isinstance(data, dict) else {}
+            for name, amount in pending.items():
+                counters[name] = counters.get(name, 0) + amount
+            save_json(STATS_FILE, {"counters": counters})
+
+    def get_counters(self) -> Dict[str, float]:
+        """Get persisted counters including not yet flushed ones"""
+        data = load_json(STATS_FILE, {})
+        counters = dict(data.get("counters", {})) if isinstance(data, dict) else {}
+        with self._lock:
+            for name, amount in self._pending.items():
+                counters[name] = counters.get(name, 0) + amount
+        return counters
+
+    @staticmethod
+    def rate(hits: float, total: float) -> float:
+        """Compute a ratio rounded for display"""
+        return round(hits / total, 4) if total else 0.0
+
+    def report(self) -> Dict[str, Any]:
+        """Build the stats report shown by the stats command"""
+        counters = self.get_counters()
+        lookups = counters.get("continuation.lookups", 0)
+        checked = counters.get("validation.checked", 0)
+        failed = counters.get("validation.failed", 0)
+        races = counters.get("candidates.races", 0)
+        requests = counters.get("scheduler.requests", 0)
+        generations = counters.get("reasoning.requests", 0)
+        digest_requests = counters.get("digests.requests", 0)
+        prefetched = counters.get("prefetch.completed", 0)
+        minified = counters.get("minify.requests", 0)
+        sections = {}
+        for name, value in counters.items():
+            if name.startswith("sections.") and name.endswith(".calls") and value:
+                section = name[len("sections."):-len(".calls")]
+                sections[section] = {
+                    "calls": value,
+                    "avg_ms": round(counters.get(f"sections.{section}.ms", 0) / value, 2),
+                }
+        return {
+            "counters": counters,
+            "continuation": {
+                "lookups": lookups,
+                "hits": counters.get("continuation.hits", 0),
+                "hit_rate": self.rate(counters.get("continuation.hits", 0), lookups),
+            },
+            "validation": {
+                "checked": checked,
+                "failure_rate": self.rate(failed, checked),
+                "repaired_local": counters.get("validation.repaired_local", 0),
+                "repaired_remote": counters.get("validation.repaired_remote", 0),
+                "repair_requests": counters.get("validation.repair_requests", 0),
+                "unrepaired": counters.get("validation.unrepaired", 0),
+            },
+            "candidates": {
+                "races": races,
+                "started": counters.get("candidates.started", 0),
+                "cancelled": counters.get("candidates.cancelled", 0),
+                "no_valid_rate": self.rate(counters.get("candidates.no_valid", 0), races),
+            },
+            "scheduler": {
+                "requests": requests,
+                "superseded": counters.get("scheduler.superseded", 0),
+                "cancel_rate": self.rate(counters.get("scheduler.cancelled", 0), requests),
+                "avg_queue_ms": round(counters.get("scheduler.queue_ms", 0) / requests, 1) if requests else 0.0,
+            },
+            "reasoning": {
+                "requests": generations,
+                "with_reasoning_rate": self.rate(counters.get("reasoning.with_reasoning", 0), generations),
+                "avg_tokens_per_request": round(counters.get("reasoning.tokens", 0) / generations, 1) if generations else 0.0,
+                "filtered_blocks": counters.get("reasoning.filtered_blocks", 0),
+            },
+            "digests": {
+                "built": counters.get("digests.built", 0),
+                "hits": counters.get("digests.hits", 0),
+                "refined": counters.get("digests.refined", 0),
+                "requests_with_context": digest_requests,
+                "avg_context_chars": round(counters.get("digests.context_chars", 0) / digest_requests, 1) if digest_requests else 0.0,
+            },
+            "prefetch": {
+                "started": counters.get("prefetch.started", 0),
+                "completed": prefetched,
+                "hits": counters.get("prefetch.hits", 0),
+                "hit_rate": self.rate(counters.get("prefetch.hits", 0), prefetched),
+                "cancelled": counters.get("prefetch.cancelled", 0),
+                "throttled": counters.get("prefetch.throttled", 0),
+            },
+            "minify": {
+                "requests": minified,
+                "avg_tokens_saved": round(counters.get("minify.tokens_saved", 0) / minified, 1) if minified else 0.0,
+                "savings_rate": self.rate(
+                    counters.get("minify.chars_before", 0) - counters.get("minify.chars_after", 0),
+                    counters.get("minify.chars_before", 0)
+                ),
+            },
+            "overlap": {
+                "suffix_stops": counters.get("overlap.suffix_stops", 0),
+                "prefix_trimmed_lines": counters.get("overlap.prefix_trimmed_lines", 0),
+                "tokens_saved": counters.get("overlap.tokens_saved", 0),
+            },
+            "ddic": {
+                "requests": counters.get("ddic.requests", 0),
+                "tables": counters.get("ddic.tables", 0),
+                "context_chars": counters.get("ddic.context_chars", 0),
+                "builds": counters.get("ddic.builds", 0),
+            },
+            "debug_templates": {
+                "served": counters.get("debug_templates.served", 0),
+                "fallback": counters.get("debug_templates.fallback", 0),
+            },
+            "deadline": {
+                "truncated": counters.get("deadline.truncated", 0),
+                "queue_expired": counters.get("deadline.queue_expired", 0),
+                "skipped_digests": counters.get("deadline.skipped_digests", 0),
+                "skipped_ddic": counters.get("deadline.skipped_ddic", 0),
+                "repair_skipped": counters.get("deadline.repair_skipped", 0),
+            },
+            "trace": {
+                "requests": counters.get("trace.requests", 0),
+                "dropped": counters.get("trace.dropped", 0),
+            },
+            "governor": {
+                "degraded_level1": counters.get("governor.level1", 0),
+                "degraded_level2": counters.get("governor.level2", 0),
+                "degraded_level3": counters.get("governor.level3", 0),
+            },
+            "sections": sections,
+        }
+
+    def reset(self):
+        """Reset all counters"""
+        with self._lock:
+            self._pending = {}
+        save_json(STATS_FILE, {"counters": {}})
+
+
+# Global stats instance
+stats = Stats()
@@ -0,0 +1,88 @@
+"""
+Storage module for Local AI Code Completion
+Handles the on-disk cache directory shared by backend processes
+"""
+import contextlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Iterator
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+
+def get_cache_dir() -> Path:
+    """Get the backend cache directory, creating it if needed"""
+    cache_dir = os.getenv("LACC_CACHE_DIR", "")
+    if cache_dir:
+        path = Path(cache_dir).expanduser()
+    else:
+        path = Path.home() / ".cache" / "abap-code-assistant"
+    try:
+        path.mkdir(parents=True, exist_ok=True)
+    except OSError:
+        # Fall back to a temp directory on read-only home directories
+        path = Path(tempfile.gettempdir()) / "abap-code-assistant"
+        path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def load_json(name: str, default: Any = None) -> Any:
+    """Load a JSON document from the cache directory"""
+    path = get_cache_dir() / name
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def save_json(name: str, data: Any) -> bool:
+    """Atomically write a JSON document to the cache directory"""
+    path = get_cache_dir() / name
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=str(path.parent), prefix=f".{name}.", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        # os.replace is atomic, so concurrent backends never see a torn file
+        os.replace(tmp_path, path)
+        return True
+    except OSError:
+        if tmp_path:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+        return False
+
+
+@contextlib.contextmanager
+def file_lock(name: str) -> Iterator[None]:
+    """Hold an exclusive lock shared by all backends on the cache directory"""
+    with open(get_cache_dir() / f"{name}.lock", "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        elif msvcrt is not None:
+            f.seek(0)
+            # Retries for about ten seconds before raising OSError
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            yield
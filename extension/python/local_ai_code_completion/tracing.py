@@ -0,0 +1,235 @@
+"""
+Tracing module for Local AI Code Completion
+
+An opt-in recorder (LACC_TRACE=1) of the shape of real traffic, which
+`python main.py replay` plays back against a stand-in model server. Each
+generate request is one JSON line in LACC_TRACE_FILE with:
+
+- arrival time, kind (generate, prefetch, cli), mode, priority, debounce,
+  deadline, document and line, and the sizes of prefix, suffix and comment
+- every model call it made: provider, model, prompt size, max_tokens,
+  reported tokens and the offset and size of each streamed chunk
+- how long it took, how much it returned and how it ended
+
+API keys are never written, only a short hash that tells requests of
+different keys apart. Document names are hashed the same way, and so is
+the code unless LACC_TRACE_CODE=text; a replay of a hashed trace sends
+filler code of the recorded sizes.
+"""
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from .logger import logger
+from .scheduler import DeadlineExceeded, RequestCancelled
+from .stats import stats
+from .storage import get_cache_dir
+
+TRACE_FILE = "traces.jsonl"
+# Bumped when the record layout changes in a way replay has to know about
+TRACE_VERSION = 1
+
+
+def digest(value: str) -> str:
+    """Short, stable hash of a value that must not be written as it is"""
+    return hashlib.sha256(value.encode("utf-8", errors="replace")).hexdigest()[:16]
+
+
+def _outcome(error: BaseException) -> str:
+    if isinstance(error, DeadlineExceeded):
+        return "deadline"
+    if isinstance(error, RequestCancelled) or type(error).__name__ == "CancelledError":
+        return "cancelled"
+    return "error"
+
+
+class CallTrace:
+    """One model call of a traced request"""
+
+    def __init__(self, provider: str, model: str, prompt_chars: int, max_tokens: int, api_key: str = ""):
+        self._start = time.perf_counter()
+        self.record: Dict[str, Any] = {
+            "provider": provider,
+            "model": model,
+            "key": digest(api_key) if api_key else "",
+            "prompt_chars": prompt_chars,
+            "max_tokens": max_tokens,
+            # [milliseconds after the call started, characters]
+            "chunks": [],
+        }
+
+    def chunk(self, chars: int):
+        self.record["chunks"].append([round((time.perf_counter() - self._start) * 1000, 1), chars])
+
+    def finish(self, prompt_tokens: int, completion_tokens: int, outcome: str):
+        self.record.update(
+            duration_ms=round((time.perf_counter() - self._start) * 1000, 1),
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            outcome=outcome,
+        )
+
+
+class RequestTrace:
+    """One traced request and the model calls made for it"""
+
+    def __init__(self, kind: str, mode: str, prefix: str, suffix: str, comment: str, hash_code: bool,
+                 document: str = "", **fields):
+        self._start = time.perf_counter()
+        self.calls: List[CallTrace] = []
+        self.outcome = "ok"
+        self.record: Dict[str, Any] = {
+            "version": TRACE_VERSION,
+            "time": round(time.time(), 3),
+            "kind": kind,
+            "mode": mode,
+            "document": digest(document) if document else "",
+            "line": prefix.count("\n"),
+            **fields,
+            "prefix_chars": len(prefix),
+            "suffix_chars": len(suffix),
+            "comment_chars": len(comment),
+        }
+        if hash_code:
+            self.record.update(prefix_hash=digest(prefix), suffix_hash=digest(suffix),
+                               comment_hash=digest(comment) if comment else "")
+        else:
+            self.record.update(prefix=prefix, suffix=suffix, comment=comment)
+
+    def call(self, provider: str, model: str, prompt_chars: int, max_tokens: int, api_key: str = "") -> CallTrace:
+        call = CallTrace(provider, model, prompt_chars, max_tokens, api_key)
+        self.calls.append(call)
+        return call
+
+    def result(self, completion: str, truncated: bool = False, prefetched: bool = False):
+        self.record["completion_chars"] = len(completion or "")
+        self.outcome = "prefetched" if prefetched else "truncated" if truncated else "ok"
+
+    def finish(self) -> Dict[str, Any]:
+        self.record.update(
+            duration_ms=round((time.perf_counter() - self._start) * 1000, 1),
+            outcome=self.outcome,
+            calls=[call.record for call in self.calls],
+        )
+        self.record.setdefault("completion_chars", 0)
+        return self.record
+
+
+# Trace of the request the current task works for
+_current: ContextVar[Optional[RequestTrace]] = ContextVar("lacc_trace", default=None)
+
+
+class TraceRecorder:
+    """Writes sanitized request traces when LACC_TRACE=1"""
+
+    def __init__(self):
+        self.enabled = os.getenv("LACC_TRACE", "0") == "1"
+        self.path = os.getenv("LACC_TRACE_FILE", "")
+        # "hash" writes only hashes of the code, "text" the code itself
+        self.hash_code = os.getenv("LACC_TRACE_CODE", "hash") != "text"
+        self.max_bytes = int(float(os.getenv("LACC_TRACE_MAX_MB", "100")) * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._full = False
+
+    def file(self) -> Path:
+        return Path(self.path).expanduser() if self.path else get_cache_dir() / TRACE_FILE
+
+    def begin(self, kind: str, mode: str, prefix: str, suffix: str, comment: str = "",
+              **fields) -> Optional[RequestTrace]:
+        """Start the trace of a request that just arrived; None when not tracing"""
+        if not self.enabled or self._full:
+            return None
+        return RequestTrace(kind, mode, prefix, suffix, comment, self.hash_code, **fields)
+
+    @contextlib.contextmanager
+    def request(self, kind: str, mode: str, prefix: str, suffix: str, comment: str = "",
+                **fields) -> Iterator[Optional[RequestTrace]]:
+        """Trace the request handled in the block, including the model calls of tasks it starts"""
+        trace = self.begin(kind, mode, prefix, suffix, comment, **fields)
+        if trace is None:
+            yield None
+            return
+        reset = _current.set(trace)
+        try:
+            yield trace
+        except BaseException as e:
+            trace.outcome = _outcome(e)
+            raise
+        finally:
+            _current.reset(reset)
+            self.write(trace)
+
+    async def run(self, trace: Optional[RequestTrace], coroutine) -> Any:
+        """Await a job started for a trace begun earlier, e.g. a prefetch, and write the trace"""
+        if trace is None:
+            return await coroutine
+        # Jobs run in their own task, so the trace doesn't leak to other requests
+        _current.set(trace)
+        try:
+            completion = await coroutine
+        except BaseException as e:
+            trace.outcome = _outcome(e)
+            raise
+        else:
+            trace.result(completion)
+            return completion
+        finally:
+            self.write(trace)
+
+    @staticmethod
+    def result(trace: Optional[RequestTrace], completion: str, truncated: bool = False, prefetched: bool = False):
+        """Note what a traced request returned"""
+        if trace is not None:
+            trace.result(completion, truncated, prefetched)
+
+    def call(self, provider: str, model: str, prompt_chars: int, max_tokens: int,
+             api_key: str = "") -> Optional[CallTrace]:
+        """Start recording a model call of the current request; None when it isn't traced"""
+        trace = _current.get()
+        if trace is None:
+            return None
+        return trace.call(provider, model, prompt_chars, max_tokens, api_key)
+
+    def write(self, trace: RequestTrace):
+        line = json.dumps(trace.finish(), separators=(",", ":")) + "\n"
+        path = self.file()
+        with self._lock:
+            try:
+                if path.exists() and path.stat().st_size + len(line) > self.max_bytes:
+                    if not self._full:
+                        logger.warning(f"Trace file {path} reached LACC_TRACE_MAX_MB; tracing stopped")
+                    self._full = True
+                    stats.increment("trace.dropped")
+                    return
+                path.parent.mkdir(parents=True, exist_ok=True)
+                # One write per record, so several backends can append to the same file
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(line)
+                stats.increment("trace.requests")
+            except OSError as e:
+                stats.increment("trace.dropped")
+                logger.warning(f"Could not write trace to {path}: {e}")
+
+
+def load_trace(path: Path) -> List[Dict[str, Any]]:
+    """Records of a trace file in arrival order; unreadable lines are skipped"""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and record.get("version") == TRACE_VERSION:
+                records.append(record)
+    return sorted(records, key=lambda record: record.get("time", 0))
+
+
+# Global trace recorder instance
+tracer = TraceRecorder()
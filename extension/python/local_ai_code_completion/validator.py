@@ -0,0 +1,329 @@
+"""
+Validator module for Local AI Code Completion
+
+Fast local checks run on generated ABAP after clean_abap_output: block
+balance (IF/ENDIF, LOOP/ENDLOOP, ...), statement termination and chained
+statement syntax. Trivial problems are repaired locally; for anything else
+only the faulty fragment is sent back to the model in a small repair prompt.
+"""
+import os
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+from .abap_lexer import (COLON, COMMA, PERIOD, UNTERMINATED, WORD,
+                         Statement, split_statements)
+from .profiling import section
+from .stats import stats
+
+# Opening keyword -> closing keyword
+BLOCKS = {
+    "IF": "ENDIF",
+    "CASE": "ENDCASE",
+    "DO": "ENDDO",
+    "WHILE": "ENDWHILE",
+    "LOOP": "ENDLOOP",
+    "TRY": "ENDTRY",
+    "SELECT": "ENDSELECT",
+    "AT": "ENDAT",
+    "PROVIDE": "ENDPROVIDE",
+    "METHOD": "ENDMETHOD",
+    "FORM": "ENDFORM",
+    "FUNCTION": "ENDFUNCTION",
+    "MODULE": "ENDMODULE",
+    "CLASS": "ENDCLASS",
+    "INTERFACE": "ENDINTERFACE",
+    "DEFINE": "END-OF-DEFINITION",
+}
+CLOSERS = {closer: opener for opener, closer in BLOCKS.items()}
+
+# Statements that need a colon when they list several comma-separated items
+CHAIN_KEYWORDS = {
+    "DATA", "TYPES", "CONSTANTS", "STATICS", "FIELD-SYMBOLS", "CLASS-DATA",
+    "PARAMETERS", "SELECT-OPTIONS", "TABLES", "WRITE", "CLEAR", "FREE",
+    "REFRESH", "METHODS", "CLASS-METHODS", "EVENTS", "INTERFACES", "ALIASES",
+}
+
+# A statement ending in one of these words was cut off mid-way
+DANGLING_WORDS = {
+    "=", "+", "-", "*", "/", "&&", "&", "AND", "OR", "NOT", "TYPE", "LIKE",
+    "TO", "INTO", "FROM", "WHERE", "VALUE", "EXPORTING", "IMPORTING",
+    "CHANGING", "RECEIVING", "EXCEPTIONS", "TABLES", "USING", "OF", "IN",
+    "BY", "SET", "REF", "NEW", "#(", "(", "->", "=>", "<", ">", "<=", ">=",
+    "<>", "EQ", "NE", "LT", "GT", "LE", "GE", "IS", "AS", "FOR", "WITH",
+}
+
+# Aggregate selects return one row and don't open a SELECT loop
+_AGGREGATES = ("COUNT(", "SUM(", "MAX(", "MIN(", "AVG(")
+
+
+class ValidationIssue:
+    """A problem found in generated code; lines are relative to the code"""
+    __slots__ = ("kind", "message", "start_line", "end_line", "trivial")
+
+    def __init__(self, kind: str, message: str, start_line: int, end_line: int, trivial: bool):
+        self.kind = kind
+        self.message = message
+        self.start_line = max(0, start_line)
+        self.end_line = max(self.start_line, end_line)
+        self.trivial = trivial
+
+    def __repr__(self) -> str:
+        return f"ValidationIssue({self.kind!r}, line {self.start_line}: {self.message})"
+
+
+class ValidationResult:
+    """Issues found in generated code and the locally repaired code"""
+
+    def __init__(self, code: str, issues: List[ValidationIssue], repaired_code: str):
+        self.code = code
+        self.issues = issues
+        self.repaired_code = repaired_code
+
+    @property
+    def valid(self) -> bool:
+        return not self.issues
+
+    @property
+    def needs_model(self) -> bool:
+        """True if some issue can't be repaired locally"""
+        return any(not issue.trivial for issue in self.issues)
+
+
+def block_closer(statement: Statement) -> Optional[str]:
+    """Get the closing keyword if the statement opens a block"""
+    keyword = statement.keyword
+    if keyword not in BLOCKS or statement.is_chained:
+        return None
+    words = statement.words
+    if keyword in ("CLASS", "INTERFACE") and ("DEFERRED" in words or "LOAD" in words):
+        return None
+    if keyword == "AT" and (len(words) < 2 or words[1] not in ("NEW", "END", "FIRST", "LAST")):
+        return None
+    if keyword == "SELECT":
+        if "SINGLE" in words or "TABLE" in words:
+            return None
+        if "GROUP" not in words and any(w.startswith(_AGGREGATES) for w in words):
+            return None
+    return BLOCKS[keyword]
+
+
+def _tail_lines(text: str, max_lines: int) -> Tuple[str, bool]:
+    """Get the last max_lines lines of text and whether it was cut"""
+    pos = len(text)
+    for _ in range(max_lines):
+        pos = text.rfind("\n", 0, pos)
+        if pos == -1:
+            return text, False
+    return text[pos + 1:], True
+
+
+def _prefix_stack(statements: List[Statement]) -> List[str]:
+    """Closers still expected after the prefix, innermost last"""
+    stack: List[str] = []
+    for statement in statements:
+        keyword = statement.keyword
+        if keyword in CLOSERS:
+            if keyword in stack:
+                # Tolerate broken user code: unwind to the matching block
+                while stack and stack.pop() != keyword:
+                    pass
+            continue
+        closer = block_closer(statement)
+        if closer:
+            stack.append(closer)
+    return stack
+
+
+def _suffix_closes(suffix: str, pending: List[str]) -> int:
+    """Count how many of the innermost pending blocks the suffix closes"""
+    stack = list(pending)
+    closed = 0
+    nested: List[str] = []
+    for statement in split_statements(suffix[:20000]):
+        keyword = statement.keyword
+        closer = block_closer(statement)
+        if closer:
+            nested.append(closer)
+        elif keyword in CLOSERS:
+            if nested and nested[-1] == keyword:
+                nested.pop()
+            elif stack and stack[-1] == keyword:
+                stack.pop()
+                closed += 1
+            else:
+                break
+        if not stack:
+            break
+    return closed
+
+
+def _is_truncated(statement: Statement) -> bool:
+    """Check if an unterminated statement was cut off mid-way"""
+    last = statement.tokens[-1]
+    if last.kind in (UNTERMINATED, COMMA, COLON):
+        return True
+    if last.kind == WORD and last.text.upper() in DANGLING_WORDS:
+        return True
+    opened = sum(t.text.count("(") for t in statement.tokens if t.kind == WORD)
+    closed = sum(t.text.count(")") for t in statement.tokens if t.kind == WORD)
+    return opened > closed
+
+
+@section("validate")
+def validate_abap(code: str, prefix: str = "", suffix: str = "",
+                  max_prefix_lines: int = 3000) -> ValidationResult:
+    """Check generated code in the context it will be inserted into"""
+    window, prefix_cut = _tail_lines(prefix, max_prefix_lines)
+    prefix_statements = split_statements(window)
+
+    # Code generated mid-statement continues the statement at the cursor
+    carry = ""
+    if prefix_statements and not prefix_statements[-1].terminated:
+        first = prefix_statements.pop().tokens[0]
+        window_lines = window.split("\n")
+        carry = "\n".join([window_lines[first.line][first.col:]] + window_lines[first.line + 1:])
+    carry_lines = carry.count("\n")
+    carry_last_len = len(carry) - (carry.rfind("\n") + 1)
+    stack = _prefix_stack(prefix_statements)
+
+    combined = carry + code
+    line_starts = [0]
+    for index, ch in enumerate(combined):
+        if ch == "\n":
+            line_starts.append(index + 1)
+
+    def code_offset(token) -> int:
+        """Offset of a token in the generated code (negative inside the carry)"""
+        return line_starts[token.line] + token.col - len(carry)
+
+    def code_line(line: int) -> int:
+        return line - carry_lines
+
+    issues: List[ValidationIssue] = []
+    edits: List[Tuple[int, int, str]] = []   # (offset, length to delete, text to insert)
+    opened: List[Tuple[str, int, int]] = []  # (closer, indent, line) opened by the code
+
+    statements = split_statements(combined)
+    for statement in statements:
+        start, end = code_line(statement.start_line), code_line(statement.end_line)
+        keyword = statement.keyword
+        tokens = statement.tokens
+
+        # Chained statement syntax
+        colons = [i for i, t in enumerate(tokens) if t.kind == COLON]
+        commas = [i for i, t in enumerate(tokens) if t.kind == COMMA]
+        if colons:
+            if colons[0] == 0:
+                issues.append(ValidationIssue("chain", "Chain colon without a leading keyword", start, end, False))
+            body = tokens[colons[0] + 1:]
+            for index, token in enumerate(body):
+                if token.kind != COMMA:
+                    continue
+                following = body[index + 1] if index + 1 < len(body) else None
+                if following is not None and following.kind == PERIOD and code_offset(token) >= 0:
+                    issues.append(ValidationIssue("chain", "Trailing comma before period", start, end, True))
+                    edits.append((code_offset(token), 1, ""))
+                elif following is None or following.kind == COMMA or index == 0:
+                    issues.append(ValidationIssue("chain", "Empty element in chained statement", start, end, False))
+        elif commas and keyword in CHAIN_KEYWORDS and tokens[0].kind == WORD and code_offset(tokens[0]) >= 0:
+            issues.append(ValidationIssue("chain", f"{keyword} list is missing its colon", start, end, True))
+            edits.append((code_offset(tokens[0]) + len(tokens[0].text), 0, ":"))
+
+        # Block balance
+        if keyword in CLOSERS:
+            if opened and opened[-1][0] == keyword:
+                opened.pop()
+            elif not opened and stack and stack[-1] == keyword:
+                stack.pop()
+            elif not opened and (prefix_cut or not stack) and keyword not in stack:
+                if not prefix_cut:
+                    issues.append(ValidationIssue("block", f"{keyword} without matching {CLOSERS[keyword]}", start, end, False))
+            else:
+                expected = opened[-1][0] if opened else stack[-1] if stack else CLOSERS[keyword]
+                issues.append(ValidationIssue("block", f"{keyword} found where {expected} was expected", start, end, False))
+        else:
+            closer = block_closer(statement)
+            if closer:
+                indent = tokens[0].col - (carry_last_len if tokens[0].line == carry_lines else 0)
+                opened.append((closer, max(0, indent), start))
+
+    repaired = code
+    last = statements[-1] if statements else None
+    suffix_line = suffix.split("\n", 1)[0].strip()
+    if last is not None and not last.terminated and not (suffix_line and not suffix_line.startswith('"')):
+        start, end = code_line(last.start_line), code_line(last.end_line)
+        if _is_truncated(last):
+            issues.append(ValidationIssue("termination", "Statement is truncated", start, end, False))
+        else:
+            issues.append(ValidationIssue("termination", "Statement is missing its period", start, end, True))
+            edits.append((len(code.rstrip()), 0, "."))
+
+    # Blocks the code opened must be closed by the code or right after it
+    if opened:
+        pending = [closer for closer, _, _ in opened]
+        still_open = opened[:len(opened) - _suffix_closes(suffix, pending)]
+        for closer, indent, line in reversed(still_open):
+            issues.append(ValidationIssue("block", f"Missing {closer}", line, line, True))
+
+    # Apply local repairs from the end so earlier offsets stay valid
+    for offset, length, text in sorted(edits, key=lambda e: e[0], reverse=True):
+        repaired = repaired[:offset] + text + repaired[offset + length:]
+    if opened:
+        closers = [f"{' ' * indent}{closer}." for closer, indent, _ in reversed(still_open)]
+        if closers:
+            repaired = repaired.rstrip() + "\n" + "\n".join(closers)
+
+    return ValidationResult(code, issues, repaired)
+
+
+def build_repair_prompt(fragment: str, issues: List[ValidationIssue]) -> str:
+    """Create a small prompt that asks the model to fix one faulty fragment"""
+    problems = "\n".join(f"- {issue.message}" for issue in issues)
+    return f"""You are an expert ABAP developer. This ABAP fragment has syntax problems:
+{problems}
+
+Fragment:
+{fragment}
+
+Return ONLY the corrected fragment as plain ABAP code. Do NOT include explanations, markdown or <think> tags:"""
+
+
+async def validate_and_repair(code: str, prefix: str, suffix: str,
+                              ask_model: Optional[Callable[[str], Awaitable[str]]] = None,
+                              clean: Optional[Callable[[str], str]] = None) -> str:
+    """Validate generated code and repair it locally or with a minimal model call"""
+    if not code or os.getenv("LACC_VALIDATE", "1") == "0":
+        return code
+
+    stats.increment("validation.checked")
+    result = validate_abap(code, prefix, suffix)
+    if result.valid:
+        return code
+    stats.increment("validation.failed")
+
+    if not result.needs_model:
+        stats.increment("validation.repaired_local")
+        return result.repaired_code
+    if ask_model is None:
+        stats.increment("validation.unrepaired")
+        return result.repaired_code
+
+    # Send only the lines of the faulty statements, not the whole context
+    lines = code.split("\n")
+    hard = [issue for issue in result.issues if not issue.trivial]
+    first = min(issue.start_line for issue in hard)
+    last = min(len(lines) - 1, max(issue.end_line for issue in hard))
+    fragment = "\n".join(lines[first:last + 1])
+
+    stats.increment("validation.repair_requests")
+    response = await ask_model(build_repair_prompt(fragment, hard))
+    if response and clean:
+        response = clean(response)
+    if response:
+        candidate = "\n".join(lines[:first] + response.split("\n") + lines[last + 1:])
+        retry = validate_abap(candidate, prefix, suffix)
+        if not retry.needs_model:
+            stats.increment("validation.repaired_remote")
+            return retry.repaired_code
+
+    stats.increment("validation.unrepaired")
+    return result.repaired_code
@@ -0,0 +1,202 @@
+"""
+Worker pool module for Local AI Code Completion
+
+CPU-heavy jobs (indexing, lexing, post-processing large outputs) run in a
+managed process pool so they never stall the asyncio loop that drives API
+calls. Large texts are handed to workers through shared memory or file
+offsets instead of being pickled with the job.
+"""
+import asyncio
+import functools
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .logger import logger
+
+# A reference to text a worker should read:
+#   ("text", text)                      small texts, pickled inline
+#   ("shm", name, size)                 UTF-8 bytes in a shared memory block
+#   ("file", path, offset, length)      a byte range of a file on disk
+TextRef = Tuple[Any, ...]
+
+
+def read_text(ref: TextRef) -> str:
+    """Resolve a text reference inside a worker process"""
+    kind = ref[0]
+    if kind == "text":
+        return ref[1]
+    if kind == "shm":
+        _, name, size = ref
+        block = shared_memory.SharedMemory(name=name)
+        try:
+            return bytes(block.buf[:size]).decode("utf-8")
+        finally:
+            block.close()
+    if kind == "file":
+        _, path, offset, length = ref
+        with open(path, "rb") as f:
+            f.seek(offset)
+            data = f.read(length) if length >= 0 else f.read()
+        return data.decode("utf-8", errors="replace")
+    raise ValueError(f"Unknown text reference: {kind}")
+
+
+def file_ref(path: str, offset: int = 0, length: int = -1) -> TextRef:
+    """Reference a byte range of a file so workers read it themselves"""
+    return ("file", os.path.abspath(path), offset, length)
+
+
+async def run_in_thread(func: Callable, *args) -> Any:
+    """Run a blocking function in the loop's default thread pool (asyncio.to_thread needs Python 3.9)"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(func, *args))
+
+
+class SharedText:
+    """Places a large string in shared memory for the lifetime of a job"""
+
+    def __init__(self, text: str):
+        data = text.encode("utf-8")
+        # Zero-sized blocks are not allowed
+        self._block = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+        self._block.buf[:len(data)] = data
+        self.size = len(data)
+
+    def ref(self) -> TextRef:
+        return ("shm", self._block.name, self.size)
+
+    def close(self):
+        """Release the shared memory block"""
+        try:
+            self._block.close()
+            self._block.unlink()
+        except Exception:
+            pass
+
+    def __enter__(self) -> "SharedText":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class WorkerPool:
+    """Managed process pool for CPU-bound backend jobs"""
+
+    def __init__(self, size: Optional[int] = None):
+        if size is None:
+            default = max(1, min(4, (os.cpu_count() or 2) - 1))
+            size = int(os.getenv("LACC_WORKER_PROCESSES", str(default)))
+        self.size = max(0, size)
+        # Texts at least this large go through shared memory instead of pickling
+        self.shared_memory_threshold = int(os.getenv("LACC_SHARED_MEMORY_THRESHOLD", str(256 * 1024)))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._started = False
+        self.jobs_submitted = 0
+
+    @property
+    def started(self) -> bool:
+        return self._started
+
+    def start(self):
+        """Enable offloading; worker processes are spawned on first use"""
+        self._started = True
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.size == 0:
+            return None
+        if self._executor is None:
+            # spawn instead of fork: the logger and config watcher run threads
+            # whose locks must not be copied into a child mid-operation
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.size,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+            logger.info(f"Started worker pool with {self.size} processes")
+        return self._executor
+
+    async def run(self, func: Callable, *args) -> Any:
+        """Run a picklable function off the event loop"""
+        self.jobs_submitted += 1
+        executor = self._get_executor() if self._started else None
+        if executor is None:
+            # Not serving (one-shot CLI) or pool disabled: use a thread so the
+            # loop still stays free without paying for process startup
+            return await run_in_thread(func, *args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, func, *args)
+
+    async def run_text_job(self, func: Callable, text: str, *args) -> Any:
+        """Run func(text_ref, *args), passing large texts through shared memory"""
+        if not self._started or self.size == 0 or len(text) < self.shared_memory_threshold:
+            return await self.run(func, ("text", text), *args)
+        with SharedText(text) as shared:
+            return await self.run(func, shared.ref(), *args)
+
+    def describe(self) -> Dict[str, Any]:
+        """Pool state for the stats report"""
+        return {
+            "size": self.size,
+            "started": self._started,
+            "jobs_submitted": self.jobs_submitted,
+        }
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        executor, self._executor = self._executor, None
+        self._started = False
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+
+class LoopLagMonitor:
+    """Measures event loop lag by timing a periodic sleep"""
+
+    def __init__(self, interval: float = 0.05, max_samples: int = 2048):
+        self.interval = interval
+        self.max_samples = max_samples
+        self._samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = time.perf_counter() - started - self.interval
+            self._samples.append(max(0.0, lag))
+            if len(self._samples) > self.max_samples:
+                del self._samples[:len(self._samples) - self.max_samples]
+
+    def start(self):
+        """Start sampling on the running loop"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def summary(self) -> Dict[str, float]:
+        """Loop lag percentiles in milliseconds"""
+        if not self._samples:
+            return {"samples": 0, "p50_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+        ordered = sorted(self._samples)
+
+        def percentile(p: float) -> float:
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 2)
+
+        return {
+            "samples": len(ordered),
+            "p50_ms": percentile(0.50),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(ordered[-1] * 1000, 2),
+        }
+
+
+# Global worker pool instance
+worker_pool = WorkerPool()
@@ -6,19 +6,35 @@ import sys
 import os
 import json
 import asyncio
+import socket
+import tempfile
+from contextlib import nullcontext
 from pathlib import Path
 
 # Add the local_ai_code_completion package to the path
 sys.path.insert(0, os.path.dirname(__file__))
 
-# Check for groq availability
-try:
-    import groq
-    GROQ_AVAILABLE = True
-except Exception:
-    GROQ_AVAILABLE = False
-    print("Warning: groq package not available. Please install dependencies.")
+# The memory report needs allocations traced from the first import on
+if sys.argv[1:2] == ["memory"] or os.getenv("LACC_TRACEMALLOC") == "1":
+    import tracemalloc
+    tracemalloc.start()
+
+# Profiling starts before the imports below so their cost shows up as well
+_profiler = None
+if "--profile" in sys.argv or os.getenv("LACC_PROFILE") == "1":
+    if "--profile" in sys.argv:
+        sys.argv.remove("--profile")
+    import cProfile
+    _profiler = cProfile.Profile()
+    _profiler.enable()
+
+# A replay must not touch the caches and stats of real use; the stats, router
+# and governor below load theirs from the cache directory on import
+if sys.argv[1:2] == ["replay"]:
+    os.environ["LACC_CACHE_DIR"] = tempfile.mkdtemp(prefix="lacc-replay-")
 
+# Everything except command results goes to stderr: the extension reads
+# stdout as the completion / command output.
 
 # Try importing the packaged Python backend. It's possible the packaged files
 # are malformed (e.g. bad edits to logger.py) which can raise any exception
@@ -28,8 +44,8 @@ try:
     from local_ai_code_completion import config, logger, setup, ai_completion
 except Exception as e:
     # Import failed (could be ImportError, NameError, SyntaxError, etc.)
-    print(f"Warning: could not load backend modules ({type(e).__name__}): {e}")
-    print("Falling back to safe defaults. Please reinstall or update the extension to fully enable features.")
+    print(f"Warning: could not load backend modules ({type(e).__name__}): {e}", file=sys.stderr)
+    print("Falling back to safe defaults. Please reinstall or update the extension to fully enable features.", file=sys.stderr)
 
     # --- Fallback / dummy implementations ---
     class _DummyModelConfig:
@@ -48,27 +64,27 @@ except Exception as e:
     class _DummyLogger:
         def info(self, *args, **kwargs):
             try:
-                print("INFO:", *args)
+                print("INFO:", *args, file=sys.stderr)
             except Exception:
                 pass
         def debug(self, *args, **kwargs):
             try:
-                print("DEBUG:", *args)
+                print("DEBUG:", *args, file=sys.stderr)
             except Exception:
                 pass
         def warning(self, *args, **kwargs):
             try:
-                print("WARN:", *args)
+                print("WARN:", *args, file=sys.stderr)
             except Exception:
                 pass
         def error(self, *args, **kwargs):
             try:
-                print("ERROR:", *args)
+                print("ERROR:", *args, file=sys.stderr)
             except Exception:
                 pass
         def critical(self, *args, **kwargs):
             try:
-                print("CRITICAL:", *args)
+                print("CRITICAL:", *args, file=sys.stderr)
             except Exception:
                 pass
         def dispose(self):
@@ -78,7 +94,7 @@ except Exception as e:
         return False
 
     class _DummyAICompletion:
-        async def generate_code_with_prompt(self, prompt: str):
+        async def generate_code_with_prompt(self, prompt: str, token=None, mode="code", overlap=None):
             raise RuntimeError("AI completion backend not available in this installation")
 
     # Assign fallbacks
@@ -87,14 +103,149 @@ except Exception as e:
     setup = type("_S", (), {"setup": staticmethod(_dummy_setup)})
     ai_completion = _DummyAICompletion()
 
+# Check for groq availability
+try:
+    import groq
+    GROQ_AVAILABLE = True
+except Exception:
+    GROQ_AVAILABLE = False
+    logger.warning("groq package not available. Please install dependencies.")
+
+def _unavailable(name, error):
+    logger.warning(f"Could not load {name} ({type(error).__name__}): {error}")
+
+
+# Backend caches and counters only need the standard library, so they stay
+# available even when the AI dependencies above are missing. Each subsystem
+# is loaded on its own: a broken one only turns off its own feature.
+try:
+    from local_ai_code_completion.stats import stats
+except Exception as e:
+    _unavailable("counters", e)
+    stats = None
+
+try:
+    from local_ai_code_completion.continuation import continuation_cache
+except Exception as e:
+    _unavailable("continuation cache", e)
+    continuation_cache = None
+
+try:
+    from local_ai_code_completion.workers import worker_pool, read_text
+except Exception as e:
+    _unavailable("worker pool", e)
+    worker_pool = read_text = None
+
+try:
+    from local_ai_code_completion.validator import validate_and_repair
+except Exception as e:
+    _unavailable("validator", e)
+    validate_and_repair = None
+
+try:
+    from local_ai_code_completion.providers import provider_name
+except Exception as e:
+    _unavailable("providers", e)
+    provider_name = None
+
+try:
+    from local_ai_code_completion.router import router
+except Exception as e:
+    _unavailable("router", e)
+    router = None
+
+try:
+    from local_ai_code_completion.reasoning import strip_think
+except Exception as e:
+    _unavailable("reasoning filter", e)
+    strip_think = None
+
+try:
+    from local_ai_code_completion.digests import digest_cache
+except Exception as e:
+    _unavailable("digests", e)
+    digest_cache = None
+
+try:
+    from local_ai_code_completion.ddic import ddic_index, format_table
+except Exception as e:
+    _unavailable("DDIC index", e)
+    ddic_index = format_table = None
+
+try:
+    from local_ai_code_completion.minifier import context_minifier
+except Exception as e:
+    _unavailable("minifier", e)
+    context_minifier = None
+
+try:
+    from local_ai_code_completion.governor import governor, trim_context
+except Exception as e:
+    _unavailable("governor", e)
+    governor = trim_context = None
+
+try:
+    from local_ai_code_completion.overlap import OverlapDetector
+except Exception as e:
+    _unavailable("overlap detection", e)
+    OverlapDetector = None
+
+try:
+    from local_ai_code_completion.debug_templates import debug_templates
+except Exception as e:
+    _unavailable("debug templates", e)
+    debug_templates = None
+
+try:
+    from local_ai_code_completion.scheduler import BACKGROUND, CancellationToken, scheduler
+except Exception as e:
+    _unavailable("scheduler", e)
+    BACKGROUND = CancellationToken = scheduler = None
+
+try:
+    from local_ai_code_completion.profiling import section, start_profiling
+except Exception as e:
+    _unavailable("profiling", e)
+    start_profiling = None
+
+    def section(name):
+        return lambda func: func
+
+try:
+    from local_ai_code_completion.tracing import tracer
+except Exception as e:
+    _unavailable("tracing", e)
+    tracer = None
+
+try:
+    from local_ai_code_completion.candidates import (
+        CandidateRace, alternatives_cache, candidate_count, candidate_temperatures, request_key
+    )
+except Exception as e:
+    _unavailable("candidates", e)
+    CandidateRace = alternatives_cache = candidate_count = candidate_temperatures = request_key = None
+
+# Outputs at least this large are cleaned in a worker instead of on the event loop
+OFFLOAD_THRESHOLD = int(os.getenv("LACC_OFFLOAD_THRESHOLD", str(64 * 1024)))
+# Seconds losing candidates may keep streaming to become alternatives (serve mode)
+CANDIDATE_GRACE = float(os.getenv("LACC_CANDIDATE_GRACE", "2"))
+# Share of a request's time budget that context selection (digests, DDIC) may use
+CONTEXT_BUDGET_SHARE = 0.25
+# Seconds a remote repair of generated code needs at least; with less left only local repairs run
+REPAIR_MIN_SECONDS = 2.0
+# Background tasks that must not be garbage collected while running
+_background_tasks = set()
+
 
 def main():
     """Main entry point for the VS Code extension backend"""
     if len(sys.argv) < 2:
-        print("Usage: python main.py <command> [args...]")
+        print("Usage: python main.py <command> [args...]", file=sys.stderr)
         sys.exit(1)
     
     command = sys.argv[1]
+    if _profiler is not None and start_profiling:
+        start_profiling(command, _profiler)
     
     try:
         if command == "generate":
@@ -105,15 +256,28 @@ def main():
             handle_config()
         elif command == "env_check":
             handle_env_check()
+        elif command == "stats":
+            handle_stats()
+        elif command == "serve":
+            handle_serve()
+        elif command == "memory":
+            handle_memory()
+        elif command == "bench":
+            handle_bench()
+        elif command == "ddic":
+            handle_ddic()
+        elif command == "replay":
+            handle_replay()
         else:
-            print(f"Unknown command: {command}")
-            print("Available commands: generate, setup, config, env_check")
+            logger.error(f"Unknown command: {command}")
+            logger.error("Available commands: generate, setup, config, env_check, stats, serve, memory, bench, ddic, "
+                         "replay")
             sys.exit(1)
     except Exception as e:
         try:
             logger.error(f"Error in command '{command}': {e}")
         except Exception:
-            print(f"Error in command '{command}': {e}")
+            print(f"Error in command '{command}': {e}", file=sys.stderr)
         sys.exit(1)
 
 
@@ -128,46 +292,232 @@ def handle_generate():
     mode = os.getenv("LACC_MODE", "code")
     
     if not prefix and not suffix and not comment:
-        print("Error: No context provided for generation")
+        logger.error("No context provided for generation")
         sys.exit(1)
     
     # Run generation
     async def generate():
         try:
-            # Use the global AI completion instance
-            completion = ai_completion
+            token = CancellationToken(timeout=request_timeout()) if CancellationToken else None
+            with tracer.request("cli", mode, prefix, suffix, comment, document=file_path,
+                                timeout_ms=round(request_timeout() * 1000)) if tracer else nullcontext() as trace:
+                cleaned_result = await generate_completion(prefix, suffix, comment, file_path, mode, 0, token)
+                truncated = token is not None and token.truncated
+                if trace:
+                    tracer.result(trace, cleaned_result, truncated)
+            if truncated:
+                logger.warning("Completion truncated at the request deadline")
             
-            # Create ABAP-specific prompt based on mode
-            if mode == "debug":
-                prompt = create_abap_debug_prompt(prefix, suffix)
-            elif mode == "comment":
-                prompt = create_abap_comment_prompt(prefix, suffix, comment)
-            else:
-                prompt = create_abap_code_prompt(prefix, suffix)
-            
-            # Generate code
-            result = await completion.generate_code_with_prompt(prompt)
-            
-            if result:
-                # Clean up the result to remove any markdown formatting or comments
-                cleaned_result = clean_abap_output(result)
+            if cleaned_result:
                 print(cleaned_result)
             else:
-                print("No completion generated")
+                # Print nothing: anything on stdout would be inserted as code
+                logger.warning("No completion generated")
                 
         except Exception as e:
             logger.error(f"Generation error: {e}")
-            print(f"Error: {e}")
             sys.exit(1)
     
     asyncio.run(generate())
 
 
-def create_abap_code_prompt(prefix, suffix):
+def request_timeout():
+    """Seconds a generate request may take (LACC_TIMEOUT, in milliseconds; 0 = no limit)"""
+    try:
+        return config.get_model_config().timeout / 1000
+    except Exception:
+        return 15.0
+
+
+async def within_budget(coroutine, token, stage, default=""):
+    """Await a context stage, giving up on it when it would eat into the time for the API call"""
+    remaining = token.remaining() if token is not None else None
+    if remaining is None:
+        return await coroutine
+    task = asyncio.ensure_future(coroutine)
+    try:
+        # Shielded: an abandoned stage still finishes and fills its cache for later requests
+        return await asyncio.wait_for(asyncio.shield(task), remaining * CONTEXT_BUDGET_SHARE)
+    except asyncio.TimeoutError:
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+        if stats:
+            stats.increment(f"deadline.skipped_{stage}")
+        logger.info(f"Skipped {stage} context to stay within the request deadline")
+        return default
+
+
+async def generate_completion(prefix, suffix, comment="", file_path="", mode="code", candidates=0, token=None):
+    """Generate cleaned ABAP code for one request (used by the CLI and the server)"""
+    # Past the token's deadline each stage returns what it has; token.truncated marks a partial answer
+    # Plain debug requests get the standard instrumentation without an API call;
+    # a comment asks for more than the templates offer
+    if debug_templates and mode == "debug":
+        instrumentation = debug_templates.instrument(prefix, comment)
+        if instrumentation:
+            return instrumentation
+    
+    # Serve the rest of a recent completion the user kept only the start of, without an API call
+    if continuation_cache and mode in ("code", "debug"):
+        remainder = continuation_cache.lookup(file_path, mode, prefix, suffix)
+        if remainder:
+            return remainder
+    
+    # Near the token quota the context shrinks before anything else degrades
+    plan = None
+    if governor and provider_name:
+        model_config = config.get_model_config()
+        plan = governor.plan(provider_name(model_config, mode), model_config)
+    
+    # Digests of the includes and classes this code refers to, not their full source
+    related = ""
+    if digest_cache and file_path and (plan is None or plan.include_related):
+        related = await within_budget(
+            digest_cache.context_for(file_path, prefix + suffix, worker_pool.run if worker_pool else None),
+            token, "digests"
+        )
+    
+    # Key fields of the tables the code selects from, so the model doesn't guess columns
+    dictionary = ""
+    if ddic_index and ddic_index.enabled:
+        await within_budget(prepare_ddic(), token, "ddic", None)
+        dictionary = ddic_index.context_for(prefix, suffix)
+    
+    # Drop comments and whitespace away from the cursor; validation still sees the original context
+    context_prefix, context_suffix = prefix, suffix
+    if context_minifier:
+        context_prefix, context_suffix = context_minifier.minify(prefix, suffix)
+    if plan and plan.context_chars:
+        context_prefix, context_suffix = trim_context(context_prefix, context_suffix, plan.context_chars)
+    
+    # Create ABAP-specific prompt based on mode
+    if mode == "debug":
+        prompt = create_abap_debug_prompt(context_prefix, context_suffix, related, comment, dictionary)
+    elif mode == "comment":
+        prompt = create_abap_comment_prompt(context_prefix, context_suffix, comment, related, dictionary)
+    else:
+        prompt = create_abap_code_prompt(context_prefix, context_suffix, related, dictionary)
+    
+    count = candidate_count(mode, candidates) if CandidateRace else 1
+    if count > 1:
+        cleaned_result = await race_candidates(prompt, count, prefix, suffix, comment, file_path, mode, token)
+        if not cleaned_result:
+            return ""
+    else:
+        # Generate code using the global AI completion instance; the stream ends once it copies the suffix
+        if OverlapDetector:
+            result = await ai_completion.generate_code_with_prompt(prompt, token, mode, OverlapDetector(prefix, suffix))
+        else:
+            result = await ai_completion.generate_code_with_prompt(prompt, token, mode)
+        if not result:
+            return ""
+        
+        # Clean up the result to remove any markdown formatting or comments
+        if worker_pool and worker_pool.started and len(result) >= OFFLOAD_THRESHOLD:
+            cleaned_result = await worker_pool.run_text_job(_clean_output_job, result)
+        else:
+            cleaned_result = clean_abap_output(result)
+    
+    # Catch unbalanced blocks, missing periods and broken chains before showing the code
+    if validate_and_repair:
+        truncated = token is not None and token.truncated
+        remaining = token.remaining() if token is not None else None
+        ask_model = None
+        if not truncated and (remaining is None or remaining >= REPAIR_MIN_SECONDS):
+            ask_model = lambda repair_prompt: ai_completion.generate_code_with_prompt(repair_prompt, token, mode)
+        elif stats:
+            stats.increment("deadline.repair_skipped")
+        cleaned_result = await validate_and_repair(cleaned_result, prefix, suffix, ask_model, clean_abap_output)
+        if token is not None:
+            # A repair cut short falls back to the local fix; the answer itself was complete
+            token.truncated = truncated
+    if token is not None and token.truncated:
+        return cleaned_result
+    if continuation_cache and mode in ("code", "debug"):
+        continuation_cache.record(file_path, mode, prefix, suffix, cleaned_result)
+    return cleaned_result
+
+
+async def race_candidates(prompt, count, prefix, suffix, comment, file_path, mode, token=None):
+    """Generate several candidates concurrently and return the first valid one"""
+    model_config = getattr(ai_completion, "model_config", None)
+    base_temperature = model_config.temperature if model_config else 0.3
+    race = CandidateRace(
+        lambda temperature: ai_completion.stream_code_with_prompt(
+            prompt, temperature=temperature, token=token, mode=mode,
+            overlap=OverlapDetector(prefix, suffix) if OverlapDetector else None
+        ),
+        clean_abap_output, prefix, suffix, CANDIDATE_GRACE
+    )
+    winner = await race.run(candidate_temperatures(base_temperature, count))
+    if not winner:
+        return ""
+    
+    # The context as generate resolved it, so the server's alternatives lookup finds it
+    key = request_key(file_path, mode, prefix, suffix, comment)
+    
+    async def keep_alternatives():
+        await race.settle()
+        alternatives_cache.store(key, winner, race.alternatives(winner))
+    
+    if race.grace > 0:
+        # Return now; the losing candidates finish in the background
+        task = asyncio.create_task(keep_alternatives())
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+    else:
+        alternatives_cache.store(key, winner, race.alternatives(winner))
+    return winner
+
+
+def related_section(related):
+    """Prompt section with digests of related files"""
+    if not related:
+        return ""
+    return f"""Related files (summaries):
+{related}
+
+"""
+
+
+def dictionary_section(dictionary):
+    """Prompt section with DDIC definitions of referenced tables"""
+    if not dictionary:
+        return ""
+    return f"""Dictionary definitions (key fields and fields used):
+{dictionary}
+
+"""
+
+
+async def prepare_ddic():
+    """Map the DDIC index, building it off the event loop when the export changed"""
+    if ddic_index and ddic_index.enabled:
+        await ddic_index.prepare(worker_pool.run if worker_pool else None)
+
+
+async def prepare_digests(file_path, text):
+    """Background job: digest the files a document refers to, then refine them at low priority"""
+    if not digest_cache or not digest_cache.enabled or not file_path:
+        return
+    paths = digest_cache.related_files(file_path, text)
+    await digest_cache.digest_files(paths, worker_pool.run if worker_pool else None)
+    if digest_cache.refine_enabled and scheduler and digest_cache.pending_refinement():
+        await scheduler.submit(
+            lambda token: digest_cache.refine(
+                lambda prompt: ai_completion.generate_code_with_prompt(prompt, token, "comment")
+            ),
+            priority=BACKGROUND,
+            debounce=0
+        )
+
+
+@section("prompt_build")
+def create_abap_code_prompt(prefix, suffix, related="", dictionary=""):
     """Create ABAP-specific code generation prompt"""
     return f"""You are an expert ABAP developer. Generate ABAP code that follows SAP best practices.
 
-Context before cursor:
+{related_section(related)}{dictionary_section(dictionary)}Context before cursor:
 {prefix}
 
 Context after cursor:
@@ -184,11 +534,12 @@ Generate ABAP code that:
 CRITICAL: Generate ONLY the ABAP code implementation. Do NOT include any thinking, reasoning, explanations, or markdown formatting. Output ONLY the pure ABAP code. Start directly with the ABAP code:"""
 
 
-def create_abap_comment_prompt(prefix, suffix, comment):
+@section("prompt_build")
+def create_abap_comment_prompt(prefix, suffix, comment, related="", dictionary=""):
     """Create ABAP-specific comment-based code generation prompt"""
     return f"""You are an expert ABAP developer. Generate ABAP code based on the provided comment and context.
 
-Context before the comment:
+{related_section(related)}{dictionary_section(dictionary)}Context before the comment:
 {prefix}
 
 Comment to implement:
@@ -209,11 +560,16 @@ Generate ABAP code that:
 CRITICAL: Generate ONLY the ABAP code implementation. Do NOT include any thinking, reasoning, explanations, or markdown formatting. Output ONLY the pure ABAP code that implements the comment. Start directly with the ABAP code. Do NOT include <think> tags or any other formatting:"""
 
 
-def create_abap_debug_prompt(prefix, suffix):
+@section("prompt_build")
+def create_abap_debug_prompt(prefix, suffix, related="", request="", dictionary=""):
     """Create ABAP-specific debug code generation prompt"""
+    request_section = f"""What to debug:
+{request}
+
+""" if request else ""
     return f"""You are an expert ABAP developer. Generate ABAP debug code that follows SAP debugging best practices.
 
-Context before cursor:
+{related_section(related)}{dictionary_section(dictionary)}{request_section}Context before cursor:
 {prefix}
 
 Context after cursor:
@@ -238,31 +594,40 @@ Common ABAP debug patterns to include:
 CRITICAL: Generate ONLY the ABAP debug code implementation. Do NOT include any thinking, reasoning, explanations, or markdown formatting. Output ONLY the pure ABAP debug code. Start directly with the ABAP code:"""
 
 
+@section("clean_output")
 def clean_abap_output(text):
     """Clean up ABAP output to remove markdown formatting and comments"""
     if not text:
         return text
     
+    # Drop whole reasoning blocks, not just the lines holding the tags
+    if strip_think:
+        text, _ = strip_think(text)
+    
     # Remove markdown code blocks
     lines = text.split('\n')
     cleaned_lines = []
     
     in_code_block = False
-    for line in lines:
+    # Index of the last non-blank line; blank lines after it are dropped
+    last_content = max((i for i, line in enumerate(lines) if line.strip()), default=-1)
+    for index, line in enumerate(lines):
+        stripped = line.strip()
+        
         # Skip markdown code block markers
-        if line.strip().startswith('```'):
+        if stripped.startswith('```'):
             continue
         
         # Skip comment lines that start with # (markdown comments)
-        if line.strip().startswith('#'):
+        if stripped.startswith('#'):
             continue
         
         # Skip thinking tags
-        if line.strip().startswith('<think>') or line.strip().startswith('</think>'):
+        if stripped.startswith('<think>') or stripped.startswith('</think>'):
             continue
         
         # Skip empty lines at the beginning and end
-        if not line.strip() and (not cleaned_lines or all(not l.strip() for l in lines[lines.index(line):])):
+        if not stripped and (not cleaned_lines or index > last_content):
             continue
             
         cleaned_lines.append(line)
@@ -273,6 +638,11 @@ def clean_abap_output(text):
     return result
 
 
+def _clean_output_job(text_ref):
+    """Worker pool job: clean a large model output"""
+    return clean_abap_output(read_text(text_ref))
+
+
 def handle_setup():
     """Handle setup command"""
     async def setup_groq():
@@ -280,21 +650,26 @@ def handle_setup():
             # Get API key from VS Code settings
             api_key = os.getenv("GROQ_API_KEY", "")
             
-            if not api_key:
-                print("Error: No API key provided")
-                sys.exit(1)
+            # A local model server needs neither the groq package nor a key
+            uses_groq = not (provider_name and config and hasattr(config, 'get_model_config')
+                             and provider_name(config.get_model_config(), "code") == "local")
             
             # Check if dependencies are available
-            if not GROQ_AVAILABLE:
-                print("Error: groq package not available. Please install dependencies first.")
-                print("The extension will attempt to install dependencies automatically.")
+            if uses_groq and not GROQ_AVAILABLE:
+                logger.error("groq package not available. Please install dependencies first.")
+                logger.error("The extension will attempt to install dependencies automatically.")
+                sys.exit(1)
+            
+            if uses_groq and not api_key:
+                logger.error("No API key provided")
                 sys.exit(1)
             
             # Update configuration if available
-            if config and hasattr(config, 'model'):
-                config.model.api_key = api_key
-            else:
-                print("Warning: Could not update configuration, but continuing...")
+            if api_key:
+                if config and hasattr(config, 'update_model'):
+                    config.update_model(api_key=api_key)
+                else:
+                    logger.warning("Could not update configuration, but continuing...")
             
             # Run setup if available
             if setup:
@@ -303,15 +678,15 @@ def handle_setup():
                 if success:
                     print("Setup completed successfully")
                 else:
-                    print("Setup failed")
+                    logger.error("Setup failed")
                     sys.exit(1)
             else:
-                print("Warning: Setup module not available, but API key is set")
+                logger.warning("Setup module not available, but API key is set")
                 print("Setup completed successfully")
                 
         except Exception as e:
-            print(f"Setup error: {e}")
-            print("Please check your API key and try again.")
+            logger.error(f"Setup error: {e}")
+            logger.error("Please check your API key and try again.")
             sys.exit(1)
     
     asyncio.run(setup_groq())
@@ -323,47 +698,189 @@ def handle_config():
         # Get API key from environment variable (passed by VS Code extension)
         api_key = os.getenv("GROQ_API_KEY", "")
         
-        # Check if config is available
-        if config and hasattr(config, 'get_model_config'):
-            model_config = config.get_model_config()
-            
-            config_data = {
-                "model": model_config.name,
-                "temperature": model_config.temperature,
-                "top_p": model_config.top_p,
-                "timeout": model_config.timeout,
-                "api_key": "***" if api_key else "Not set",
-                "base_url": model_config.base_url,
-                "language": "ABAP",
-                "features": ["code_generation", "debug_generation", "syntax_highlighting"]
-            }
-        else:
-            # Fallback configuration
-            config_data = {
-                "model": "llama-3.3-70b-versatile",
-                "temperature": 0.3,
-                "top_p": 0.3,
-                "timeout": 15000,
-                "api_key": "***" if api_key else "Not set",
-                "base_url": "https://api.groq.com",
-                "language": "ABAP",
-                "features": ["code_generation", "debug_generation", "syntax_highlighting"],
-                "note": "Dependencies not fully loaded"
-            }
+        print(json.dumps(get_config_data(api_key), indent=2))
         
-        print(json.dumps(config_data, indent=2))
+    except Exception as e:
+        logger.error(f"Config error: {e}")
+        logger.error("Please check your setup and try again.")
+        sys.exit(1)
+
+
+def get_config_data(api_key=""):
+    """Build the configuration report (used by the CLI and the server)"""
+    # Check if config is available
+    if config and hasattr(config, 'get_model_config'):
+        model_config = config.get_model_config()
         
+        config_data = {
+            "model": model_config.name,
+            "temperature": model_config.temperature,
+            "top_p": model_config.top_p,
+            "timeout": model_config.timeout,
+            "api_key": "***" if api_key or model_config.api_key else "Not set",
+            "base_url": model_config.base_url,
+            "language": "ABAP",
+            "features": ["code_generation", "debug_generation", "syntax_highlighting"]
+        }
+        if provider_name:
+            config_data["providers"] = {mode: provider_name(model_config, mode) for mode in ("code", "comment", "debug")}
+            config_data["local_base_url"] = getattr(model_config, "local_base_url", "")
+            config_data["local_model"] = getattr(model_config, "local_model", "")
+        if router:
+            config_data["router"] = router.describe(model_config)
+        if governor:
+            config_data["governor"] = governor.describe()
+        if hasattr(config, 'snapshot'):
+            snapshot = config.snapshot()
+            config_data["config_version"] = snapshot.version
+            config_data["config_sources"] = [path for path, _ in snapshot.sources]
+    else:
+        # Fallback configuration
+        config_data = {
+            "model": "llama-3.3-70b-versatile",
+            "temperature": 0.3,
+            "top_p": 0.3,
+            "timeout": 15000,
+            "api_key": "***" if api_key else "Not set",
+            "base_url": "https://api.groq.com",
+            "language": "ABAP",
+            "features": ["code_generation", "debug_generation", "syntax_highlighting"],
+            "note": "Dependencies not fully loaded"
+        }
+    return config_data
+
+def handle_stats():
+    """Handle backend statistics command"""
+    if not stats:
+        logger.error("Backend statistics not available")
+        sys.exit(1)
+    
+    if len(sys.argv) > 2 and sys.argv[2] == "reset":
+        stats.reset()
+        print("Statistics reset")
+        return
+    
+    print(json.dumps(stats.report(), indent=2))
+
+
+def handle_memory():
+    """Handle memory report command"""
+    try:
+        from local_ai_code_completion.memory import memory_accountant, tracemalloc_report
+    except Exception as e:
+        logger.error(f"Memory accounting not available: {e}")
+        sys.exit(1)
+    
+    print(json.dumps({
+        "accountant": memory_accountant.report(),
+        "tracemalloc": tracemalloc_report()
+    }, indent=2))
+
+
+def handle_bench():
+    """Handle provider benchmark command: bench [provider] [runs] [mode...]"""
+    try:
+        from local_ai_code_completion.bench import run_benchmark
+        model_config = config.get_model_config()
+    except Exception as e:
+        logger.error(f"Benchmark not available: {e}")
+        sys.exit(1)
+    
+    provider = sys.argv[2] if len(sys.argv) > 2 else provider_name(model_config, "code")
+    runs = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+    modes = sys.argv[4:] or None
+    print(json.dumps(run_benchmark(model_config, provider, runs, modes), indent=2))
+
+
+def handle_ddic():
+    """Handle DDIC index command: ddic [table...] builds the index and shows it or the given tables"""
+    if not ddic_index or not ddic_index.enabled:
+        logger.error("No DDIC export configured (set LACC_DDIC_FILE)")
+        sys.exit(1)
+    asyncio.run(prepare_ddic())
+    names = sys.argv[2:]
+    if not names:
+        print(json.dumps(ddic_index.describe(), indent=2))
+        return
+    for name in names:
+        record = ddic_index.lookup(name)
+        print(format_table(name.upper(), record, set()) if record else f"{name.upper()}: not found")
+
+
+def handle_replay():
+    """Handle trace replay command: replay <trace.jsonl> [--speed N] [--output report.json] [--compare report.json]"""
+    try:
+        import server
+        from local_ai_code_completion.replay import StandInServer, compare_reports, replay
+        from local_ai_code_completion.tracing import load_trace
     except Exception as e:
-        print(f"Config error: {e}")
-        print("Please check your setup and try again.")
+        logger.error(f"Replay not available: {e}")
         sys.exit(1)
+    args = sys.argv[2:]
+    if not args or args[0].startswith("--"):
+        logger.error("Usage: python main.py replay <trace.jsonl> [--speed N] [--output report.json] "
+                     "[--compare report.json]")
+        sys.exit(1)
+
+    def option(name, default=None):
+        return args[args.index(name) + 1] if name in args and args.index(name) + 1 < len(args) else default
+
+    records = load_trace(Path(args[0]).expanduser())
+    if not records:
+        logger.error(f"No trace records in {args[0]}")
+        sys.exit(1)
+    try:
+        speed = float(option("--speed", "1"))
+    except ValueError:
+        speed = 0.0
+    if speed <= 0:
+        logger.error(f"--speed must be a number above 0, got {option('--speed')}")
+        sys.exit(1)
+    # The replay must not record itself; its cache directory was set before the imports
+    tracer.enabled = False
+    stand_in = StandInServer(records)
+    stand_in.start()
+    config.update_model(provider="local", provider_code="", provider_comment="", provider_debug="",
+                        local_base_url=stand_in.url, local_model="replay", local_api_key="")
+    backend_server = server.BackendServer(sys.modules[__name__])
+    try:
+        report = asyncio.run(replay(records, backend_server.handle_request, speed))
+    finally:
+        stand_in.stop()
+    report["trace"] = args[0]
+    report["upstream"] = dict(stand_in.counters)
+    if option("--compare"):
+        with open(option("--compare"), encoding="utf-8") as f:
+            report["compare"] = compare_reports(json.load(f), report)
+    if option("--output"):
+        with open(option("--output"), "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+def handle_serve():
+    """Handle long-running backend server command: serve [--socket [path]]"""
+    # Imported lazily: one-shot commands don't need the server machinery
+    import server
+    backend_server = server.BackendServer(sys.modules[__name__])
+    if "--socket" not in sys.argv[2:]:
+        asyncio.run(backend_server.serve_stdio())
+        return
+    if not hasattr(socket, "AF_UNIX"):
+        logger.error("Unix domain sockets are not available on this platform; use 'serve' without --socket")
+        sys.exit(1)
+    index = sys.argv.index("--socket")
+    path = sys.argv[index + 1] if len(sys.argv) > index + 1 else os.getenv("LACC_SERVER_SOCKET", "")
+    asyncio.run(backend_server.serve_socket(path or None))
+
 
 def handle_env_check():
     """Handle environment check command"""
     try:
         # Import and run the environment checker
         import env_check
-        env_check.main()
+        # --json prints the cached result for this interpreter; --refresh probes again
+        env_check.main(sys.argv[2:])
     except ImportError:
         print("Environment checker not available")
         print("Please check that env_check.py exists in the python directory")
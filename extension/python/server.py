@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+"""
+Long-running backend server for ABAP AI Code Completion
+
+Started with `python main.py serve`. Speaks newline-delimited JSON on
+stdin/stdout so one process can serve many requests without paying for
+imports, config validation and client setup every time:
+
+    request:  {"id": 1, "command": "generate", "args": {"prefix": "...", "mode": "code"}}
+    response: {"id": 1, "ok": true, "result": {"completion": "...", "truncated": false}}
+    error:    {"id": 1, "ok": false, "error": "..."}
+
+Open documents are mirrored with did_open/did_change/did_close; requests
+without an id are notifications and get no response. A generate request
+for a mirrored document sends {"uri", "version", "line", "character"}
+instead of the prefix and suffix. cursor/idle notifications with the same
+fields let the backend prefetch completions at likely trigger points.
+A generate request that reaches its deadline (args timeoutMs, default
+LACC_TIMEOUT) answers with the partial output so far and "truncated": true.
+
+`python main.py serve --socket [path]` serves the same protocol to many
+clients (editor windows) on a Unix domain socket, by default backend.sock
+in the cache directory. Caches, indexes and API clients are shared; each
+connection is a session whose document mirrors, request IDs and
+cancellations are its own, and the scheduler lets sessions take turns.
+The server exits once no client was connected for LACC_SERVER_IDLE_SECONDS.
+"""
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Optional, Set
+
+from local_ai_code_completion.logger import logger
+from local_ai_code_completion.stats import stats
+from local_ai_code_completion.workers import worker_pool, LoopLagMonitor
+from local_ai_code_completion.memory import memory_accountant, tracemalloc_report
+from local_ai_code_completion.candidates import alternatives_cache, candidate_count, request_key
+from local_ai_code_completion.documents import DocumentVersionError, document_store
+from local_ai_code_completion.digests import uri_to_path
+from local_ai_code_completion.prefetch import prefetcher, trigger_point
+from local_ai_code_completion.scheduler import (
+    PRIORITIES, EXPLICIT, DeadlineExceeded, RequestCancelled, current_client, scheduler
+)
+from local_ai_code_completion.storage import get_cache_dir
+from local_ai_code_completion.tracing import tracer
+
+try:
+    from local_ai_code_completion.config import config, ConfigWatcher
+except Exception as e:
+    logger.warning(f"Config hot reload not available: {e}")
+    config = None
+    ConfigWatcher = None
+
+# Longest request line; did_open carries whole documents
+LINE_LIMIT = 64 * 1024 * 1024
+
+
+class Session:
+    """One connected client; document mirrors, request IDs and cancellations are scoped to it"""
+
+    def __init__(self, session_id: str = "", writer: Optional[asyncio.StreamWriter] = None):
+        # "" for the single stdio client, whose keys stay unscoped
+        self.id = session_id
+        self.writer = writer
+        self.documents: Set[str] = set()
+        self.lock = asyncio.Lock()
+        self.connected = True
+
+    def key(self, value: Any) -> Any:
+        """Scope a document URI or request ID to this client"""
+        if value is None or not self.id:
+            return value
+        return f"{self.id}:{value}"
+
+    async def send(self, message: Dict[str, Any]):
+        """Write one response line to the client"""
+        data = json.dumps(message) + "\n"
+        async with self.lock:
+            if self.writer is None:
+                sys.stdout.write(data)
+                sys.stdout.flush()
+                return
+            if not self.connected:
+                return
+            try:
+                self.writer.write(data.encode("utf-8"))
+                await self.writer.drain()
+            except ConnectionError:
+                self.connected = False
+
+
+# Session of the request being handled
+_session: ContextVar[Optional[Session]] = ContextVar("lacc_session", default=None)
+
+
+def default_socket_path() -> Path:
+    return get_cache_dir() / "backend.sock"
+
+
+class BackendServer:
+    """Dispatches JSON requests to the backend command handlers"""
+
+    # Handled in arrival order on the read loop so edits are never reordered
+    ORDERED_COMMANDS = {"did_open", "did_change", "did_close"}
+
+    def __init__(self, backend):
+        # The main module, providing generate_completion and get_config_data
+        self.backend = backend
+        self.watcher = ConfigWatcher(config) if ConfigWatcher and config else None
+        self.loop_lag = LoopLagMonitor()
+        self._tasks: Set[asyncio.Task] = set()
+        # Low-priority jobs (digests) that are not waited for on shutdown
+        self._background: Set[asyncio.Task] = set()
+        self._sessions: Dict[str, Session] = {}
+        self._session_ids = itertools.count(1)
+        # Seconds without clients before a socket server exits; 0 keeps it running
+        self.idle_timeout = float(os.getenv("LACC_SERVER_IDLE_SECONDS", "600"))
+        self._last_client = time.monotonic()
+        self._running = True
+
+    @staticmethod
+    def _document(uri: str) -> str:
+        """Key of a document in the shared mirrors, scheduler and prefetcher"""
+        session = _session.get()
+        return session.key(uri) if session else uri
+
+    async def cmd_generate(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Generate ABAP code; the request keeps the config snapshot it started with"""
+        # Past the deadline (timeoutMs, default LACC_TIMEOUT) the answer is the partial output, flagged "truncated"
+        timeout = float(args["timeoutMs"]) / 1000 if "timeoutMs" in args else self.backend.request_timeout()
+        deadline = time.monotonic() + timeout if timeout > 0 else None
+        prefix, suffix, comment = self._context(args)
+        mode = args.get("mode", "code")
+        with tracer.request(
+            "generate", mode, prefix, suffix, comment,
+            document=args.get("uri") or args.get("file", ""),
+            priority=args.get("priority", "explicit"),
+            debounce_ms=args.get("debounceMs"),
+            timeout_ms=round(timeout * 1000),
+            candidates=int(args.get("candidates", 0))
+        ) as trace:
+            result = await self._generate(args, prefix, suffix, comment, mode, deadline)
+            tracer.result(trace, result["completion"], result["truncated"], result.get("prefetched", False))
+        if not result.get("prefetched") and candidate_count(mode, int(args.get("candidates", 0))) > 1:
+            # The answer usually replaces its context, so later lookups can't resolve it again
+            result["alternativesKey"] = request_key(args.get("file", ""), mode, prefix, suffix, comment)
+        return result
+
+    async def _generate(self, args: Dict[str, Any], prefix: str, suffix: str, comment: str, mode: str,
+                        deadline: Optional[float]) -> Dict[str, Any]:
+        """Answer a generate request from a prefetch or a scheduled job"""
+        document = self._document(args.get("uri") or args.get("file", ""))
+        line = args["line"] if "line" in args else prefix.count("\n")
+        debounce = args.get("debounceMs")
+        if "uri" in args and mode == "code" and not comment:
+            # Usually prefetched at this trigger point a moment ago
+            try:
+                # The prefetch keeps running for a later request if this one gives up
+                completion = await asyncio.wait_for(
+                    prefetcher.take(document, request_key(args.get("file", ""), mode, prefix, suffix)),
+                    deadline - time.monotonic() if deadline is not None else None
+                )
+            except asyncio.TimeoutError:
+                return {"completion": "", "truncated": True}
+            if completion is not None:
+                return {"completion": completion, "prefetched": True, "truncated": False}
+
+        async def generate(token):
+            completion = await self.backend.generate_completion(
+                prefix,
+                suffix,
+                comment,
+                args.get("file", ""),
+                mode,
+                int(args.get("candidates", 0)),
+                token
+            )
+            return {"completion": completion, "truncated": token.truncated}
+
+        try:
+            return await scheduler.submit(
+                generate,
+                document=document,
+                line=line,
+                priority=PRIORITIES.get(args.get("priority", "explicit"), EXPLICIT),
+                request_id=args.get("requestId"),
+                debounce=float(debounce) / 1000 if debounce is not None else None,
+                timeout=max(0.001, deadline - time.monotonic()) if deadline is not None else None
+            )
+        except DeadlineExceeded:
+            # Still debouncing or queued at the deadline: nothing streamed yet
+            return {"completion": "", "truncated": True}
+
+    async def cmd_cursor(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Cursor moved in a mirrored document: prefetch at likely trigger points"""
+        try:
+            document = document_store.get(self._document(args["uri"]), args.get("version"))
+        except DocumentVersionError:
+            # Typing went on since the notification was sent
+            return {"prefetch": False}
+        line, character = int(args["line"]), int(args["character"])
+        trigger = trigger_point(*document.cursor_lines(line, character))
+        if not trigger:
+            return {"prefetch": False}
+        prefix, suffix = document.context(line, character)
+        file_path = args.get("file", "") or uri_to_path(args["uri"])
+        debounce = args.get("debounceMs")
+        trace = tracer.begin("prefetch", "code", prefix, suffix, document=args["uri"], priority="background",
+                             debounce_ms=debounce)
+        started = prefetcher.start(
+            self._document(args["uri"]),
+            line,
+            request_key(file_path, "code", prefix, suffix),
+            lambda token: tracer.run(
+                trace, self.backend.generate_completion(prefix, suffix, "", file_path, "code", 0, token)
+            ),
+            debounce=float(debounce) / 1000 if debounce is not None else None
+        )
+        return {"prefetch": started, "trigger": trigger}
+
+    async def cmd_idle(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """The user paused typing; the client already waited, so no debounce"""
+        return await self.cmd_cursor({**args, "debounceMs": args.get("debounceMs", 0)})
+
+    async def cmd_cancel(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Cancel a request by ID, or all requests for a document"""
+        if "requestId" in args:
+            return {"cancelled": int(scheduler.cancel(args["requestId"]))}
+        if "uri" in args:
+            return {"cancelled": scheduler.cancel_document(self._document(args["uri"]))}
+        session = _session.get()
+        if session and session.id:
+            # Other clients' requests are not this client's to cancel
+            return {"cancelled": scheduler.cancel_client(session.id, "cancelled")}
+        return {"cancelled": scheduler.cancel_all()}
+
+    def _context(self, args: Dict[str, Any]):
+        """Prefix, suffix and comment from the request or from the document mirror"""
+        if "uri" not in args:
+            return args.get("prefix", ""), args.get("suffix", ""), args.get("comment", "")
+        document = document_store.get(self._document(args["uri"]), args.get("version"))
+        selection = args.get("selection")
+        if selection:
+            # Comment mode: the selected comment is replaced by the generated code
+            start, end = selection["start"], selection["end"]
+            prefix, comment, suffix = document.selection(
+                start["line"], start["character"], end["line"], end["character"]
+            )
+            return prefix, suffix, comment
+        prefix, suffix = document.context(args["line"], args["character"])
+        return prefix, suffix, args.get("comment", "")
+
+    async def cmd_alternatives(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Cached candidates of an earlier multi-candidate request, the shown one first"""
+        # The key of a generate response, else the request's context resolved like generate does
+        key = args.get("key")
+        if not key:
+            prefix, suffix, comment = self._context(args)
+            key = request_key(args.get("file", ""), args.get("mode", "comment"), prefix, suffix, comment)
+        return {"alternatives": alternatives_cache.get(key)}
+
+    async def cmd_configure(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply settings sent by the extension, e.g. a changed API key"""
+        if config and args.get("apiKey"):
+            config.update_model(api_key=args["apiKey"])
+        return {"config_version": config.snapshot().version if config else 0}
+
+    async def cmd_config(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Show the current configuration"""
+        return self.backend.get_config_data(args.get("apiKey", ""))
+
+    async def cmd_stats(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Show backend statistics"""
+        stats.flush()
+        report = stats.report()
+        report["server"] = {
+            "loop_lag": self.loop_lag.summary(),
+            "worker_pool": worker_pool.describe(),
+            "in_flight": len(self._tasks),
+            "sessions": len(self._sessions),
+            "scheduler": scheduler.describe(),
+            "prefetch": prefetcher.describe(),
+        }
+        return report
+
+    async def cmd_memory(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Memory by subsystem (tracemalloc needs LACC_TRACEMALLOC=1)"""
+        memory_accountant.enforce()
+        return {
+            "accountant": memory_accountant.report(),
+            "tracemalloc": tracemalloc_report(int(args.get("limit", 10)))
+        }
+
+    async def cmd_did_open(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Start mirroring a document from its full text"""
+        key = self._document(args["uri"])
+        document = document_store.open(key, args.get("text", ""), int(args.get("version", 0)))
+        session = _session.get()
+        if session:
+            session.documents.add(key)
+        path = uri_to_path(args["uri"])
+        if path:
+            # Digest the files this document refers to before the first completion needs them
+            self._spawn_background(self.backend.prepare_digests(path, args.get("text", "")))
+        return {"version": document.version}
+
+    async def cmd_did_change(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply incremental edits: [{"range": {"start", "end"}, "text"}]"""
+        key = self._document(args["uri"])
+        document = document_store.change(key, int(args["version"]), args.get("changes", []))
+        # A prefetch for the old text is of no use any more
+        prefetcher.cancel_document(key)
+        return {"version": document.version}
+
+    async def cmd_did_close(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Stop mirroring a document"""
+        key = self._document(args["uri"])
+        session = _session.get()
+        if session:
+            session.documents.discard(key)
+        self._forget_document(key)
+        return {}
+
+    @staticmethod
+    def _forget_document(key: str):
+        document_store.close(key)
+        scheduler.cancel_document(key, "document closed")
+        prefetcher.cancel_document(key, "document closed")
+
+    def _spawn_background(self, coroutine):
+        async def run():
+            try:
+                await coroutine
+            except RequestCancelled:
+                pass
+            except Exception as e:
+                logger.debug(f"Background job failed: {e}")
+        task = asyncio.create_task(run())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def cmd_ping(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Liveness check"""
+        return {"pong": True}
+
+    async def cmd_shutdown(self, args: Dict[str, Any]) -> Dict[str, Any]:
+        """Stop reading requests and exit once in-flight requests finished"""
+        session = _session.get()
+        if session and session.id:
+            # A shared server outlives its clients; only this connection ends
+            session.connected = False
+            return {}
+        self._running = False
+        return {}
+
+    async def handle_request(self, request: Dict[str, Any]) -> Any:
+        """Run the handler for one request"""
+        command = request.get("command", "")
+        handler = getattr(self, f"cmd_{command}", None)
+        if handler is None:
+            raise ValueError(f"Unknown command: {command}")
+        args = dict(request.get("args") or {})
+        # Requests are cancellable by the id the client sent them with; a cancel
+        # names the request it cancels, its own id is not a target
+        if command != "cancel":
+            args.setdefault("requestId", request.get("id"))
+        session = _session.get()
+        if session and "requestId" in args:
+            args["requestId"] = session.key(args["requestId"])
+        return await handler(args)
+
+    async def _send(self, message: Dict[str, Any]):
+        """Write one response line to the client of the current session"""
+        await _session.get().send(message)
+
+    async def _dispatch(self, request: Dict[str, Any]):
+        """Run and answer one request"""
+        request_id = request.get("id")
+        try:
+            result = await self.handle_request(request)
+            response = {"id": request_id, "ok": True, "result": result}
+        except RequestCancelled as e:
+            logger.debug(str(e))
+            response = {"id": request_id, "ok": False, "cancelled": True, "error": str(e)}
+        except Exception as e:
+            logger.error(f"Request {request_id} ({request.get('command')}) failed: {e}")
+            response = {"id": request_id, "ok": False, "error": str(e)}
+        # Notifications (no id) are not answered
+        if "id" in request:
+            await self._send(response)
+
+    async def _handle_line(self, line: str):
+        """Parse one request line and dispatch it"""
+        line = line.strip()
+        if not line:
+            return
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            logger.error(f"Invalid request: {e}")
+            await self._send({"id": None, "ok": False, "error": f"Invalid request: {e}"})
+            return
+        if request.get("command") in self.ORDERED_COMMANDS:
+            await self._dispatch(request)
+            return
+        task = asyncio.create_task(self._dispatch(request))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _start(self):
+        if self.watcher:
+            self.watcher.start()
+        # CPU-heavy jobs go to worker processes while serving
+        worker_pool.start()
+        self.loop_lag.start()
+        # Map or build the DDIC index before the first request needs it
+        self._spawn_background(self.backend.prepare_ddic())
+
+    async def _stop(self):
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        for task in list(self._background):
+            task.cancel()
+
+    def _cleanup(self):
+        if self.watcher:
+            self.watcher.stop()
+        self.loop_lag.stop()
+        worker_pool.shutdown()
+        stats.flush()
+        logger.info("Backend server stopped")
+
+    async def serve_stdio(self):
+        """Serve requests from stdin until EOF or a shutdown request"""
+        loop = asyncio.get_running_loop()
+        _session.set(Session())
+        self._start()
+        logger.info("Backend server started")
+
+        try:
+            while self._running:
+                # readline in a thread keeps the loop free and works on Windows pipes
+                line = await loop.run_in_executor(None, sys.stdin.readline)
+                if not line:
+                    # EOF: the extension went away
+                    break
+                await self._handle_line(line)
+            await self._stop()
+        finally:
+            self._cleanup()
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve one socket connection until it closes"""
+        session = Session(f"c{next(self._session_ids)}", writer)
+        self._sessions[session.id] = session
+        # Tasks started for this connection inherit its session and scheduler client
+        _session.set(session)
+        current_client.set(session.id)
+        stats.increment("server.sessions")
+        logger.info(f"Client {session.id} connected ({len(self._sessions)} connected)")
+        try:
+            while self._running and session.connected:
+                try:
+                    line = await reader.readline()
+                except (ConnectionError, ValueError) as e:
+                    logger.warning(f"Client {session.id}: {e}")
+                    break
+                if not line:
+                    break
+                await self._handle_line(line.decode("utf-8", errors="replace"))
+        finally:
+            session.connected = False
+            del self._sessions[session.id]
+            scheduler.cancel_client(session.id)
+            for key in session.documents:
+                self._forget_document(key)
+            self._last_client = time.monotonic()
+            writer.close()
+            logger.info(f"Client {session.id} disconnected ({len(self._sessions)} connected)")
+
+    async def serve_socket(self, path: Optional[str] = None):
+        """Serve many clients on a Unix domain socket until idle for LACC_SERVER_IDLE_SECONDS"""
+        import fcntl
+        socket_path = Path(path) if path else default_socket_path()
+        # Only one server per socket; a second one started concurrently just exits
+        lock_file = open(f"{socket_path}.lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            logger.info(f"A backend server is already serving {socket_path}")
+            lock_file.close()
+            return
+        try:
+            # Left behind by a server that did not exit cleanly
+            socket_path.unlink()
+        except OSError:
+            pass
+
+        self._start()
+        server = await asyncio.start_unix_server(self._serve_client, path=str(socket_path), limit=LINE_LIMIT)
+        os.chmod(socket_path, int(os.getenv("LACC_SERVER_SOCKET_MODE", "600"), 8))
+        self._last_client = time.monotonic()
+        logger.info(f"Backend server listening on {socket_path}")
+        try:
+            while self._running:
+                await asyncio.sleep(1)
+                idle = not self._sessions and not self._tasks
+                if idle and self.idle_timeout > 0 and time.monotonic() - self._last_client >= self.idle_timeout:
+                    logger.info(f"No clients for {self.idle_timeout:g}s, shutting down")
+                    break
+            server.close()
+            await server.wait_closed()
+            await self._stop()
+        finally:
+            try:
+                socket_path.unlink()
+            except OSError:
+                pass
+            lock_file.close()
+            self._cleanup()
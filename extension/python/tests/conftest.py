@@ -0,0 +1,18 @@
+"""
+Shared setup for the backend's behavior tests
+
+    python -m pytest tests -q
+
+The tests only need the standard library: the AI dependencies (groq,
+pydantic) may be missing, and nothing talks to a real model server.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# The backend modules live next to this directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# Caches, stats and traces of the test runs stay out of the user's cache directory
+os.environ["LACC_CACHE_DIR"] = tempfile.mkdtemp(prefix="lacc-tests-")
+
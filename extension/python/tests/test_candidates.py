@@ -0,0 +1,62 @@
+"""Racing candidates, keeping the losers as alternatives and looking them up again"""
+import asyncio
+
+from local_ai_code_completion.candidates import AlternativesCache, CandidateRace, request_key
+
+# Seconds each candidate takes, by temperature
+DELAYS = {0.3: 0.01, 0.5: 0.03, 0.7: 0.05}
+CODE = {0.3: "ENDIF.", 0.5: "WRITE lv_a.", 0.7: "WRITE lv_b."}
+
+
+def _race(grace: float, cancelled: list) -> CandidateRace:
+    async def stream(temperature):
+        try:
+            await asyncio.sleep(DELAYS[temperature])
+        except asyncio.CancelledError:
+            cancelled.append(temperature)
+            raise
+        yield CODE[temperature]
+
+    return CandidateRace(stream, str.strip, grace=grace)
+
+
+def test_first_valid_candidate_wins_and_the_rest_are_cancelled():
+    cancelled = []
+
+    async def scenario():
+        race = _race(0, cancelled)
+        # The fastest candidate doesn't validate
+        assert await race.run(list(DELAYS)) == "WRITE lv_a."
+        await asyncio.sleep(0)
+        return race
+
+    race = asyncio.run(scenario())
+    assert cancelled == [0.7]
+    assert race.alternatives("WRITE lv_a.") == ["ENDIF."]
+
+
+def test_losing_candidates_finish_within_the_grace_period():
+    cancelled = []
+
+    async def scenario():
+        race = _race(1.0, cancelled)
+        winner = await race.run(list(DELAYS))
+        # Returned before the slowest candidate finished
+        assert len(race.finished) == 2
+        await race.settle()
+        return race.alternatives(winner)
+
+    # Valid alternatives come first
+    assert asyncio.run(scenario()) == ["WRITE lv_b.", "ENDIF."]
+    assert cancelled == []
+
+
+def test_cache_keeps_the_shown_candidate_first():
+    cache = AlternativesCache()
+    key = request_key("z.abap", "comment", "REPORT z.\n", "", "* sum")
+    cache.store(key, "WRITE lv_a.", ["WRITE lv_b."])
+    assert cache.get(key) == ["WRITE lv_a.", "WRITE lv_b."]
+    assert cache.get(request_key("z.abap", "comment", "REPORT z.\n", "", "* total")) == []
+    # A single candidate has nothing to offer
+    cache.store("other", "WRITE lv_c.", [])
+    assert cache.get("other") == []
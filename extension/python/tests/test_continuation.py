@@ -0,0 +1,55 @@
+"""Continuation cache hits on the context the extension sends after inserting a completion"""
+from local_ai_code_completion.continuation import ContinuationCache
+from local_ai_code_completion.documents import Document
+
+TEXT = (
+    "REPORT zdemo.\n"
+    "DATA lv_total TYPE i.\n"
+    "\n"
+    "WRITE / lv_total.\n"
+)
+COMPLETION = "lv_total = 10.\nIF lv_total > 5.\n  lv_total = 5.\nENDIF."
+
+
+def _insert(document: Document, line: int, character: int, text: str):
+    # The WorkspaceEdit of generateCode, as the did_change content change the server receives
+    position = {"line": line, "character": character}
+    document.apply([{"range": {"start": position, "end": position}, "text": text}], document.version + 1)
+
+
+def _delete(document: Document, start: tuple, end: tuple):
+    document.apply([{"range": {"start": {"line": start[0], "character": start[1]},
+                                "end": {"line": end[0], "character": end[1]}}, "text": ""}],
+                   document.version + 1)
+
+
+def _generated():
+    cache = ContinuationCache()
+    cache.clear()
+    document = Document("file:///zdemo.abap", TEXT, 1)
+    prefix, suffix = document.context(2, 0)
+    cache.record("zdemo.abap", "code", prefix, suffix, COMPLETION)
+    _insert(document, 2, 0, COMPLETION)
+    return cache, document
+
+
+def test_kept_start_of_an_inserted_completion_serves_the_rest():
+    cache, document = _generated()
+    # Keep the first two lines, delete the rest and generate again at the end of them
+    _delete(document, (4, 0), (5, 6))
+    prefix, suffix = document.context(4, 0)
+    assert cache.lookup("zdemo.abap", "code", prefix, suffix) == "  lv_total = 5.\nENDIF."
+
+
+def test_generating_after_the_whole_completion_asks_the_model():
+    cache, document = _generated()
+    prefix, suffix = document.context(5, 6)
+    assert cache.lookup("zdemo.abap", "code", prefix, suffix) is None
+
+
+def test_own_code_after_the_kept_part_asks_the_model():
+    cache, document = _generated()
+    _delete(document, (4, 0), (5, 6))
+    _insert(document, 4, 0, "CLEAR lv_total.")
+    prefix, suffix = document.context(4, 15)
+    assert cache.lookup("zdemo.abap", "code", prefix, suffix) is None
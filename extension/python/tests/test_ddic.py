@@ -0,0 +1,70 @@
+"""DDIC export indexing, lookup and prompt context"""
+import asyncio
+import json
+
+from local_ai_code_completion.ddic import DdicIndex
+
+CSV = (
+    "TABNAME;FIELDNAME;KEYFLAG;ROLLNAME;DATATYPE;LENG;DECIMALS;DDTEXT\n"
+    "VBAK;;;;;;;Sales Document: Header Data\n"
+    "VBAK;MANDT;X;MANDT;CLNT;000003;000000;Client\n"
+    "VBAK;VBELN;X;VBELN_VA;CHAR;000010;000000;Sales Document\n"
+    "VBAK;ERDAT;;ERDAT;DATS;000008;000000;Created on\n"
+    "VBAK;NETWR;;NETWR_AK;;;;Net Value\n"
+    "VBAK;.INCLUDE;;VBAK_EXT;;;;\n"
+    ";;;NETWR_AK;CURR;000015;000002;Net Value\n"
+    "MARA;MATNR;X;MATNR;CHAR;000040;000000;Material\n"
+)
+
+
+def _index(tmp_path, monkeypatch, name, content) -> DdicIndex:
+    monkeypatch.setenv("LACC_CACHE_DIR", str(tmp_path / "cache"))
+    export = tmp_path / name
+    export.write_text(content, encoding="utf-8")
+    monkeypatch.setenv("LACC_DDIC_FILE", str(export))
+    index = DdicIndex()
+    asyncio.run(index.prepare())
+    return index
+
+
+def test_lookup_of_a_csv_export(tmp_path, monkeypatch):
+    index = _index(tmp_path, monkeypatch, "dd03l.csv", CSV)
+    assert index.describe()["tables"] == 2
+    record = index.lookup("vbak")
+    assert record["d"] == "Sales Document: Header Data"
+    assert [field[0] for field in record["k"]] == ["MANDT", "VBELN"]
+    # Typed by its data element; the .INCLUDE row is skipped
+    assert record["f"] == [["ERDAT", "ERDAT", "DATS(8)"], ["NETWR", "NETWR_AK", "CURR(15,2)"]]
+    assert index.lookup("VBAP") is None
+    assert index.lookup("") is None
+
+
+def test_context_has_key_fields_and_used_fields_of_referenced_tables(tmp_path, monkeypatch):
+    index = _index(tmp_path, monkeypatch, "dd03l.csv", CSV)
+    prefix = "SELECT vbeln, erdat FROM vbak INTO TABLE @DATA(lt_orders) WHERE erdat > @lv_date.\n"
+    context = index.context_for(prefix, "")
+    assert context.startswith("VBAK Sales Document: Header Data\n  key: MANDT CLNT(3), VBELN VBELN_VA CHAR(10)")
+    assert "used: ERDAT DATS(8)" in context
+    assert "(+1 more fields)" in context
+    assert "MARA" not in context
+
+
+def test_json_export_and_rebuild_after_a_change(tmp_path, monkeypatch):
+    data = {"tables": {"ZORDERS": {"description": "Orders", "fields": [
+        {"name": "ID", "key": "X", "type": "NUMC", "length": "10"}]}}}
+    index = _index(tmp_path, monkeypatch, "ddic.json", json.dumps(data))
+    assert index.lookup("ZORDERS")["k"] == [["ID", "", "NUMC(10)"]]
+
+    data["tables"]["ZITEMS"] = {"description": "Items", "fields": []}
+    (tmp_path / "ddic.json").write_text(json.dumps(data) + " ", encoding="utf-8")
+    index._checked = 0.0
+
+    async def rebuild():
+        await index.prepare()
+        # The rebuild runs in the background while the old index still answers
+        assert index.lookup("ZITEMS") is None and index.lookup("ZORDERS") is not None
+        await index._building
+
+    asyncio.run(rebuild())
+    assert index.lookup("ZITEMS") is not None
+    assert len(list((tmp_path / "cache").glob("ddic-*.idx"))) == 1
@@ -0,0 +1,45 @@
+"""Debug instrumentation built from the code before the cursor"""
+from local_ai_code_completion.debug_templates import TABLE, analyze_scope, debug_templates, render
+
+METHOD_PREFIX = """CLASS lcl_report IMPLEMENTATION.
+  METHOD run.
+    DATA lt_items TYPE TABLE OF vbap.
+    DATA lv_total TYPE p DECIMALS 2.
+    SELECT * FROM vbap INTO TABLE lt_items WHERE vbeln = iv_vbeln.
+    LOOP AT lt_items INTO DATA(ls_item).
+      """
+
+
+def test_scope_covers_declarations_loops_and_last_statement():
+    scope = analyze_scope(METHOD_PREFIX)
+    assert scope.unit == "run"
+    assert scope.variables["lt_items"] == TABLE
+    assert "lv_total" in scope.variables
+    assert scope.loops == [("LOOP", "lt_items")]
+    assert scope.last_keyword == "LOOP"
+
+
+def test_render_writes_variables_tables_and_loop_index():
+    code = render(METHOD_PREFIX)
+    assert "BREAK-POINT." in code
+    assert "DESCRIBE TABLE lt_items LINES lv_debug_lines." in code
+    assert "WRITE: / 'lv_total:', lv_total." in code
+    assert "WRITE: / 'LOOP AT lt_items sy-tabix:', sy-tabix." in code
+    # The first line goes at the cursor, the others keep its indentation
+    assert all(line.startswith("      ") for line in code.split("\n")[1:])
+
+
+def test_render_has_no_meaningless_runtime_reading():
+    code = render(METHOD_PREFIX)
+    assert "GET RUN TIME" not in code
+    assert "runtime" not in code.lower()
+
+
+def test_subrc_follows_the_statement_that_set_it():
+    code = render("DATA lv_matnr TYPE matnr.\nSELECT SINGLE matnr FROM mara INTO lv_matnr.\n")
+    assert "WRITE: / 'SELECT sy-subrc:', sy-subrc." in code
+
+
+def test_nothing_in_scope_or_own_request_asks_the_model():
+    assert render("REPORT zdemo.\n") == ""
+    assert debug_templates.instrument(METHOD_PREFIX, "\" why is lv_total zero?") == ""
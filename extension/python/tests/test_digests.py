@@ -0,0 +1,55 @@
+"""Digests of related files and their refinement by the model"""
+import asyncio
+
+import pytest
+
+from local_ai_code_completion.digests import MAX_REFINE_ATTEMPTS, DigestCache
+
+SOURCES = {
+    "zcl_orders.abap": "CLASS zcl_orders DEFINITION PUBLIC.\n  PUBLIC SECTION.\n    METHODS get_total.\nENDCLASS.\n",
+    "zcl_items.abap": "CLASS zcl_items DEFINITION PUBLIC.\n  PUBLIC SECTION.\n    METHODS count.\nENDCLASS.\n",
+}
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("LACC_CACHE_DIR", str(tmp_path / "cache"))
+    paths = []
+    for name, text in SOURCES.items():
+        path = tmp_path / name
+        path.write_text(text, encoding="utf-8")
+        paths.append(str(path))
+    digests = DigestCache()
+    built = asyncio.run(digests.digest_files(paths))
+    assert sorted(digest["name"].lower() for digest in built.values()) == ["zcl_items", "zcl_orders"]
+    return digests
+
+
+def test_only_answered_digests_are_marked_refined(cache):
+    batch = cache.pending_refinement()
+    names = [digest["name"] for _, digest in batch]
+
+    async def answer_first(prompt):
+        return "[1] Reads orders and sums their totals"
+
+    assert asyncio.run(cache.refine(answer_first)) == 1
+    pending = cache.pending_refinement()
+    assert [digest["name"] for _, digest in pending] == names[1:]
+    assert pending[0][1]["refine_attempts"] == 1
+
+
+def test_failed_requests_are_retried_a_few_times(cache):
+    async def fail(prompt):
+        raise RuntimeError("rate limited")
+
+    for _ in range(MAX_REFINE_ATTEMPTS - 1):
+        with pytest.raises(RuntimeError):
+            asyncio.run(cache.refine(fail))
+        assert len(cache.pending_refinement()) == 2
+
+    async def no_answer(prompt):
+        return ""
+
+    assert asyncio.run(cache.refine(no_answer)) == 0
+    # Digests the model never answered keep their local purpose
+    assert cache.pending_refinement() == []
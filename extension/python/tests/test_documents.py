@@ -0,0 +1,58 @@
+"""Incremental edits of mirrored documents"""
+import random
+
+import pytest
+
+from local_ai_code_completion import documents
+from local_ai_code_completion.documents import DocumentStore, DocumentVersionError, LineStore
+
+
+def _offset(text: str, line: int, character: int) -> int:
+    lines = text.split("\n")
+    return sum(len(l) + 1 for l in lines[:line]) + min(character, len(lines[line]))
+
+
+def test_random_edits_match_editing_the_full_text(monkeypatch):
+    # Small blocks so edits split, merge and cross block boundaries
+    monkeypatch.setattr(documents, "BLOCK_SIZE", 4)
+    rng = random.Random(7)
+    text = "\n".join(f"DATA lv_{i} TYPE i." for i in range(40))
+    store = LineStore(text)
+    for _ in range(300):
+        lines = text.split("\n")
+        start_line = rng.randrange(len(lines))
+        end_line = min(len(lines) - 1, start_line + rng.choice([0, 0, 1, 3, 9]))
+        start_char = rng.randrange(len(lines[start_line]) + 1)
+        end_char = rng.randrange(len(lines[end_line]) + 1) if end_line > start_line else start_char
+        new_text = rng.choice(["", "x", "lv_total = 1.", "IF x.\n  y = 1.\nENDIF.", "\n" * rng.randrange(1, 12)])
+        store.replace(start_line, start_char, end_line, end_char, new_text)
+        start, end = _offset(text, start_line, start_char), _offset(text, end_line, end_char)
+        text = text[:start] + new_text + text[end:]
+        assert store.line_count == text.count("\n") + 1
+    assert store.text() == text
+    assert store.lines(5, 9) == text.split("\n")[5:9]
+
+
+def test_columns_are_utf16_code_units():
+    store = LineStore("lv_text = '😀 ok'.")
+    # The emoji takes two UTF-16 code units
+    store.replace(0, 14, 0, 16, "fine")
+    assert store.text() == "lv_text = '😀 fine'."
+
+
+def test_store_checks_versions_and_drops_broken_mirrors():
+    store = DocumentStore()
+    store.open("file:///z.abap", "REPORT z.\n", 1)
+    change = {"range": {"start": {"line": 1, "character": 0}, "end": {"line": 1, "character": 0}},
+              "text": "WRITE 1."}
+    assert store.change("file:///z.abap", 2, [change]).store.text() == "REPORT z.\nWRITE 1."
+    # A stale event is ignored
+    assert store.change("file:///z.abap", 2, [change]).version == 2
+    with pytest.raises(DocumentVersionError):
+        store.get("file:///z.abap", 1)
+
+    bad = {"range": {"start": {"line": 9, "character": 0}, "end": {"line": 9, "character": 0}}, "text": "x"}
+    with pytest.raises(DocumentVersionError):
+        store.change("file:///z.abap", 3, [bad])
+    with pytest.raises(DocumentVersionError):
+        store.get("file:///z.abap")
@@ -0,0 +1,38 @@
+"""Concurrent environment probes"""
+import asyncio
+import threading
+import time
+
+import env_check
+from local_ai_code_completion.workers import run_in_thread
+
+
+def test_slow_probes_time_out_without_blocking_the_report(monkeypatch):
+    release = threading.Event()
+
+    def slow(deadline):
+        release.wait(5)
+        return env_check._result(True, ["slow"])
+
+    monkeypatch.setattr(env_check, "CHECKS", {
+        "fast": ("Fast", lambda deadline: env_check._result(True, ["fast"])),
+        "slow": ("Slow", slow),
+        "broken": ("Broken", lambda deadline: 1 / 0),
+    })
+    started = time.monotonic()
+    try:
+        report = env_check.run_checks(timeout=0.2)
+    finally:
+        release.set()
+    assert time.monotonic() - started < 2
+    assert report["timed_out"] == ["slow"]
+    assert report["checks"]["fast"]["ok"]
+    assert not report["checks"]["broken"]["ok"]
+    assert report["passed"] == 1 and report["total"] == 3
+
+
+def test_run_in_thread_returns_the_result():
+    def blocking(a, b):
+        return threading.current_thread() is not threading.main_thread(), a + b
+
+    assert asyncio.run(run_in_thread(blocking, 2, 3)) == (True, 5)
@@ -0,0 +1,67 @@
+"""Token governor levels and usage shared between backends"""
+import subprocess
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from local_ai_code_completion.governor import FULL, TokenGovernor, trim_context
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def governor(tmp_path, monkeypatch):
+    monkeypatch.setenv("LACC_CACHE_DIR", str(tmp_path))
+    monkeypatch.setenv("LACC_TOKENS_PER_MINUTE", "1000")
+    monkeypatch.setenv("LACC_GOVERNOR_STEPS", "0.6,0.8,0.95")
+    return TokenGovernor()
+
+
+def test_levels_follow_the_per_minute_usage(governor):
+    config = SimpleNamespace(router_models="llama-3.3-70b-versatile, llama-3.1-8b-instant", governor_model="")
+    assert governor.plan("groq", config) == FULL
+    governor.record("groq", 650)
+    plan = governor.plan("groq", config)
+    assert (plan.level, plan.include_related, plan.max_tokens, plan.model) == (1, False, 0, "")
+    governor.record("groq", 200)
+    assert governor.plan("groq", config).max_tokens == governor.max_tokens
+    governor.record("groq", 120)
+    assert governor.plan("groq", config).model == "llama-3.1-8b-instant"
+    # Local servers have no quota
+    assert governor.plan("local", config) == FULL
+
+
+def test_last_step_model_comes_from_config(governor):
+    governor.record("groq", 990)
+    configured = SimpleNamespace(router_models="a,b", governor_model="cheap-model")
+    assert governor.plan("groq", configured).model == "cheap-model"
+    # Without a configured or router model the model choice stays as it is
+    assert governor.plan("groq", SimpleNamespace(router_models="", governor_model="")).model == ""
+
+
+def test_concurrent_backends_do_not_lose_tokens(governor, tmp_path):
+    script = (
+        "import sys; sys.path.insert(0, sys.argv[1])\n"
+        "from local_ai_code_completion.governor import TokenGovernor\n"
+        "governor = TokenGovernor()\n"
+        "for _ in range(40):\n"
+        "    governor.record('groq', 1)\n"
+    )
+    env = {"LACC_CACHE_DIR": str(tmp_path), "PATH": ""}
+    processes = [subprocess.Popen([sys.executable, "-c", script, str(BACKEND_DIR)], env=env,
+                                  stderr=subprocess.DEVNULL) for _ in range(4)]
+    for process in processes:
+        assert process.wait(timeout=60) == 0
+    assert governor.usage()["minute"] == 160
+
+
+def test_trim_context_keeps_whole_lines_near_the_cursor():
+    prefix = "".join(f"line {i}\n" for i in range(100))
+    suffix = "".join(f"after {i}\n" for i in range(100))
+    trimmed_prefix, trimmed_suffix = trim_context(prefix, suffix, 400)
+    assert len(trimmed_prefix) + len(trimmed_suffix) <= 400
+    assert trimmed_prefix.endswith("line 99\n") and trimmed_prefix.startswith("line ")
+    assert trimmed_suffix.startswith("after 0\n") and trimmed_suffix.endswith(tuple("0123456789"))
+    assert trim_context("short", "text", 400) == ("short", "text")
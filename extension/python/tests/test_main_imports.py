@@ -0,0 +1,42 @@
+"""Backend subsystems load independently of each other"""
+import subprocess
+import sys
+from pathlib import Path
+
+PYTHON_DIR = Path(__file__).resolve().parent.parent
+
+
+def test_a_broken_subsystem_only_turns_off_itself():
+    # A None entry in sys.modules makes the import raise, as a broken module would
+    script = (
+        "import sys; sys.modules['local_ai_code_completion.overlap'] = None; import main; "
+        "print(main.OverlapDetector, main.scheduler is not None, main.continuation_cache is not None, "
+        "main.governor is not None, main.tracer is not None)"
+    )
+    result = subprocess.run([sys.executable, "-c", script], cwd=PYTHON_DIR, capture_output=True, text=True,
+                            timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ["None", "True", "True", "True", "True"]
+    assert "Could not load overlap detection" in result.stderr
+
+
+def test_generation_works_without_the_optional_subsystems():
+    script = (
+        "import asyncio, importlib, sys\n"
+        "from types import SimpleNamespace\n"
+        "for name in ('governor', 'overlap', 'prefetch', 'router', 'scheduler', 'tracing'):\n"
+        "    sys.modules['local_ai_code_completion.' + name] = None\n"
+        "module = importlib.import_module('local_ai_code_completion.ai_completion')\n"
+        "class Fake:\n"
+        "    name = 'local'\n"
+        "    def reasoning_params(self, model): return {}\n"
+        "    def stream(self, model, messages, usage=None, **kwargs): return iter(['WRITE ', 'x.'])\n"
+        "module.providers.get = lambda model_config, name: Fake()\n"
+        "module.AICodeCompletion.model_config = property(lambda self: SimpleNamespace(\n"
+        "    provider='local', local_model='m', temperature=0.1, top_p=0.1))\n"
+        "print(asyncio.run(module.ai_completion.generate_code_with_prompt('p')))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], cwd=PYTHON_DIR, capture_output=True, text=True,
+                            timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "WRITE x."
@@ -0,0 +1,73 @@
+"""Budgeted caches, shrinking over the RSS cap and compact text storage"""
+from local_ai_code_completion import memory
+from local_ai_code_completion.memory import MB, BoundedCache, CompactText, MemoryAccountant
+
+
+def test_cache_evicts_least_recently_used_items_over_its_limit():
+    cache = BoundedCache("lru", max_bytes=300, accountant=MemoryAccountant(10 * MB))
+    for key in "abc":
+        cache.put(key, key, size=100)
+    assert cache.get("a") == "a"
+    cache.put("d", "d", size=100)
+    assert cache.keys() == ["c", "a", "d"]
+    assert (cache.memory_size(), cache.evictions) == (300, 1)
+
+
+def test_largest_cache_gives_up_memory_to_fit_the_budget():
+    accountant = MemoryAccountant(1000)
+    large = BoundedCache("large", accountant=accountant)
+    small = BoundedCache("small", accountant=accountant)
+    for i in range(3):
+        small.put(i, "s", size=100)
+    for i in range(6):
+        large.put(i, "l", size=100)
+    assert accountant.sizes() == {"large": 600, "small": 300}
+    large.put("new", "l", size=300)
+    # Only the larger cache lost its oldest items
+    assert accountant.sizes() == {"large": 700, "small": 300}
+    assert large.keys() == [2, 3, 4, 5, "new"]
+    assert accountant.evicted_bytes == 200
+
+
+def test_caches_that_free_nothing_are_skipped():
+    class Pinned:
+        def memory_size(self):
+            return 2000
+
+        def evict(self, nbytes):
+            return 0
+
+    accountant = MemoryAccountant(1000)
+    accountant.register("pinned", Pinned())
+    cache = BoundedCache("cache", accountant=accountant)
+    cache.put("a", "a", size=100)
+    assert len(cache) == 0
+    assert accountant.report()["accounted_bytes"] == 2000
+
+
+def test_caches_shrink_while_rss_is_over_the_cap(monkeypatch):
+    accountant = MemoryAccountant(1000)
+    accountant.max_rss_bytes = 100 * MB
+    cache = BoundedCache("cache", accountant=accountant)
+    rss = [50 * MB]
+    monkeypatch.setattr(memory, "current_rss", lambda: rss[0])
+    for i in range(8):
+        cache.put(i, "x", size=100)
+    assert accountant.enforce() == 0
+    rss[0] = 200 * MB
+    # Half the budget applies until the process is back under the cap
+    assert accountant.enforce() == 300
+    assert cache.memory_size() == 500
+    rss[0] = 50 * MB
+    cache.put("back", "x", size=100)
+    assert cache.memory_size() == 600
+
+
+def test_compact_text_round_trip():
+    for text in ("", "WRITE 'Grüße'.", "lv_text = '\U0001f600'.\n" * 200, "broken \udc80 surrogate"):
+        assert str(CompactText(text)) == text
+    large = "SELECT * FROM vbak INTO TABLE @DATA(lt_orders).\n" * 200
+    compact = CompactText(large)
+    assert compact._compressed
+    assert compact.memory_size() < len(large) // 10
+    assert not CompactText("WRITE 1.")._compressed
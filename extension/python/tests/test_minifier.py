@@ -0,0 +1,61 @@
+"""Prompt context minification outside the cursor region"""
+from local_ai_code_completion.minifier import ContextMinifier
+
+
+def _minifier(cursor_lines=1, literal_rows=0):
+    minifier = ContextMinifier()
+    minifier.enabled = True
+    minifier.cursor_lines = cursor_lines
+    minifier.literal_rows = literal_rows
+    return minifier
+
+
+def test_comments_and_alignment_are_dropped_outside_the_cursor_region():
+    prefix = "* Header\nDATA   lv_a   TYPE i.  \" counter\n\n  lv_a = 1.\n  lv_"
+    minified, _ = _minifier(cursor_lines=2).minify(prefix, "")
+    assert minified == "DATA lv_a TYPE i.\n  lv_a = 1.\n  lv_"
+
+
+def test_local_declarations_of_each_procedure_are_kept():
+    prefix = (
+        "METHOD first.\n  DATA lv_x TYPE i.\n  lv_x = 1.\nENDMETHOD.\n"
+        "METHOD second.\n  DATA lv_x TYPE i.\n  lv_x = 2.\nENDMETHOD.\n"
+        "FORM third.\n  DATA lv_x TYPE i.\nENDFORM.\n"
+    )
+    minified, _ = _minifier().minify(prefix, "")
+    assert minified.count("DATA lv_x TYPE i.") == 3
+
+
+def test_attributes_of_each_class_and_interface_are_kept():
+    prefix = (
+        "CLASS lcl_order DEFINITION DEFERRED.\n"
+        "DATA gv_count TYPE i.\n"
+        "CLASS lcl_order DEFINITION.\n  PUBLIC SECTION.\n    DATA mv_id TYPE i.\nENDCLASS.\n"
+        "CLASS lcl_item DEFINITION.\n  PUBLIC SECTION.\n    DATA mv_id TYPE i.\nENDCLASS.\n"
+        "INTERFACE lif_a.\n  DATA mv_id TYPE i.\nENDINTERFACE.\n"
+        "DATA gv_count TYPE i.\n"
+    )
+    minified, _ = _minifier().minify(prefix, "")
+    assert minified.count("DATA mv_id TYPE i.") == 3
+    # The forward declaration opens no class, and globals after the classes are still deduplicated
+    assert minified.count("DATA gv_count TYPE i.") == 1
+
+
+def test_repeated_global_declarations_are_sent_once():
+    prefix = "DATA gv_total TYPE i.\nREPORT zdemo.\nDATA gv_total TYPE i.\nSTART-OF-SELECTION.\n  "
+    suffix = "\nWRITE gv_total.\nDATA gv_total TYPE i."
+    minified_prefix, minified_suffix = _minifier().minify(prefix, suffix)
+    assert (minified_prefix + minified_suffix).count("DATA gv_total TYPE i.") == 1
+
+
+def test_literal_rows_are_cut_when_configured():
+    rows = "".join(f"APPEND '{i}' TO lt_values.\n" for i in range(10))
+    minified, _ = _minifier(literal_rows=2).minify(rows + "WRITE 'x'.\n", "")
+    assert minified.count("APPEND") == 2
+    assert "* ... 8 more similar lines" in minified
+
+
+def test_disabled_minifier_sends_the_context_as_typed():
+    minifier = _minifier()
+    minifier.enabled = False
+    assert minifier.minify("* a\nDATA  x TYPE i.\n", "  \" b") == ("* a\nDATA  x TYPE i.\n", "  \" b")
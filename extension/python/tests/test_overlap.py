@@ -0,0 +1,47 @@
+"""Stopping streams that repeat the code around the cursor"""
+from local_ai_code_completion.overlap import OverlapDetector
+
+PREFIX = (
+    "LOOP AT lt_items INTO DATA(ls_item).\n"
+    "  lv_total = lv_total + ls_item-amount.\n"
+    "  "
+)
+SUFFIX = (
+    "\nENDLOOP.\n"
+    "WRITE: / 'Total:', lv_total.\n"
+    "CLEAR lt_items.\n"
+)
+
+
+def _stream(text: str, size: int = 7) -> tuple:
+    detector = OverlapDetector(PREFIX, SUFFIX)
+    out = "".join(detector.feed(text[i:i + size]) for i in range(0, len(text), size)) + detector.flush()
+    return out, detector
+
+
+def test_stream_stops_when_it_reproduces_the_suffix():
+    output = "lv_count = lv_count + 1.\nENDLOOP.\nWRITE: / 'Total:', lv_total.\nCLEAR lt_items.\nEXIT.\n"
+    out, detector = _stream(output)
+    assert out == "lv_count = lv_count + 1.\n"
+    assert detector.stopped
+
+
+def test_repeated_prefix_lines_at_the_start_are_trimmed():
+    output = "lv_total = lv_total + ls_item-amount.\nlv_count = lv_count + 1."
+    out, detector = _stream(output)
+    assert out == "lv_count = lv_count + 1."
+    assert not detector.stopped
+
+
+def test_short_matches_are_not_trusted():
+    detector = OverlapDetector("IF lv_a = 1.\n  ", "\nENDIF.\n")
+    out = detector.feed("lv_b = 2.\nENDIF.\nlv_c = 3.\n") + detector.flush()
+    assert out == "lv_b = 2.\nENDIF.\nlv_c = 3.\n"
+    assert not detector.stopped
+
+
+def test_a_broken_run_releases_the_held_lines():
+    output = "ENDLOOP.\nWRITE: / 'Count:', lv_count.\n"
+    out, detector = _stream(output, size=3)
+    assert out == output
+    assert not detector.stopped
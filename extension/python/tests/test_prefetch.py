@@ -0,0 +1,47 @@
+"""Prefetch at trigger points and joining a prefetch in flight"""
+import asyncio
+
+from local_ai_code_completion.prefetch import Prefetcher, trigger_point
+
+
+def test_trigger_points():
+    assert trigger_point("", '  " Read the open orders') == "comment"
+    assert trigger_point("", "* Header comment") == "comment"
+    assert trigger_point("", "  METHOD get_total.") == "block"
+    assert trigger_point("  LOOP AT lt_", "") == "loop"
+    assert trigger_point("  lv_total = ", "DATA lv_total TYPE i.") == ""
+    assert trigger_point("", "  lv_total = 1.") == ""
+
+
+def test_explicit_request_joins_the_prefetch_in_flight():
+    async def scenario():
+        prefetcher = Prefetcher()
+
+        async def job(token):
+            await asyncio.sleep(0.05)
+            return "WRITE lv_total."
+
+        assert prefetcher.start("doc-join", 3, "key", job, debounce=0)
+        assert await prefetcher.take("doc-join", "key") == "WRITE lv_total."
+        # Other contexts are not served from it
+        assert await prefetcher.take("doc-join", "other") is None
+
+    asyncio.run(scenario())
+
+
+def test_prefetch_cancelled_before_it_ran_falls_back_to_generation():
+    async def scenario():
+        prefetcher = Prefetcher()
+        ran = []
+
+        async def job(token):
+            ran.append(True)
+            return "never"
+
+        # An edit arrives before the prefetch task got to run
+        asyncio.get_running_loop().call_soon(prefetcher.cancel_document, "doc-edit")
+        assert prefetcher.start("doc-edit", 3, "key", job, debounce=0)
+        assert await prefetcher.take("doc-edit", "key") is None
+        assert not ran
+
+    asyncio.run(scenario())
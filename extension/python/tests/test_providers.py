@@ -0,0 +1,106 @@
+"""Provider adapters"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+from local_ai_code_completion import providers
+from local_ai_code_completion.providers import GroqProvider, LocalProvider, ProviderError, Usage
+
+
+class _Server(BaseHTTPRequestHandler):
+    """OpenAI-compatible server answering with two chunks and usage"""
+    requests = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._send(json.dumps({"data": [{"id": "tiny"}]}).encode())
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        _Server.requests.append((self.path, self.headers.get("Authorization"), payload))
+        if not payload.get("stream"):
+            self._send(json.dumps({"choices": [{"message": {"content": "WRITE x."}}],
+                                   "usage": {"prompt_tokens": 3, "completion_tokens": 2}}).encode())
+            return
+        events = [{"choices": [{"delta": {"content": "WRITE "}}]}, {"choices": [{"delta": {"content": "x."}}]},
+                  {"choices": [], "usage": {"prompt_tokens": 3, "completion_tokens": 2}}]
+        body = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+        self._send(body.encode(), "text/event-stream")
+
+    def _send(self, body, content_type="application/json"):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def local_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Server)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    _Server.requests.clear()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_local_provider_streams_and_reports_usage(local_server):
+    provider = LocalProvider(local_server, api_key="sk-local")
+    usage = Usage()
+    assert "".join(provider.stream("tiny", [{"role": "user", "content": "hi"}], usage=usage)) == "WRITE x."
+    assert (usage.prompt_tokens, usage.completion_tokens) == (3, 2)
+    path, authorization, payload = _Server.requests[-1]
+    assert path == "/v1/chat/completions" and authorization == "Bearer sk-local"
+    assert payload["stream"] and payload["model"] == "tiny"
+    assert provider.chat("tiny", [{"role": "user", "content": "hi"}]) == "WRITE x."
+    assert provider.available() and provider.list_models() == ["tiny"]
+
+
+def test_local_provider_reports_an_unreachable_server():
+    provider = LocalProvider("http://127.0.0.1:9", timeout=1)
+    assert not provider.available()
+    with pytest.raises(ProviderError):
+        provider.chat("tiny", [{"role": "user", "content": "hi"}])
+
+
+def test_groq_provider_passes_the_configured_base_url(monkeypatch):
+    created = []
+    fake_groq = SimpleNamespace(Groq=lambda **kwargs: created.append(kwargs) or SimpleNamespace())
+    monkeypatch.setattr(providers, "groq", fake_groq, raising=False)
+    monkeypatch.setattr(providers, "GROQ_AVAILABLE", True)
+    GroqProvider("gsk_test", "https://proxy.example.com")
+    GroqProvider("gsk_test")
+    assert created == [{"api_key": "gsk_test", "base_url": "https://proxy.example.com"},
+                       {"api_key": "gsk_test", "base_url": None}]
+
+
+def test_registry_rebuilds_a_provider_when_its_settings_change(local_server):
+    registry = providers.ProviderRegistry()
+    config = SimpleNamespace(local_base_url=local_server, local_api_key="", timeout=1000)
+    first = registry.get(config, "local")
+    assert registry.get(config, "local") is first
+    config.local_api_key = "sk-new"
+    assert registry.get(config, "local") is not first
+
+
+def test_a_zero_timeout_means_no_limit(local_server):
+    config = SimpleNamespace(local_base_url=local_server, local_api_key="", timeout=0)
+    provider = providers.create_provider(config, "local")
+    assert provider.timeout is None
+    assert provider.chat("tiny", [{"role": "user", "content": "hi"}]) == "WRITE x."
+    assert providers.create_provider(SimpleNamespace(local_base_url=local_server, timeout=1500), "local").timeout == 1.5
+
+
+def test_providers_must_implement_the_interface():
+    class Partial(providers.Provider):
+        def chat(self, model, messages, usage=None, **params):
+            return ""
+
+    with pytest.raises(TypeError):
+        Partial()
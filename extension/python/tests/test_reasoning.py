@@ -0,0 +1,35 @@
+"""Think blocks dropped from streamed output"""
+from local_ai_code_completion.reasoning import ThinkFilter, strip_think
+
+TEXT = "<think>The user wants a loop.</think>\n\nLOOP AT lt_items INTO DATA(ls_item).\nENDLOOP."
+CODE = "LOOP AT lt_items INTO DATA(ls_item).\nENDLOOP."
+
+
+def _stream(chunks):
+    think = ThinkFilter()
+    return "".join(think.feed(chunk) for chunk in chunks) + think.flush(), think
+
+
+def test_tags_split_at_every_position():
+    for size in range(1, len(TEXT)):
+        chunks = [TEXT[i:i + size] for i in range(0, len(TEXT), size)]
+        visible, think = _stream(chunks)
+        assert visible == CODE, size
+        assert think.reasoning_chars == len("The user wants a loop.")
+        assert think.blocks == 1
+
+
+def test_text_that_only_looks_like_a_tag_is_kept():
+    assert _stream(["IF lv_a <", "thin", "g."])[0] == "IF lv_a <thing."
+    assert _stream(["lv_x = 1. <th"])[0] == "lv_x = 1. <th"
+
+
+def test_unterminated_reasoning_is_dropped():
+    visible, think = _stream(["WRITE 1.\n<think>still", " thinking</thi"])
+    assert visible == "WRITE 1.\n"
+    assert think.inside
+
+
+def test_strip_think_on_a_complete_text():
+    assert strip_think(TEXT) == (CODE, len("The user wants a loop."))
+    assert strip_think(CODE) == (CODE, 0)
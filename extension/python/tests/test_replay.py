@@ -0,0 +1,115 @@
+"""Trace recording, replay of a trace and the replay command"""
+import asyncio
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from local_ai_code_completion.replay import (MARKER, StandInServer, UNMATCHED_CALL, compare_reports, filler,
+                                             play_chunks, replay, replay_context)
+from local_ai_code_completion.scheduler import DeadlineExceeded
+from local_ai_code_completion.tracing import TraceRecorder, load_trace
+
+PYTHON_DIR = Path(__file__).resolve().parent.parent
+RECORD = {"version": 1, "time": 100.0, "kind": "generate", "mode": "code", "document": "", "line": 3,
+          "prefix_chars": 120, "suffix_chars": 40, "comment_chars": 0, "duration_ms": 80.0, "outcome": "ok",
+          "calls": [{"chunks": [[10.0, 20], [30.0, 20]], "prompt_tokens": 50, "completion_tokens": 10,
+                     "outcome": "ok", "max_tokens": 200}]}
+
+
+def test_recorded_trace_holds_sizes_and_hashes_only(tmp_path, monkeypatch):
+    monkeypatch.setenv("LACC_TRACE", "1")
+    monkeypatch.setenv("LACC_TRACE_FILE", str(tmp_path / "trace.jsonl"))
+    recorder = TraceRecorder()
+    with recorder.request("generate", "code", "DATA lv_secret TYPE i.\n", "", document="zsecret.abap") as trace:
+        call = recorder.call("groq", "model", 300, 200, api_key="gsk_secret")
+        call.chunk(12)
+        call.finish(50, 4, "ok")
+        recorder.result(trace, "lv_secret = 1.")
+    (tmp_path / "trace.jsonl").open("a").write("not json\n")
+
+    written = (tmp_path / "trace.jsonl").read_text()
+    assert "secret" not in written
+    records = load_trace(tmp_path / "trace.jsonl")
+    assert len(records) == 1
+    assert records[0]["prefix_chars"] == 23 and records[0]["completion_chars"] == 14
+    assert records[0]["calls"][0]["chunks"][0][1] == 12
+
+
+def test_replay_context_puts_the_marker_above_the_cursor_line():
+    prefix, suffix, comment = replay_context(RECORD, 7)
+    assert len(suffix) == 40 and comment == ""
+    lines = prefix.split("\n")
+    assert lines[-2] == MARKER.format(7)
+    assert len(prefix) == 120 + len(MARKER.format(7)) + 1
+    assert filler("ab", 5) == "ababa" and filler("ab", 0) == ""
+
+
+def test_cut_off_streams_go_on_at_their_pace():
+    call = {"chunks": [[0.0, 4], [10.0, 4]], "outcome": "truncated", "max_tokens": 4}
+    chunks = play_chunks(call)
+    assert chunks[:2] == [[0.0, 4], [10.0, 4]]
+    assert chunks[-1] == [30.0, 4] and sum(chars for _, chars in chunks) == 16
+    assert play_chunks(dict(call, outcome="ok")) == [[0.0, 4], [10.0, 4]]
+
+
+def test_stand_in_plays_the_calls_of_the_marked_request():
+    stand_in = StandInServer([RECORD, dict(RECORD, calls=[])])
+    stand_in.start()
+    try:
+        assert stand_in.script(f"code\n{MARKER.format(0)}\n") is RECORD["calls"][0]
+        # Later calls than recorded repeat the last one
+        assert stand_in.script(f"{MARKER.format(0)}") is RECORD["calls"][0]
+        assert stand_in.script(f"{MARKER.format(1)}") is UNMATCHED_CALL
+        assert stand_in.script("repair prompt") is UNMATCHED_CALL
+        assert stand_in.counters == {"calls": 2, "unmatched": 2, "aborted": 0}
+    finally:
+        stand_in.stop()
+
+
+def test_replay_reports_outcomes_per_mode():
+    records = [RECORD, dict(RECORD, time=100.05, mode="debug")]
+
+    async def send(request):
+        if request["args"]["mode"] == "debug":
+            raise DeadlineExceeded("late")
+        return {"completion": "x", "truncated": False}
+
+    report = asyncio.run(replay(records, send, speed=10))
+    assert report["outcomes"] == {"ok": 1, "deadline": 1}
+    assert set(report["modes"]) == {"code", "debug"}
+    assert report["recorded_latency_ms"]["max"] == 80.0
+
+    changes = compare_reports(report, report)
+    assert changes["latency_ms_p50"]["change_pct"] in (0.0, None)
+    assert "code_latency_ms_p50" in changes
+
+
+def test_replay_rejects_speeds_that_are_not_positive():
+    with pytest.raises(ValueError):
+        asyncio.run(replay([RECORD], None, speed=0))
+
+
+def _main(*args, env=None):
+    return subprocess.run([sys.executable, "-c", *args], cwd=PYTHON_DIR, capture_output=True, text=True,
+                          timeout=60, env=dict(os.environ, **(env or {})))
+
+
+def test_replay_command_uses_its_own_cache_dir_from_the_start(tmp_path):
+    script = ("import sys; sys.argv = ['main.py', 'replay']; import main; "
+              "from local_ai_code_completion.storage import get_cache_dir; print(get_cache_dir())")
+    result = _main(script, env={"LACC_CACHE_DIR": str(tmp_path)})
+    assert result.returncode == 0, result.stderr
+    assert Path(result.stdout.strip().splitlines()[-1]).name.startswith("lacc-replay-")
+
+
+def test_replay_command_rejects_a_zero_speed(tmp_path):
+    trace = tmp_path / "trace.jsonl"
+    trace.write_text(json.dumps(RECORD) + "\n")
+    script = f"import sys, main; sys.argv = ['main.py', 'replay', {str(trace)!r}, '--speed', '0']; main.main()"
+    result = _main(script)
+    assert result.returncode == 1
+    assert "--speed must be a number above 0" in result.stderr
@@ -0,0 +1,96 @@
+"""Model choice from rolling statistics, sample expiry, re-probing and shared persistence"""
+import subprocess
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from local_ai_code_completion.router import MAX_SAMPLE_AGE, PROBE_INTERVAL, ModelRouter
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+CONFIG = SimpleNamespace(name="big", router_models="small", latency_target_code_ms=1500)
+
+
+@pytest.fixture
+def router(tmp_path, monkeypatch):
+    monkeypatch.setenv("LACC_CACHE_DIR", str(tmp_path))
+    return ModelRouter()
+
+
+def _samples(router, model, ttft_ms, error=False, count=3):
+    for _ in range(count):
+        # 120 tokens in a second: 1 s for the expected code completion
+        router.record(model, 4000, ttft_ms, 120, 1000, error=error)
+
+
+def _age(router, model, seconds):
+    samples = router._load()[model].samples
+    aged = [(sample[0] - seconds,) + sample[1:] for sample in samples]
+    samples.clear()
+    samples.extend(aged)
+
+
+def test_best_model_meeting_the_target_is_chosen(router):
+    # Unknown models are tried first so they collect samples
+    assert router.decide(CONFIG, "code", 4000)["reason"] == "exploring"
+    _samples(router, "big", 200)
+    _samples(router, "small", 100)
+    assert router.decide(CONFIG, "code", 4000)["model"] == "big"
+    # Too slow for code completion, still fine for comments
+    _samples(router, "big", 3000, count=5)
+    assert router.decide(CONFIG, "code", 4000)["model"] == "small"
+    assert router.decide(CONFIG, "comment", 4000)["model"] == "big"
+
+
+def test_failing_model_is_skipped(router):
+    _samples(router, "big", 200, error=True)
+    _samples(router, "small", 100)
+    assert router.decide(CONFIG, "code", 4000)["model"] == "small"
+
+
+def test_old_samples_expire(router):
+    _samples(router, "big", 3000)
+    _samples(router, "small", 100)
+    assert router.choose(CONFIG, "code", 4000) == "small"
+    _age(router, "big", MAX_SAMPLE_AGE + 1)
+    assert router.describe()["models"]["big"]["samples"] == 0
+    decision = router.decide(CONFIG, "code", 4000)
+    assert (decision["model"], decision["reason"]) == ("big", "exploring")
+
+
+def test_passed_over_model_is_probed_again(router):
+    _samples(router, "big", 3000)
+    _samples(router, "small", 100)
+    assert router.choose(CONFIG, "code", 4000) == "small"
+    _age(router, "big", PROBE_INTERVAL + 1)
+    assert router.choose(CONFIG, "code", 4000) == "big"
+    assert router.last_decisions["code"]["reason"] == "re-probing"
+    # One probe per interval, even before its result is in
+    assert router.choose(CONFIG, "code", 4000) == "small"
+
+
+def test_statistics_persist(router):
+    router.choose(CONFIG, "code", 4000)
+    _samples(router, "big", 200)
+    reloaded = ModelRouter()
+    assert reloaded.describe()["models"]["big"]["samples"] == 3
+    assert reloaded.last_decisions["code"]["model"] == "big"
+
+
+def test_concurrent_backends_keep_all_samples(tmp_path, monkeypatch):
+    monkeypatch.setenv("LACC_CACHE_DIR", str(tmp_path))
+    script = (
+        "import sys; sys.path.insert(0, sys.argv[1]); "
+        "from local_ai_code_completion.router import ModelRouter; r = ModelRouter(); "
+        "[r.record(sys.argv[2], 100, 10.0, 10, 100) for _ in range(10)]"
+    )
+    processes = [
+        subprocess.Popen([sys.executable, "-c", script, str(BACKEND_DIR), f"model-{i}"],
+                         env={"LACC_CACHE_DIR": str(tmp_path), "PATH": ""})
+        for i in range(4)
+    ]
+    for process in processes:
+        assert process.wait(timeout=60) == 0
+    models = ModelRouter().describe()["models"]
+    assert {model: summary["samples"] for model, summary in models.items()} == {f"model-{i}": 10 for i in range(4)}
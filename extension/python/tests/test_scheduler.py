@@ -0,0 +1,191 @@
+"""Debounce, supersession, priorities, fair turns and deadlines of the request scheduler"""
+import asyncio
+
+import pytest
+
+from local_ai_code_completion.scheduler import (BACKGROUND, EXPLICIT, DeadlineExceeded, RequestCancelled,
+                                                RequestScheduler)
+
+
+def test_newer_request_in_the_same_region_supersedes_during_debounce():
+    async def scenario():
+        scheduler = RequestScheduler(debounce=0.05, max_concurrent=1, region_lines=5)
+        calls = []
+
+        async def job(token):
+            calls.append(token.request_id)
+            return token.request_id
+
+        first = asyncio.ensure_future(scheduler.submit(job, "doc", 10, BACKGROUND, request_id="a"))
+        await asyncio.sleep(0.01)
+        far = asyncio.ensure_future(scheduler.submit(job, "doc", 40, BACKGROUND, request_id="far"))
+        second = asyncio.ensure_future(scheduler.submit(job, "doc", 12, BACKGROUND, request_id="b"))
+        with pytest.raises(RequestCancelled):
+            await first
+        assert await second == "b"
+        assert await far == "far"
+        # The superseded request never reached the upstream call
+        assert sorted(calls) == ["b", "far"]
+
+    asyncio.run(scenario())
+
+
+def test_explicit_requests_skip_the_default_debounce():
+    async def scenario():
+        scheduler = RequestScheduler(debounce=10, max_concurrent=1)
+
+        async def job(token):
+            return token.request_id
+
+        explicit = asyncio.ensure_future(scheduler.submit(job, "doc", 1, request_id="explicit"))
+        # A debounce the caller asks for still applies
+        asked = asyncio.ensure_future(scheduler.submit(job, "asked", 1, debounce=10, request_id="asked"))
+        background = asyncio.ensure_future(scheduler.submit(job, "other", 1, BACKGROUND, request_id="prefetch"))
+        await asyncio.sleep(0.05)
+        assert explicit.done() and explicit.result() == "explicit"
+        assert not asked.done() and not background.done()
+        assert scheduler.cancel_all() == 2
+        await asyncio.gather(asked, background, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+
+def test_cancelling_the_callers_task_raises_request_cancelled():
+    async def scenario():
+        scheduler = RequestScheduler(debounce=10, max_concurrent=1)
+        release = asyncio.Event()
+
+        async def blocker(token):
+            await release.wait()
+
+        async def job(token):
+            return "never"
+
+        running = asyncio.ensure_future(scheduler.submit(blocker))
+        debouncing = asyncio.ensure_future(scheduler.submit(job, "doc", 1, BACKGROUND))
+        queued = asyncio.ensure_future(scheduler.submit(job, "other"))
+        await asyncio.sleep(0.01)
+        for task in (debouncing, queued):
+            task.cancel()
+            with pytest.raises(RequestCancelled):
+                await task
+        assert scheduler.describe()["active"] == 1
+        release.set()
+        await running
+        assert scheduler.describe()["running"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_background_request_does_not_supersede_an_explicit_one():
+    async def scenario():
+        scheduler = RequestScheduler(debounce=0.02, max_concurrent=1)
+
+        async def job(token):
+            return token.request_id
+
+        explicit = asyncio.ensure_future(scheduler.submit(job, "doc", 3, request_id="explicit"))
+        await asyncio.sleep(0)
+        background = asyncio.ensure_future(scheduler.submit(job, "doc", 3, BACKGROUND, request_id="prefetch"))
+        assert await explicit == "explicit"
+        assert await background == "prefetch"
+
+    asyncio.run(scenario())
+
+
+def test_explicit_requests_run_before_waiting_background_ones():
+    async def scenario():
+        scheduler = RequestScheduler(debounce=0, max_concurrent=1)
+        order = []
+        release = asyncio.Event()
+
+        async def blocker(token):
+            await release.wait()
+
+        async def job(token):
+            order.append(token.request_id)
+
+        running = asyncio.ensure_future(scheduler.submit(blocker, request_id="running"))
+        await asyncio.sleep(0)
+        waiting = [asyncio.ensure_future(scheduler.submit(job, priority=BACKGROUND, request_id="background")),
+                   asyncio.ensure_future(scheduler.submit(job, priority=EXPLICIT, request_id="explicit"))]
+        await asyncio.sleep(0)
+        assert scheduler.describe()["waiting"] == 2
+        release.set()
+        await asyncio.gather(running, *waiting)
+        assert order == ["explicit", "background"]
+
+    asyncio.run(scenario())
+
+
+def test_clients_take_turns_within_a_priority():
+    async def scenario():
+        scheduler = RequestScheduler(debounce=0, max_concurrent=1)
+        order = []
+        release = asyncio.Event()
+
+        async def blocker(token):
+            await release.wait()
+
+        async def job(token):
+            order.append(token.request_id)
+
+        running = asyncio.ensure_future(scheduler.submit(blocker, client="busy", request_id="running"))
+        await asyncio.sleep(0)
+        waiting = [asyncio.ensure_future(scheduler.submit(job, client="busy", request_id=f"busy-{i}"))
+                   for i in range(3)]
+        waiting.append(asyncio.ensure_future(scheduler.submit(job, client="quiet", request_id="quiet")))
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(running, *waiting)
+        assert order.index("quiet") < order.index("busy-1")
+
+    asyncio.run(scenario())
+
+
+def test_deadline_passes_while_queued():
+    async def scenario():
+        scheduler = RequestScheduler(debounce=0, max_concurrent=1)
+        release = asyncio.Event()
+
+        async def blocker(token):
+            await release.wait()
+
+        async def job(token):
+            return "late"
+
+        running = asyncio.ensure_future(scheduler.submit(blocker))
+        await asyncio.sleep(0)
+        with pytest.raises(DeadlineExceeded):
+            await scheduler.submit(job, timeout=0.03)
+        release.set()
+        await running
+        # The expired request gave its queue place back
+        assert scheduler.describe()["running"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_cancelling_a_running_request_cancels_its_job():
+    async def scenario():
+        scheduler = RequestScheduler(debounce=0)
+        started = asyncio.Event()
+        job_cancelled = []
+
+        async def job(token):
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                job_cancelled.append(token.reason)
+                raise
+
+        request = asyncio.ensure_future(scheduler.submit(job, "doc", request_id="r"))
+        await started.wait()
+        assert scheduler.cancel("r", "user")
+        with pytest.raises(RequestCancelled):
+            await request
+        assert job_cancelled == ["user"]
+        assert scheduler.describe()["active"] == 0
+
+    asyncio.run(scenario())
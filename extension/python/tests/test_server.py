@@ -0,0 +1,189 @@
+"""Request protocol of the backend server"""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import server
+from local_ai_code_completion.candidates import alternatives_cache, request_key
+from local_ai_code_completion.scheduler import RequestCancelled, scheduler
+
+
+async def _start_job(document: str, request_id: str, client: str = ""):
+    """A scheduled job that runs until it is cancelled"""
+    started = asyncio.Event()
+
+    async def job(token):
+        started.set()
+        await asyncio.sleep(30)
+
+    task = asyncio.ensure_future(scheduler.submit(job, document=document, request_id=request_id, debounce=0,
+                                                  client=client))
+    await started.wait()
+    return task
+
+
+def _backend_server():
+    return server.BackendServer(backend=None)
+
+
+def _fake_backend(calls):
+    async def generate_completion(prefix, suffix, comment, file_path, mode, candidates, token):
+        calls.append((prefix, suffix, mode))
+        return "WRITE lv_total."
+
+    async def prepare_digests(path, text):
+        pass
+
+    return SimpleNamespace(generate_completion=generate_completion, prepare_digests=prepare_digests,
+                           request_timeout=lambda: 0)
+
+
+def _responses(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+def test_generate_from_a_mirrored_document(capsys):
+    calls = []
+
+    async def scenario():
+        backend = server.BackendServer(_fake_backend(calls))
+        server._session.set(server.Session())
+        uri = "file:///zmirror.abap"
+        lines = [
+            {"id": 1, "command": "did_open", "args": {"uri": uri, "version": 1, "text": "REPORT z.\nWRITE 1.\n"}},
+            {"command": "did_change", "args": {"uri": uri, "version": 2, "changes": [
+                {"range": {"start": {"line": 1, "character": 0}, "end": {"line": 1, "character": 8}},
+                 "text": "DATA lv_total TYPE i."}]}},
+            {"id": 2, "command": "generate", "args": {"uri": uri, "version": 2, "line": 2, "character": 0,
+                                                     "mode": "debug", "debounceMs": 0}},
+            {"id": 3, "command": "generate", "args": {"uri": uri, "version": 1, "line": 0, "character": 0,
+                                                     "mode": "debug"}},
+        ]
+        for line in lines:
+            await backend._handle_line(json.dumps(line))
+        await backend._stop()
+        await backend.handle_request({"command": "did_close", "args": {"uri": uri}})
+
+    asyncio.run(scenario())
+    responses = {response["id"]: response for response in _responses(capsys)}
+    # The did_change notification is not answered
+    assert sorted(responses) == [1, 2, 3]
+    assert responses[1]["result"] == {"version": 1}
+    assert responses[2]["result"] == {"completion": "WRITE lv_total.", "truncated": False}
+    assert calls == [("REPORT z.\nDATA lv_total TYPE i.\n", "", "debug")]
+    assert not responses[3]["ok"] and "version 2, not 1" in responses[3]["error"]
+
+
+def test_alternatives_of_a_comment_request_on_a_mirrored_document(capsys, monkeypatch):
+    monkeypatch.setenv("LACC_CANDIDATES", "2")
+
+    responses = {}
+
+    async def generate_completion(prefix, suffix, comment, file_path, mode, candidates, token):
+        # Stored the way the candidate race stores them
+        alternatives_cache.store(request_key(file_path, mode, prefix, suffix, comment), "WRITE 1.", ["WRITE 2."])
+        return "WRITE 1."
+
+    async def send(lines):
+        for line in lines:
+            await backend._handle_line(json.dumps(line))
+        await backend._stop()
+        responses.update((response["id"], response) for response in _responses(capsys))
+
+    fake = _fake_backend([])
+    fake.generate_completion = generate_completion
+    backend = server.BackendServer(fake)
+
+    async def scenario():
+        server._session.set(server.Session())
+        uri = "file:///zalternatives.abap"
+        request = {"uri": uri, "version": 1, "file": "/src/zalternatives.abap", "mode": "comment",
+                   "selection": {"start": {"line": 1, "character": 0}, "end": {"line": 1, "character": 5}}}
+        await send([
+            {"id": 1, "command": "did_open", "args": {"uri": uri, "version": 1, "text": "REPORT z.\n* sum\n"}},
+            {"id": 2, "command": "generate", "args": request},
+        ])
+        # Resolved from the mirror like the generate request was
+        await send([{"id": 3, "command": "alternatives", "args": request}])
+        # Looked up by key once the answer has replaced the comment
+        await send([{"id": 4, "command": "alternatives", "args": {"key": responses[2]["result"]["alternativesKey"]}}])
+        await backend.handle_request({"command": "did_close", "args": {"uri": uri}})
+
+    asyncio.run(scenario())
+    assert responses[3]["result"] == {"alternatives": ["WRITE 1.", "WRITE 2."]}
+    assert responses[4]["result"] == {"alternatives": ["WRITE 1.", "WRITE 2."]}
+
+
+def test_unknown_commands_and_invalid_lines_are_answered_with_errors(capsys):
+    async def scenario():
+        backend = _backend_server()
+        server._session.set(server.Session())
+        await backend._handle_line('{"id": 5, "command": "nope"}')
+        await backend._handle_line("not json")
+        await backend._handle_line('{"id": 6, "command": "ping"}')
+        await backend._stop()
+
+    asyncio.run(scenario())
+    responses = _responses(capsys)
+    assert {"id": 6, "ok": True, "result": {"pong": True}} in responses
+    assert {"id": 5, "ok": False, "error": "Unknown command: nope"} in responses
+    assert any(r["id"] is None and r["error"].startswith("Invalid request") for r in responses)
+
+
+def test_cancel_by_request_id():
+    async def scenario():
+        task = await _start_job("file:///a.abap", "7")
+        result = await _backend_server().handle_request({"id": 99, "command": "cancel", "args": {"requestId": "7"}})
+        assert result == {"cancelled": 1}
+        with pytest.raises(RequestCancelled):
+            await task
+
+    asyncio.run(scenario())
+
+
+def test_cancel_by_uri():
+    async def scenario():
+        task = await _start_job("file:///a.abap", "8")
+        other = await _start_job("file:///b.abap", "9")
+        backend = _backend_server()
+        result = await backend.handle_request({"id": 100, "command": "cancel", "args": {"uri": "file:///a.abap"}})
+        assert result == {"cancelled": 1}
+        with pytest.raises(RequestCancelled):
+            await task
+        assert not other.done()
+        await backend.handle_request({"id": 101, "command": "cancel", "args": {"requestId": "9"}})
+        with pytest.raises(RequestCancelled):
+            await other
+
+    asyncio.run(scenario())
+
+
+def test_cancel_all_without_session():
+    async def scenario():
+        tasks = [await _start_job("file:///a.abap", "10"), await _start_job("file:///b.abap", "11")]
+        result = await _backend_server().handle_request({"id": 102, "command": "cancel", "args": {}})
+        assert result == {"cancelled": 2}
+        for task in tasks:
+            with pytest.raises(RequestCancelled):
+                await task
+
+    asyncio.run(scenario())
+
+
+def test_cancel_all_of_this_client_only():
+    async def scenario():
+        own = await _start_job("s1:file:///a.abap", "s1:12", client="s1")
+        other = await _start_job("s2:file:///a.abap", "s2:12", client="s2")
+        server._session.set(server.Session("s1"))
+        result = await _backend_server().handle_request({"id": 103, "command": "cancel", "args": {}})
+        assert result == {"cancelled": 1}
+        with pytest.raises(RequestCancelled):
+            await own
+        assert not other.done()
+        scheduler.cancel("s2:12")
+        with pytest.raises(RequestCancelled):
+            await other
+
+    asyncio.run(scenario())
@@ -0,0 +1,38 @@
+"""Counters shared between backend processes"""
+import subprocess
+import sys
+from pathlib import Path
+
+from local_ai_code_completion.stats import Stats
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def test_flush_merges_into_the_persisted_counters(tmp_path, monkeypatch):
+    monkeypatch.setenv("LACC_CACHE_DIR", str(tmp_path))
+    first, second = Stats(), Stats()
+    first.increment("requests")
+    second.increment("requests", 2)
+    assert first.get_counters() == {"requests": 1}
+    first.flush()
+    second.flush()
+    assert Stats().get_counters() == {"requests": 3}
+    assert first.report()["continuation"]["hit_rate"] == 0.0
+
+
+def test_concurrent_processes_do_not_lose_counters(tmp_path, monkeypatch):
+    monkeypatch.setenv("LACC_CACHE_DIR", str(tmp_path))
+    script = (
+        "import sys; sys.path.insert(0, sys.argv[1])\n"
+        "from local_ai_code_completion.stats import Stats\n"
+        "stats = Stats()\n"
+        "for _ in range(40):\n"
+        "    stats.increment('requests')\n"
+        "    stats.flush()\n"
+    )
+    env = {"LACC_CACHE_DIR": str(tmp_path), "PATH": ""}
+    processes = [subprocess.Popen([sys.executable, "-c", script, str(BACKEND_DIR)], env=env,
+                                  stderr=subprocess.DEVNULL) for _ in range(4)]
+    for process in processes:
+        assert process.wait(timeout=60) == 0
+    assert Stats().get_counters()["requests"] == 160
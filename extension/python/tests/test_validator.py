@@ -0,0 +1,51 @@
+"""Local checks and repairs of generated ABAP"""
+import asyncio
+
+from local_ai_code_completion.validator import validate_abap, validate_and_repair
+
+
+def test_valid_code_in_context():
+    prefix = "LOOP AT lt_items INTO DATA(ls_item).\n"
+    result = validate_abap("  lv_total = lv_total + ls_item-amount.\n", prefix, "ENDLOOP.\n")
+    assert result.valid
+
+
+def test_missing_period_and_closer_are_repaired_locally():
+    result = validate_abap("IF lv_total > 0.\n  WRITE lv_total", "", "")
+    assert not result.needs_model
+    assert {issue.kind for issue in result.issues} == {"termination", "block"}
+    assert result.repaired_code == "IF lv_total > 0.\n  WRITE lv_total.\nENDIF."
+
+
+def test_block_closed_by_the_suffix_is_not_closed_again():
+    result = validate_abap("IF lv_total > 0.\n  WRITE lv_total.", "", "\nENDIF.\n")
+    assert result.valid
+
+
+def test_chain_repairs():
+    assert validate_abap("DATA lv_a TYPE i, lv_b TYPE i.").repaired_code == "DATA: lv_a TYPE i, lv_b TYPE i."
+    assert validate_abap("DATA: lv_a TYPE i, lv_b TYPE i,.").repaired_code == "DATA: lv_a TYPE i, lv_b TYPE i."
+
+
+def test_code_continuing_the_statement_at_the_cursor():
+    result = validate_abap("lv_total + 1.", "  lv_total = ", "")
+    assert result.valid
+
+
+def test_truncated_statement_needs_the_model():
+    result = validate_abap("lv_total = lv_total +", "", "")
+    assert result.needs_model
+
+
+def test_only_the_faulty_fragment_is_sent_for_repair():
+    prompts = []
+
+    async def ask_model(prompt):
+        prompts.append(prompt)
+        return "ENDIF."
+
+    code = "DATA lv_total TYPE i.\nIF lv_total > 0.\n  WRITE lv_total.\nENDLOOP."
+    repaired = asyncio.run(validate_and_repair(code, "", "", ask_model))
+    assert repaired == "DATA lv_total TYPE i.\nIF lv_total > 0.\n  WRITE lv_total.\nENDIF."
+    assert len(prompts) == 1
+    assert "ENDLOOP." in prompts[0] and "DATA lv_total" not in prompts[0]